@@ -0,0 +1,37 @@
+'''
+コマンドラインからの実行
+
+    python -m PyPrologue run jobs.json [--quiet] [--no-output]
+
+ジョブマニフェストの書式は PyPrologue/simulator/JobRunner.py を参照.
+対話的に実行する場合は従来通り main.py を実行する.
+'''
+from PyPrologue.app.CommandLine import *
+from PyPrologue.simulator.JobRunner import *
+
+import sys
+import argparse
+from pathlib import Path
+
+def main(argv : list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m PyPrologue", description="Prologue (rocket trajectory simulator)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="ジョブマニフェストの解析を全て実行する")
+    run.add_argument("manifest", type=Path, help="ジョブマニフェスト (JSON)")
+    run.add_argument("-q", "--quiet", action="store_true", help="情報メッセージと進捗バーを出力しない")
+    run.add_argument("--no-output", action="store_true", help="結果をresult/に保存しない")
+    args = parser.parse_args(argv)
+
+    SetQuiet(args.quiet)
+    try:
+        jobs = LoadJobs(args.manifest)
+    except Exception as e:
+        PrintInfo(PrintInfoType.Error, "Failed to load job manifest", e)
+        return 1
+
+    results = RunJobs(jobs, output=not args.no_output)
+    PrintJobSummary(results)
+    return 0 if all(result.success for result in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,7 +6,7 @@ from pathlib import Path
 from enum import Enum  # 列挙体宣言用
 from dataclasses import dataclass
 from PyPrologue.app.CommandLine import *
-from PyPrologue.utils.JsonUtils import GetValueExc
+from PyPrologue.utils.JsonUtils import GetValueExc, HasKey
 
 class WindModelType(Enum):
     Real = 1
@@ -14,6 +14,23 @@ class WindModelType(Enum):
     OnlyPowerLaw = 3
     NoWind = 4
 
+class IntegratorType(Enum):
+    Euler = 1 # 固定刻みの陽的Euler法 (従来の計算)
+    RK4 = 2   # 固定刻みの4次Runge-Kutta法
+    RK45 = 3  # 誤差制御付きの可変刻みRunge-Kutta法 (Dormand–Prince)
+
+class SamplerType(Enum):
+    Grid = 1           # 風速 (1 m/s刻み) × 風向 (windDirInterval刻み) の全組み合わせ (scatterのみ. 従来の計算)
+    Random = 2         # 擬似乱数
+    LatinHypercube = 3
+    Sobol = 4          # scrambled Sobol列
+
+class BinaryFormat(Enum):
+    NoOutput = 1 # CSVのみ出力
+    NPZ = 2
+    Parquet = 3  # pyarrowが必要
+    Auto = 4     # pyarrowがあればParquet, 無ければNPZ
+
 class _AppSetting:
     '''
     初期設定クラス. Prologueとはことなり Singleton にした.
@@ -22,6 +39,8 @@ class _AppSetting:
     class Processing:
         multiThread : bool
         threadCount : int
+        profile : bool # 解析を計測し, 結果と同じディレクトリにprofile.jsonを出力するか
+        inputCache : bool # 入力ファイルの解析結果をinput/.cacheにも保存し, 次回以降はそれを読むか
     _processing : Processing
     
     @property
@@ -35,15 +54,43 @@ class _AppSetting:
         windSpeedMin : float
         windSpeedMax : float
         windDirInterval : float
+        scatterSampler : SamplerType # Grid以外なら風速・風向をscatterSamples個サンプリングする
+        scatterSamples : int
+        scatterSeed : int
+        # integrator
+        integrator : IntegratorType
+        integratorStep : float    # RK4の刻み幅, RK45の初期刻み幅 [s]
+        relativeTolerance : float # RK45の相対許容誤差
+        absoluteTolerance : float # RK45の絶対許容誤差
+        maxStep : float           # RK45の最大刻み幅 [s]
+        # parachute descent
+        fastDescent : bool            # 開傘後 (燃焼終了後) をDescentSolverで解くか (scatter用)
+        descentAltitudeStep : float   # DescentSolverの1ステップの高度変化の上限 [m]
+        descentMaxStep : float        # DescentSolverの最大刻み幅 [s]
     _simulation : Simulation
     
     @property
     def simulation(self)  -> Simulation: return self._simulation
     
+    @dataclass
+    class Dispersion:
+        samples : int     # Monte Carloのサンプル数
+        seed : int        # 乱数のシード (同じシードなら並列数によらず同じ結果)
+        parameters : dict # 摂動させる量 -> 分布 (PyPrologue/simulator/Dispersion.py で解釈する)
+        alpha : float     # Unscented変換のシグマ点の広がり (0 < alpha <= 1)
+        beta : float      # Unscented変換の分布の事前情報 (正規分布なら2が最適)
+        kappa : float     # Unscented変換の副次的なスケーリング
+        sampler : SamplerType # Monte Carloのサンプルの生成方法 (Grid以外)
+    _dispersion : Dispersion
+    
+    @property
+    def dispersion(self)  -> Dispersion: return self._dispersion
+    
     @dataclass
     class Result:
         precision : int
         stepSaveInterval : int
+        binaryFormat : BinaryFormat # CSVに加えて出力するバイナリ形式
     _result : Result
     
     @property
@@ -64,6 +111,7 @@ class _AppSetting:
     class Atmoshere:
         basePressure : float
         baseTemperature : float
+        tabulated : bool # 高度毎の値を事前計算したテーブルを補間して使うか
     _atmosphere : Atmoshere
     
     @property
@@ -81,7 +129,9 @@ class _AppSetting:
         
         self._processing = _AppSetting.Processing(
             multiThread=self.__InitValue("processing", "multi_thread"), # type: ignore
-            threadCount=self.__InitValue("processing", "multi_thread_count") # type: ignore
+            threadCount=self.__InitValue("processing", "multi_thread_count"), # type: ignore
+            profile=self.__InitValue("processing", "profile", default_value=False), # type: ignore
+            inputCache=self.__InitValue("processing", "input_cache", default_value=False) # type: ignore
         )            
         if self._processing.threadCount < 1:
             PrintInfo(PrintInfoType.Warning,
@@ -94,13 +144,81 @@ class _AppSetting:
                 detectPeakThreshold = self.__InitValue("simulation", "detect_peak_threshold"), # type: ignore
                 windSpeedMin        = self.__InitValue("simulation", "scatter", "wind_speed_min"), # type: ignore
                 windSpeedMax        = self.__InitValue("simulation", "scatter", "wind_speed_max"), # type: ignore
-                windDirInterval     = self.__InitValue("simulation", "scatter", "wind_dir_interval") # type: ignore
+                windDirInterval     = self.__InitValue("simulation", "scatter", "wind_dir_interval"), # type: ignore
+                scatterSampler      = SamplerType.Grid,
+                scatterSamples      = self.__InitValue("simulation", "scatter", "samples", default_value=128), # type: ignore
+                scatterSeed         = self.__InitValue("simulation", "scatter", "seed", default_value=0), # type: ignore
+                integrator          = IntegratorType.Euler, # 仮に
+                integratorStep      = self.__InitValue("simulation", "integrator", "step", default_value=self.__InitValue("simulation", "dt")), # type: ignore
+                relativeTolerance   = self.__InitValue("simulation", "integrator", "rtol", default_value=1e-6), # type: ignore
+                absoluteTolerance   = self.__InitValue("simulation", "integrator", "atol", default_value=1e-6), # type: ignore
+                maxStep             = self.__InitValue("simulation", "integrator", "max_step", default_value=1.0), # type: ignore
+                fastDescent         = self.__InitValue("simulation", "descent", "fast", default_value=False), # type: ignore
+                descentAltitudeStep = self.__InitValue("simulation", "descent", "altitude_step", default_value=10.0), # type: ignore
+                descentMaxStep      = self.__InitValue("simulation", "descent", "max_step", default_value=1.0) # type: ignore
                 )
+        match self.__InitValue("simulation", "integrator", "type", default_value="euler"):
+            case "euler":
+                self._simulation.integrator = IntegratorType.Euler
+            case "rk4":
+                self._simulation.integrator = IntegratorType.RK4
+            case "rk45":
+                self._simulation.integrator = IntegratorType.RK45
+            case _: # default
+                PrintInfo(PrintInfoType.Warning,
+                    "In prologue.settings.json",
+                    "simulation.integrator.type",
+                    "\"" + str(self.__InitValue("simulation", "integrator", "type")) + "\" is invalid string.",
+                    "Set \"euler\", \"rk4\" or \"rk45\"",
+                    "simulation integrator type is set to the default value of euler.")
+        
+        self._simulation.scatterSampler = self.__InitSampler(("simulation", "scatter", "sampler"), SamplerType.Grid)
+        if self._simulation.scatterSamples < 1:
+            PrintInfo(PrintInfoType.Warning, "Scatter samples is set to the default value of 128.")
+            self._simulation.scatterSamples = 128
+        
+        self._dispersion = _AppSetting.Dispersion(
+            samples    = self.__InitValue("simulation", "dispersion", "samples", default_value=1000), # type: ignore
+            seed       = self.__InitValue("simulation", "dispersion", "seed", default_value=0), # type: ignore
+            parameters = self.__InitValue("simulation", "dispersion", "parameters", default_value={}), # type: ignore
+            alpha      = self.__InitValue("simulation", "dispersion", "unscented", "alpha", default_value=1.0), # type: ignore
+            beta       = self.__InitValue("simulation", "dispersion", "unscented", "beta", default_value=2.0), # type: ignore
+            kappa      = self.__InitValue("simulation", "dispersion", "unscented", "kappa", default_value=0.0), # type: ignore
+            sampler    = SamplerType.Random
+        )
+        self._dispersion.sampler = self.__InitSampler(("simulation", "dispersion", "sampler"), SamplerType.Random)
+        if self._dispersion.sampler == SamplerType.Grid:
+            PrintInfo(PrintInfoType.Warning, "Dispersion sampler \"grid\" is not supported.",
+                      "simulation dispersion sampler is set to the default value of random.")
+            self._dispersion.sampler = SamplerType.Random
+        if self._dispersion.samples < 1:
+            PrintInfo(PrintInfoType.Warning, "Dispersion samples is set to the default value of 1000.")
+            self._dispersion.samples = 1000
+        if not 0.0 < self._dispersion.alpha <= 1.0:
+            PrintInfo(PrintInfoType.Warning, "Unscented alpha is set to the default value of 1.0.")
+            self._dispersion.alpha = 1.0
         
         self._result = _AppSetting.Result(
             precision       = self.__InitValue("result", "precision"), # type: ignore
-            stepSaveInterval= self.__InitValue("result", "step_save_interval") # type: ignore
+            stepSaveInterval= self.__InitValue("result", "step_save_interval"), # type: ignore
+            binaryFormat    = BinaryFormat.NoOutput
         )
+        match self.__InitValue("result", "binary_format", default_value="none"):
+            case "none":
+                self._result.binaryFormat = BinaryFormat.NoOutput
+            case "npz":
+                self._result.binaryFormat = BinaryFormat.NPZ
+            case "parquet":
+                self._result.binaryFormat = BinaryFormat.Parquet
+            case "auto":
+                self._result.binaryFormat = BinaryFormat.Auto
+            case _: # default
+                PrintInfo(PrintInfoType.Warning,
+                    "In prologue.settings.json",
+                    "result.binary_format",
+                    "\"" + str(self.__InitValue("result", "binary_format")) + "\" is invalid string.",
+                    "Set \"none\", \"auto\", \"npz\" or \"parquet\"",
+                    "result binary_format is set to the default value of none.")
         if self._result.precision < 0:
             PrintInfo(PrintInfoType.Warning, "Result precision is set to the default value of 8.")
             self._result.precision = 8
@@ -137,17 +255,48 @@ class _AppSetting:
         
         self._atmosphere = _AppSetting.Atmoshere(
             basePressure    = self.__InitValue("atmosphere", "base_pressure_pascal"), # type: ignore
-            baseTemperature = self.__InitValue("atmosphere", "base_temperature_celsius") # type: ignore
+            baseTemperature = self.__InitValue("atmosphere", "base_temperature_celsius"), # type: ignore
+            tabulated       = self.__InitValue("atmosphere", "tabulated", default_value=False) # type: ignore
         )
         
         return cls._instance
     
-    def __InitValue(self, *keys : str):
+    def __InitSampler(self, keys : tuple[str, ...], default : SamplerType) -> SamplerType:
+        match self.__InitValue(*keys, default_value=default.name.lower()):
+            case "grid":   return SamplerType.Grid
+            case "random": return SamplerType.Random
+            case "lhs":    return SamplerType.LatinHypercube
+            case "sobol":  return SamplerType.Sobol
+            case value: # default
+                PrintInfo(PrintInfoType.Warning,
+                    "In prologue.settings.json",
+                    ".".join(keys),
+                    "\"" + str(value) + "\" is invalid string.",
+                    "Set \"grid\", \"random\", \"lhs\" or \"sobol\"",
+                    f"{' '.join(keys)} is set to the default value of {default.name.lower()}.")
+                return default
+    
+    def __InitValue(self, *keys : str, default_value : any = None):
+        '''default_valueを指定した場合, キーが無ければその値を返す (省略可能な設定用)'''
         if self._json_dict == {}:
-            # JSONファイル読み込み.
+            # JSONファイル読み込み. (最初の1回のみ)
             with open("prologue.settings.json") as f:
-                json_dict : dict = json.load(f)
+                self._json_dict = json.load(f)
+        json_dict = self._json_dict
+        
+        if default_value is not None and not HasKey(json_dict, *keys):
+            return default_value
         
         return GetValueExc(json_dict, *keys)
 
-AppSetting = _AppSetting()
+class _LazyAppSetting:
+    '''
+    AppSettingの実体. import時ではなく, 最初に属性を参照したときに prologue.settings.json を読み込む.
+    参照した属性は自身に保持するので, 2回目以降の参照は通常の属性参照と同じコストになる.
+    '''
+    def __getattr__(self, name : str):
+        value = getattr(_AppSetting(), name)
+        setattr(self, name, value)
+        return value
+
+AppSetting = _LazyAppSetting()
@@ -8,6 +8,16 @@ import time
 class PrintInfoType(Enum):
     Information = 1; Warning = 2; Error = 3
 
+_quiet : bool = False
+
+def SetQuiet(quiet : bool) -> None:
+    '''Trueにすると, PrintInfoのInformationとprogress_barを出力しない (WarningとErrorは出力する)'''
+    global _quiet
+    _quiet = quiet
+
+def IsQuiet() -> bool:
+    return _quiet
+
 def Question(question : str, *choices : str) -> None:
     '''選択肢提示関数.
     Args:
@@ -56,6 +66,8 @@ def PrintInfo(type : PrintInfoType, *lines : str):
         type: 情報のタイプ.
         line: 出力する文字. それぞれ改行して出力される.
     '''
+    if _quiet and type == PrintInfoType.Information: return
+    
     # 最初の文字を出力
     match(type):
         case PrintInfoType.Information:
@@ -84,6 +96,9 @@ def progress_bar(epoch):
     # LICENSE_1_0.txt or copy at http://www.boost.org/LICENSE_1_0.txt)
     #
     range(0)
+    if _quiet:
+        yield from range(epoch)
+        return
     # 進捗度を表すバーを出力 
     print("0%   10   20   30   40   50   60   70   80   90   100") 
     print("|----|----|----|----|----|----|----|----|----|----|")
@@ -0,0 +1,303 @@
+'''
+機体の運動方程式 (状態ベクトル版)
+
+状態を float64 の1本のベクトルにまとめ, その時間微分を返す.
+Solverの陽的Euler法のステップ・RK4/RK45の積分器・結果の記録はいずれもStateDerivativeを使う.
+StateDerivativeはスカラー演算だけで計算する (クォータニオン演算も展開している).
+大気・風は高度の関数 (DynamicsParameter.windInto) として受け取る.
+
+StateDerivativesはNケース分の状態 (N, StateSize) をまとめて計算するベクトル版 (BatchSolver用).
+運動方程式の各項 (座標変換・空気力・姿勢の変化率) は成分毎の式 (_toBody等) として1か所に書き,
+floatにも(N,)の配列にも使えるので, 両者は同じ式で計算する.
+
+状態ベクトル (StateSize = 17):
+    [0:3]   pos         位置 [m] (ENU)
+    [3:6]   velocity    対地速度 [m/s]
+    [6:10]  quat        姿勢 (w, x, y, z)
+    [10:13] omega_b     角速度 (roll, pitch, yaw)
+    [13]    mass        質量 [kg]
+    [14]    refLength   ノーズから重心までの距離 [m]
+    [15]    iyz         ピッチ・ヨー慣性モーメント [kg*m^2]
+    [16]    ix          ロール慣性モーメント [kg*m^2]
+'''
+from PyPrologue.rocket.RocketSpec import BodySpecification
+from PyPrologue.rocket.AeroCoefficient import AeroCoefficient
+from PyPrologue.rocket.Rocket import Body, StateSize, POS, VELOCITY, QUAT, OMEGA, MASS, REF_LENGTH, IYZ, IX # Bodyのバッファと同じ並び
+from PyPrologue.rocket.Perturbation import Perturbation
+from PyPrologue.dynamics.WindModel import BatchWindModel
+
+import numpy as np
+from math import atan, cos, sqrt
+from dataclasses import dataclass, field
+from enum import Enum, auto
+from typing import Callable
+
+class FlightPhase(Enum):
+    Rail = 1      # ランチレール上
+    Flight = auto()
+    Parachute = auto()
+
+
+@dataclass
+class DynamicsParameter:
+    '''StateDerivativeが参照する機体・環境のパラメータ'''
+    bodySpec : BodySpecification
+    # (書き込み先, 高度) -> 書き込み先 [風速x, 風速y, 風速z, 空気密度, 重力加速度, 気圧, 音速] (e.g., WindModel.valueInto)
+    windInto : Callable[[list[float], float], list[float]]
+    phase : FlightPhase = FlightPhase.Rail
+    parachuteIndex : int = 0
+
+    # 燃焼による質量特性の変化量 (__post_init__で計算). 変化率は Engine.burnRate を掛けたもの
+    massChange : float = field(init=False, default=0.0)
+    refLengthChange : float = field(init=False, default=0.0)
+    iyzChange : float = field(init=False, default=0.0)
+    ixChange : float = field(init=False, default=0.0)
+
+    # StateDerivativeが呼び出し毎に書き込む風・空力係数のバッファ
+    wind : list[float] = field(init=False, default_factory=lambda: [0.0] * 7)
+    aero : AeroCoefficient = field(init=False, default_factory=AeroCoefficient)
+
+    def __post_init__(self):
+        self.massChange      = self.bodySpec.massFinal - self.bodySpec.massInitial
+        self.refLengthChange = self.bodySpec.CGLengthFinal - self.bodySpec.CGLengthInitial
+        self.iyzChange       = self.bodySpec.rollingMomentInertiaFinal - self.bodySpec.rollingMomentInertiaInitial
+        self.ixChange        = 0.01 - 0.02
+
+def StateDerivative(t : float, state : np.ndarray, params : DynamicsParameter, out : np.ndarray,
+                    body : Body | None = None) -> np.ndarray:
+    '''
+    状態ベクトルの時間微分.
+    Args:
+        t      : 打上げからの経過時間 [s].
+        state  : 状態ベクトル (書き換えない).
+        params : 機体・環境のパラメータ.
+        out    : 結果を書き込む (StateSize,) の配列 (呼び出し側で確保して使い回す). outを返す.
+        body   : 与えた場合は, 結果の記録に使う値 (airspeed_b, attackAngle, aeroCoef, Cnp, Cny, Cmqp, Cmqy, force_b, moment_b) を書き込む.
+    風と空力係数は呼び出し側のバッファ (params.wind, params.aero. bodyを与えた場合は body.aeroCoef) に書き込む.
+    状態は tolist でfloatに展開する (要素毎の添字アクセスやバッファへのコピーより速い).
+    '''
+    spec = params.bodySpec
+    engine = spec.engine
+
+    px, py, pz, vx, vy, vz, qw, qx, qy, qz, wx, wy, wz, mass, refLength, iyz, ix = state.tolist()
+    qn = sqrt(qw*qw + qx*qx + qy*qy + qz*qz)
+    if qn > 0.0:
+        qw /= qn; qx /= qn; qy /= qn; qz /= qn
+
+    windx, windy, windz, rho, g, pressure, speedOfSound = params.windInto(params.wind, pz)
+
+    # 質量特性
+    burnRate = engine.burnRate(t)
+    if burnRate > 0.0:
+        out[MASS], out[REF_LENGTH], out[IYZ], out[IX] = \
+            params.massChange * burnRate, params.refLengthChange * burnRate, params.iyzChange * burnRate, params.ixChange * burnRate
+    else:
+        out[MASS] = out[REF_LENGTH] = out[IYZ] = out[IX] = 0.0
+
+    if params.phase == FlightPhase.Parachute:
+        out[0], out[1], out[2] = windx, windy, vz # 水平方向は風に流される
+        out[3], out[4], out[5] = 0.0, 0.0, ParachuteAcceleration(rho, vz, spec.parachutes[params.parachuteIndex].Cd, mass, g)
+        out[6:13] = 0.0
+        if body is None:
+            return out
+
+    ab0, ab1, ab2 = _toBody(qw, qx, qy, qz, vx - windx, vy - windy, vz - windz)
+    airspeed, attackAngle = _airspeed(ab0, ab1, ab2, sqrt, atan)
+    thrust = engine.thrustAt(t, pressure)
+    aero = spec.aeroCoeffStorage.valueInto(params.aero if body is None else body.aeroCoef,
+                                           airspeed, attackAngle, engine.didCombustion(t), airspeed / speedOfSound)
+    fx, fy, fz, my, mz, Cnp, Cny = _airLoads(spec, rho, airspeed, attackAngle, ab0, ab1, ab2, thrust,
+                                             aero.Cd, aero.Cna, aero.Cp, refLength, wy, wz, atan, cos)
+
+    if body is not None:
+        body.airspeed_b[:] = (ab0, ab1, ab2)
+        body.attackAngle = attackAngle
+        body.Cnp, body.Cny = Cnp, Cny
+        body.Cmqp = body.Cmqy = spec.Cmq
+        if params.phase == FlightPhase.Parachute: # 開傘後は推力のみ記録する
+            body.force_b[:] = (thrust, 0.0, 0.0)
+            body.moment_b[:] = 0.0
+            return out
+
+    gx, gy, gz = _toBody(qw, qx, qy, qz, 0.0, 0.0, -g * mass)
+    fx += gx
+    fy += gy
+    fz += gz
+
+    if body is not None:
+        body.force_b[:] = (fx, fy, fz)
+        body.moment_b[:] = (0.0, my, mz)
+
+    if params.phase == FlightPhase.Rail:
+        if fx < 0.0: # 推力不足でレール上に静止
+            out[0:13] = 0.0
+            return out
+        fy = fz = 0.0 # 機軸方向 (ローンチレール方向) に離床
+        if body is not None:
+            body.force_b[1:] = 0.0
+
+    ax, ay, az = _toGround(qw, qx, qy, qz, fx, fy, fz)
+    out[0], out[1], out[2] = vx, vy, vz
+    out[3], out[4], out[5] = ax / mass, ay / mass, az / mass
+
+    if params.phase == FlightPhase.Rail:
+        out[6:13] = 0.0
+        return out
+
+    out[6], out[7], out[8], out[9] = _quaternionRate(qw, qx, qy, qz, wx, wy, wz)
+    out[10] = 0.0 # ロールモーメントは考慮しない
+    out[11] = my / iyz
+    out[12] = mz / iyz
+    return out
+
+
+@dataclass
+class BatchDynamicsParameter:
+    '''StateDerivativesが参照する機体・環境のパラメータ (Nケース分. ケース毎の値は(N,)の配列)'''
+    bodySpec : BodySpecification
+    windModel : BatchWindModel     # StateDerivativesが計算するケースの高度でupdateする
+    perturbation : Perturbation    # ケース毎の仕様の摂動 (Perturbation.broadcast(N))
+
+    # 燃焼による質量特性の変化量 (__post_init__で計算). 質量とパラシュートの抗力係数は摂動を含むケース毎の値
+    massChange : np.ndarray = field(init=False, default=None)
+    refLengthChange : float = field(init=False, default=0.0)
+    iyzChange : float = field(init=False, default=0.0)
+    ixChange : float = field(init=False, default=0.0)
+    parachuteCd : np.ndarray = field(init=False, default=None)
+
+    # StateDerivativesが呼び出し毎に書き込む, 結果の記録に使う値 (計算したケース分)
+    airspeed : np.ndarray = field(init=False, default=None) # 対気速度の大きさ
+    force_b : np.ndarray = field(init=False, default=None)  # 機体座標系の外力 (N, 3)
+
+    def __post_init__(self):
+        self.massChange      = (self.bodySpec.massFinal - self.bodySpec.massInitial) * self.perturbation.mass
+        self.refLengthChange = self.bodySpec.CGLengthFinal - self.bodySpec.CGLengthInitial
+        self.iyzChange       = self.bodySpec.rollingMomentInertiaFinal - self.bodySpec.rollingMomentInertiaInitial
+        self.ixChange        = 0.01 - 0.02
+        self.parachuteCd     = self.bodySpec.parachutes[0].Cd * self.perturbation.parachuteCd
+
+def StateDerivatives(t : float, states : np.ndarray, params : BatchDynamicsParameter, out : np.ndarray,
+                     index : np.ndarray, onRail : np.ndarray, parachute : np.ndarray) -> np.ndarray:
+    '''
+    StateDerivativeのベクトル版. 各行の状態の時間微分を配列演算でまとめて計算する.
+    Args:
+        t         : 打上げからの経過時間 [s] (全ケース共通).
+        states    : (n, StateSize) の状態 (書き換えない).
+        params    : 機体・環境のパラメータ.
+        out       : 結果を書き込む (n, StateSize) の配列. outを返す.
+        index     : statesの各行に対応するケースのインデックス (params.windModelのケース).
+        onRail    : ランチレール上の行 (FlightPhase.Rail).
+        parachute : パラシュート降下中の行 (FlightPhase.Parachute. onRailとは重ならない). それ以外の行はFlightPhase.Flight.
+    params.airspeed, params.force_b に結果の記録に使う値 (StateDerivativeがbodyに書き込む値と同じ) を書き込む.
+    '''
+    spec = params.bodySpec
+    engine = spec.engine
+    windModel = params.windModel
+    P = params.perturbation
+    burnTime = P.burnTime[index]
+    engineTime = t / burnTime # 燃焼時間を伸縮した推力履歴上の時刻
+
+    px, py, pz, vx, vy, vz, qw, qx, qy, qz, wx, wy, wz, mass, refLength, iyz, ix = states.T
+    qn = np.sqrt(qw*qw + qx*qx + qy*qy + qz*qz)
+    qw, qx, qy, qz = qw / qn, qx / qn, qy / qn, qz / qn
+
+    windModel.update(pz, index)
+    windx, windy, windz = windModel.wind.T
+    rho, g = windModel.density, windModel.gravity
+
+    # 質量特性
+    burnRate = engine.burnRates(engineTime) / burnTime
+    out[:, MASS]       = params.massChange[index] * burnRate
+    out[:, REF_LENGTH] = params.refLengthChange * burnRate
+    out[:, IYZ]        = params.iyzChange * burnRate
+    out[:, IX]         = params.ixChange * burnRate
+
+    ab0, ab1, ab2 = _toBody(qw, qx, qy, qz, vx - windx, vy - windy, vz - windz)
+    airspeed, attackAngle = _airspeed(ab0, ab1, ab2, np.sqrt, np.arctan)
+    thrust = engine.thrustsAt(engineTime, windModel.pressure, P.thrust[index])
+    aero = spec.aeroCoeffStorage.valuesIn(airspeed, attackAngle, engine.didCombustions(engineTime), airspeed / windModel.speedOfSound)
+    fx, fy, fz, my, mz, _, _ = _airLoads(spec, rho, airspeed, attackAngle, ab0, ab1, ab2, thrust,
+                                         aero.Cd * P.Cd[index], aero.Cna * P.Cna[index], aero.Cp, refLength, wy, wz, np.arctan, np.cos)
+
+    gx, gy, gz = _toBody(qw, qx, qy, qz, 0.0, 0.0, -g * mass)
+    fx = fx + gx
+    fy = fy + gy
+    fz = fz + gz
+
+    railStop = onRail & (fx < 0.0) # 推力不足でレール上に静止
+    railMove = onRail & ~railStop  # 機軸方向 (ローンチレール方向) に離床
+    fy = np.where(railMove, 0.0, fy)
+    fz = np.where(railMove, 0.0, fz)
+
+    params.airspeed = airspeed
+    params.force_b = np.stack((np.where(parachute, thrust, fx), np.where(parachute, 0.0, fy), np.where(parachute, 0.0, fz)), axis=1)
+
+    ax, ay, az = _toGround(qw, qx, qy, qz, fx, fy, fz)
+    out[:, 0], out[:, 1], out[:, 2] = vx, vy, vz
+    out[:, 3], out[:, 4], out[:, 5] = ax / mass, ay / mass, az / mass
+    out[:, 6], out[:, 7], out[:, 8], out[:, 9] = _quaternionRate(qw, qx, qy, qz, wx, wy, wz)
+    out[:, 10] = 0.0 # ロールモーメントは考慮しない
+    out[:, 11] = my / iyz
+    out[:, 12] = mz / iyz
+
+    out[onRail, 6:13] = 0.0
+    out[railStop, 0:13] = 0.0
+    if np.any(parachute):
+        out[parachute, 0] = windx[parachute] # 水平方向は風に流される
+        out[parachute, 1] = windy[parachute]
+        out[parachute, 3:5] = 0.0
+        out[parachute, 5] = ParachuteAcceleration(rho[parachute], vz[parachute], params.parachuteCd[index[parachute]],
+                                                   mass[parachute], g[parachute])
+        out[parachute, 6:13] = 0.0
+    return out
+
+
+# ==================運動方程式の各項 (各成分はfloatまたは(n,)の配列)================== #
+
+def _toBody(qw, qx, qy, qz, ax, ay, az):
+    '''地上座標系のベクトルを機体座標系へ: q* a q = a - 2w(r x a) + 2r x (r x a)'''
+    cx, cy, cz = qy*az - qz*ay, qz*ax - qx*az, qx*ay - qy*ax
+    return (ax - 2*qw*cx + 2*(qy*cz - qz*cy),
+            ay - 2*qw*cy + 2*(qz*cx - qx*cz),
+            az - 2*qw*cz + 2*(qx*cy - qy*cx))
+
+def _toGround(qw, qx, qy, qz, fx, fy, fz):
+    '''機体座標系のベクトルを地上座標系へ: q f q* = f + 2w(r x f) + 2r x (r x f)'''
+    cx, cy, cz = qy*fz - qz*fy, qz*fx - qx*fz, qx*fy - qy*fx
+    return (fx + 2*qw*cx + 2*(qy*cz - qz*cy),
+            fy + 2*qw*cy + 2*(qz*cx - qx*cz),
+            fz + 2*qw*cz + 2*(qx*cy - qy*cx))
+
+def _airspeed(ab0, ab1, ab2, sqrt, atan):
+    '''機体座標系の対気速度から (対気速度の大きさ, 迎角). sqrt, atan はfloatならmath, 配列ならnumpyの関数'''
+    return sqrt(ab0*ab0 + ab1*ab1 + ab2*ab2), atan(sqrt(ab1*ab1 + ab2*ab2) / (ab0 + 1e-16))
+
+def _airLoads(spec : BodySpecification, rho, airspeed, attackAngle, ab0, ab1, ab2, thrust, Cd, Cna, Cp, refLength, wy, wz, atan, cos):
+    '''
+    機体座標系の推力と空気力 (fx, fy, fz), 空力モーメント (my, mz) と法線力係数 (Cnp, Cny). 重力は含まない.
+    atan, cos はfloatならmath, 配列ならnumpyの関数.
+    '''
+    Cnp = Cna * atan(ab2 / (ab0 + 1e-16))
+    Cny = Cna * atan(ab1 / (ab0 + 1e-16))
+
+    preForceCalc = 0.5 * rho * airspeed * airspeed * spec.bottomArea
+    fx = thrust - Cd * preForceCalc * cos(attackAngle)
+    fy = -Cny * preForceCalc
+    fz = -Cnp * preForceCalc
+
+    preMomentCalc = 0.25 * rho * airspeed * spec.length**2 * spec.bottomArea
+    arm = Cp - refLength
+    my = preMomentCalc * spec.Cmq * wy + fz * arm
+    mz = preMomentCalc * spec.Cmq * wz - fy * arm
+    return fx, fy, fz, my, mz, Cnp, Cny
+
+def _quaternionRate(qw, qx, qy, qz, wx, wy, wz):
+    '''dq/dt = q (0, omega) / 2'''
+    return (0.5 * (-qx*wx - qy*wy - qz*wz),
+            0.5 * ( qw*wx + qy*wz - qz*wy),
+            0.5 * ( qw*wy + qz*wx - qx*wz),
+            0.5 * ( qw*wz + qx*wy - qy*wx))
+
+def ParachuteAcceleration(rho, vz, Cd, mass, g):
+    '''パラシュート降下中の鉛直方向の加速度 (抗力 - 重力)'''
+    return 0.5 * rho * vz * vz * Cd / mass - g
@@ -9,29 +9,25 @@ EN Wikipedia: https://en.wikipedia.org/wiki/International_Standard_Atmosphere
 上記サイトが参照しているNASAの論文: https://ntrs.nasa.gov/citations/19770009539
 '''
 import numpy as np
-import pandas as pd
 from PyPrologue.app.AppSetting import *
+from PyPrologue.utils.InputLoader import LoadTable
 from PyPrologue.app.CommandLine import *
 import PyPrologue.misc.Constant as Constant
 from dataclasses import dataclass
 from typing import Literal
+from pathlib import Path
+from bisect import bisect_left
+from math import sqrt
 
 
-@dataclass
-class WindData:
-    '''
-    風データ構造体
-    '''
-    height : float = 0
-    speed : float = 0
-    direction : float = 0
-
 class WindModel :
-    _windData = np.array([], dtype=WindData)
+    _windHeight : np.ndarray = np.array([])  # 実測データの高度 (昇順)
+    _windU : np.ndarray = np.array([])       # 実測データの風速x成分 (東)
+    _windV : np.ndarray = np.array([])       # 実測データの風速y成分 (北)
     _groundWindSpeed : float     = 0
     _groundWindDirection : float = 0
     _directionInterval : float   = 0
-    _height : float              = 0
+    _height : float              = float("nan") # updateするまではどの高度とも一致しない
     _geopotentialHeight : float  = 0
     _airDensity : float          = 0
     _gravity : float             = 0
@@ -50,18 +46,28 @@ class WindModel :
             groundWindDirection : 地上風向 (original または only_powerlawでのみ有効)
         '''
         if AppSetting.windModel.type == WindModelType.Real:
-            df = pd.read_csv("input/wind/" + AppSetting.windModel.realdataFileName)
-            # df = df.sort_values(by=df.columns[0]) # sort by geopotentialheight
-            self._windData = np.array(WindData(0, 0, -magneticDeclination)) # MEMO : ほぼバグだけど一応
-            for idx, windData in df.iterrows():
-                self._windData = np.append(self._windData, 
-                    WindData(height=windData.iloc[0], speed=windData.iloc[1], direction=windData.iloc[2]-magneticDeclination))
+            profile = _loadWindProfile(Path("input/wind/" + AppSetting.windModel.realdataFileName))
+            # 先頭に地上 (高度0, 風速0) のデータを追加 # MEMO : ほぼバグだけど一応
+            height    = np.concatenate([[0.0], profile[:, 0]])
+            speed     = np.concatenate([[0.0], profile[:, 1]])
+            direction = np.concatenate([[0.0], profile[:, 2]]) - magneticDeclination
+            # 風向・風速は毎ステップ変換しなくて済むよう, ここで風速成分にしておく
+            rad = np.radians(direction)
+            self._windHeight = np.ascontiguousarray(height)
+            self._windU      = -np.sin(rad) * speed
+            self._windV      = -np.cos(rad) * speed
+            # スカラーの補間はfloatのリストの方が速い
+            self._windHeightList : list[float] = self._windHeight.tolist()
+            self._windUList : list[float]      = self._windU.tolist()
+            self._windVList : list[float]      = self._windV.tolist()
+            self._windCursor : int             = 0
         else:
             self._groundWindSpeed = groundwindSpeed
             self._groundWindDirection = (groundWindDirection - magneticDeclination) % 360
             self._directionInterval = 270 - self._groundWindDirection
             if self._directionInterval <= -45.0:
                 self._directionInterval += 360
+        self._layers = _getLayers()
         
         
     
@@ -78,12 +84,16 @@ class WindModel :
                 None    
         '''
         self._height = height
-        # この順番で計算しないと値が上手く更新されないので注意
-        self._geopotentialHeight = self.__getGeopotentialHeight()
-        self._gravity = self.__getGravity()
-        self._temperature = self.__getTemperature()
-        self._pressure = self.__getPressure()
-        self._airDensity = self.__getAirDensity()
+        if AppSetting.atmosphere.tabulated:
+            self._geopotentialHeight, self._gravity, self._temperature, self._pressure, self._airDensity = \
+                _getAtmosphereTable().valueAt(height)
+        else:
+            # この順番で計算しないと値が上手く更新されないので注意
+            self._geopotentialHeight = self.__getGeopotentialHeight()
+            self._gravity = self.__getGravity()
+            self._temperature = self.__getTemperature()
+            self._pressure = self.__getPressure()
+            self._airDensity = self.__getAirDensity()
         
         match AppSetting.windModel.type:
             case WindModelType.Real:
@@ -94,6 +104,24 @@ class WindModel :
                 self._wind = self.__getWindOnlyPowerLaw()
             case _: # NoWind or exception
                 self._wind = -np.array([0.0, 0.0, 0.0])
+    
+    def valueAt(self, height : float) -> tuple[float, float, float, float, float, float, float]:
+        '''高度における (風速x, 風速y, 風速z, 空気密度, 重力加速度, 気圧, 音速).'''
+        return tuple(self.valueInto([0.0] * 7, height))
+
+    def valueInto(self, out : list[float], height : float) -> list[float]:
+        '''
+        valueAtの結果を呼び出し側のリスト (out, 要素数7) に書き込み, outを返す.  
+        RocketDynamics.DynamicsParameter.windInto に渡す. 直前にupdateした高度と同じなら計算し直さない.
+        '''
+        if height != self._height:
+            self.update(height)
+        out[0], out[1], out[2] = self._wind.tolist()
+        out[3] = self._airDensity
+        out[4] = self._gravity
+        out[5] = self._pressure
+        out[6] = self.speedOfSound
+        return out
 
     @property
     def geopotentialHeight(self) -> float:
@@ -124,13 +152,18 @@ class WindModel :
     def __getTemperature(self) -> float:
         '''Formula from: https://pigeon-poppo.com/standard-atmosphere/#i-3'''
         geopotentialHeight = self._geopotentialHeight
-        for thresold, layer in zip(_layerThresholds[1:], _layers):
+        for thresold, layer in zip(_layerThresholds[1:], self._layers):
             if (geopotentialHeight < thresold):
                 return layer.baseTemperature + layer.lapseRate * geopotentialHeight
         
         raise ValueError(f"Current height is {self._height} m. "
                 + "Wind model is not defined above 32000 m.")
     
+    @property
+    def speedOfSound(self) -> float:
+        '''音速 [m/s] (気温から求める)'''
+        return sqrt(Constant.HeatCapacityRatio * Constant.GasConstant * (self._temperature - Constant.AbsoluteZero))
+    
     @property
     def pressure(self):
         return self._pressure
@@ -140,7 +173,7 @@ class WindModel :
         はじめに記載した参考文献はおそらく間違っている  
         https://pigeon-poppo.com/standard-atmosphere/#i-4'''
         geopotentialHeight = self._geopotentialHeight
-        for thresold, layer in zip(_layerThresholds[1:], _layers):
+        for thresold, layer in zip(_layerThresholds[1:], self._layers):
             if geopotentialHeight < thresold:
                 k : float = layer.lapseRate * self._height
                 return layer.basePressure * (1  + k / (self.temperature - Constant.AbsoluteZero - k)) ** 5.257
@@ -156,25 +189,24 @@ class WindModel :
         return self.pressure / ((self.temperature - Constant.AbsoluteZero) * Constant.GasConstant)
     
     def __getWindFromData(self) -> np.ndarray:
-        idx = 0
-        for data in self._windData:
-            if data.height < self._height:
-                idx = idx+1
-            else: break
-        
-        if idx == 0:    
-            return np.array([0, 0, 0])
+        # heights[idx-1] < height <= heights[idx] となるidxを探す.
+        # 高度は連続的に変化するので, 前回の区間から始めて外れた場合のみ二分探索する
+        heights = self._windHeightList
+        idx = self._windCursor
+        if not (0 < idx < len(heights) and heights[idx-1] < self._height <= heights[idx]):
+            idx = bisect_left(heights, self._height)
+            self._windCursor = idx
         
-        if idx == len(self._windData) : idx = idx-1
-        windData1 = self._windData[idx-1]
-        windData2 = self._windData[idx]
+        if idx == 0:
+            return np.array([0.0, 0.0, 0.0])
         
-        windSpeed = np.interp(self._height, [windData1.height, windData2.height], [windData1.speed, windData2.speed])
-        direction = np.interp(self._height, [windData1.height, windData2.height], [windData1.direction, windData2.direction])
+        if idx == len(heights) : idx = idx-1 # データより高い場合は最後の値で頭打ち
+        height1, height2 = heights[idx-1], heights[idx]
+        ratio = min(max((self._height - height1) / (height2 - height1), 0.0), 1.0) if height2 > height1 else 1.0
         
-        rad = np.radians(direction)
-        
-        return -np.array([np.sin(rad), np.cos(rad), 0]) * windSpeed
+        u = self._windUList[idx-1] + ratio * (self._windUList[idx] - self._windUList[idx-1])
+        v = self._windVList[idx-1] + ratio * (self._windVList[idx] - self._windVList[idx-1])
+        return np.array([u, v, 0.0])
     
     def __getWindOriginalModel(self) -> np.ndarray:
         if self._height <= 0:
@@ -230,15 +262,33 @@ class __Layer :
 # 32000 ~ [m]      : Undefined and an error will occur if the altitude exceeds this
 _layerThresholds = [0, 11000, 20000, 32000]
 
-# 各層におけるパラメータ
-_layers = [
-    __Layer(
-        baseTemperature=AppSetting.atmosphere.baseTemperature,
-        lapseRate=-6.5e-3,
-        basePressure=AppSetting.atmosphere.basePressure,
-        baseDensity=1.2985),
-    __Layer(baseTemperature=-56.5, lapseRate=0.0e-3, basePressure=22632.064, baseDensity=0.3639),
-    __Layer(baseTemperature=-76.5, lapseRate=1.0e-3, basePressure=5474.889,  baseDensity=0.0880)]
+# 各層におけるパラメータ (対流圏の基準値は設定ファイルから読むので, 初回の呼び出し時に作成する)
+_layers : list[__Layer] | None = None
+
+def _getLayers() -> list[__Layer]:
+    global _layers
+    if _layers is None:
+        _layers = [
+            __Layer(
+                baseTemperature=AppSetting.atmosphere.baseTemperature,
+                lapseRate=-6.5e-3,
+                basePressure=AppSetting.atmosphere.basePressure,
+                baseDensity=1.2985),
+            __Layer(baseTemperature=-56.5, lapseRate=0.0e-3, basePressure=22632.064, baseDensity=0.3639),
+            __Layer(baseTemperature=-76.5, lapseRate=1.0e-3, basePressure=5474.889,  baseDensity=0.0880)]
+    return _layers
+
+_layerArrays : np.ndarray | None = None
+
+def _getLayerArrays() -> np.ndarray:
+    '''各層の (基準気温, 気温減率, 基準気圧) を並べた(3, 層数)の配列 (_calcAtmosphereで毎回作らないように保持する)'''
+    global _layerArrays
+    if _layerArrays is None:
+        layers = _getLayers()
+        _layerArrays = np.array([[layer.baseTemperature for layer in layers],
+                                 [layer.lapseRate for layer in layers],
+                                 [layer.basePressure for layer in layers]])
+    return _layerArrays
 
 @dataclass
 class __Wind:
@@ -258,3 +308,236 @@ def _applyPowerLaw(height: float, windSpeed: float | None = None, wind: np.ndarr
         return wind * multiplier
     else:
         return None
+
+class BatchWindModel:
+    '''
+    複数ケースの高度を一括で扱う風モデル.  
+    WindModelと同じ計算をnp.ndarrayに対して行い, 各プロパティは要素数Nの配列 (windは(N, 3)) を返す.
+    '''
+    def __init__(self, 
+                 magneticDeclination : float = 0, groundWindSpeeds : np.ndarray | None = None, groundWindDirections : np.ndarray | None = None):
+        '''
+        コンストラクタ.
+        
+        Args:
+            magneticDeclination  : 磁気偏角.
+            groundWindSpeeds     : 各ケースの地上風速 (original または only_powerlawでのみ有効)
+            groundWindDirections : 各ケースの地上風向 (original または only_powerlawでのみ有効)
+        '''
+        self._groundWindSpeed = np.zeros(0) if groundWindSpeeds is None else np.asarray(groundWindSpeeds, dtype=float)
+        directions = np.zeros_like(self._groundWindSpeed) if groundWindDirections is None else np.asarray(groundWindDirections, dtype=float)
+        self._groundWindDirection = (directions - magneticDeclination) % 360
+        self._directionInterval = 270 - self._groundWindDirection
+        self._directionInterval[self._directionInterval <= -45.0] += 360
+        
+        if AppSetting.windModel.type == WindModelType.Real:
+            # WindModelと同様に地上 (高度0) のデータを先頭に追加する
+            realWindModel = WindModel(magneticDeclination=magneticDeclination)
+            self._dataHeight = realWindModel._windHeight
+            self._dataU      = realWindModel._windU
+            self._dataV      = realWindModel._windV
+        
+        self._height = np.zeros(0)
+        self._index : np.ndarray | slice = slice(None)
+        self._gravity = np.zeros(0)
+        self._temperature = np.zeros(0)
+        self._pressure = np.zeros(0)
+        self._airDensity = np.zeros(0)
+        self._wind = np.zeros((0, 3))
+    
+    def update(self, heights : np.ndarray, index : np.ndarray | None = None):
+        '''
+        高さを更新
+        Args:
+            heights : 各ケースの高度.
+            index   : heightsに対応するケースのインデックス (Noneなら全ケース).
+        '''
+        self._height = np.asarray(heights, dtype=float)
+        self._index = slice(None) if index is None else index
+        atmosphere = atmosphereAt(self._height)
+        self._gravity, self._temperature, self._pressure, self._airDensity = \
+            atmosphere.gravity, atmosphere.temperature, atmosphere.pressure, atmosphere.density
+        
+        match AppSetting.windModel.type:
+            case WindModelType.Real:
+                self._wind = self.__getWindFromData()
+            case WindModelType.Original:
+                self._wind = self.__getWindOriginalModel()
+            case WindModelType.OnlyPowerLaw:
+                self._wind = self.__getWindOnlyPowerLaw()
+            case _: # NoWind or exception
+                self._wind = np.zeros((len(self._height), 3))
+    
+    @property
+    def gravity(self) -> np.ndarray: return self._gravity
+    
+    @property
+    def temperature(self) -> np.ndarray: return self._temperature
+    
+    @property
+    def speedOfSound(self) -> np.ndarray:
+        '''音速 [m/s] (気温から求める)'''
+        return np.sqrt(Constant.HeatCapacityRatio * Constant.GasConstant * (self._temperature - Constant.AbsoluteZero))
+    
+    @property
+    def pressure(self) -> np.ndarray: return self._pressure
+    
+    @property
+    def density(self) -> np.ndarray: return self._airDensity
+    
+    @property
+    def wind(self) -> np.ndarray: return self._wind
+    
+    def __getWindFromData(self) -> np.ndarray:
+        __wind = np.stack([np.interp(self._height, self._dataHeight, self._dataU),
+                           np.interp(self._height, self._dataHeight, self._dataV),
+                           np.zeros_like(self._height)], axis=1)
+        __wind[self._height <= self._dataHeight[0]] = 0.0
+        return __wind
+    
+    def __getWindOriginalModel(self) -> np.ndarray:
+        # 3層分を(N, 3)の配列で作ってnp.selectで選ぶと, 小さいNではオーバーヘッドの方が大きいので成分毎に選ぶ
+        height = self._height
+        groundWindSpeed = self._groundWindSpeed[self._index]
+        positiveHeight = np.maximum(height, 0.0) # 冪乗則は地上 (height <= 0) では使わない
+        
+        deltaDirection = positiveHeight / wind.EkmanLayerLimit * self._directionInterval[self._index]
+        rad = np.radians(self._groundWindDirection[self._index] + np.where(height <= 0, 0.0, deltaDirection))
+        unitX, unitY = -np.sin(rad), -np.cos(rad)
+        
+        borderWindSpeed = _applyPowerLaw(positiveHeight, groundWindSpeed)
+        
+        # 接地境界層
+        surfaceWindSpeed = np.where(height <= 0, groundWindSpeed, borderWindSpeed)
+        
+        # エクマン層
+        k = (height - wind.surfaceLayerLimit) / (wind.surfaceLayerLimit * np.sqrt(2))
+        u = wind.geostrophicWind * (1 - np.exp(-k) * np.cos(k))
+        v = wind.geostrophicWind * np.exp(-k) * np.sin(k)
+        descentRate = (wind.geostrophicWind - u) / wind.geostrophicWind
+        ekmanWindSpeed = borderWindSpeed * descentRate
+        
+        # 地衡風は (-geostrophicWind, 0, 0)
+        surface = height < wind.surfaceLayerLimit
+        ekman   = height < wind.EkmanLayerLimit
+        __wind = np.empty((len(height), 3))
+        __wind[:, 0] = np.where(surface, unitX * surfaceWindSpeed, np.where(ekman, unitX * ekmanWindSpeed - u * -unitX, -wind.geostrophicWind))
+        __wind[:, 1] = np.where(surface, unitY * surfaceWindSpeed, np.where(ekman, unitY * ekmanWindSpeed - u * -unitY, 0.0))
+        __wind[:, 2] = np.where(surface | ~ekman, 0.0, -v)
+        return __wind
+    
+    def __getWindOnlyPowerLaw(self) -> np.ndarray:
+        rad = np.radians(self._groundWindDirection[self._index])
+        groundWind = -np.stack([np.sin(rad), np.cos(rad), np.zeros_like(rad)], axis=1) * self._groundWindSpeed[self._index][:, None]
+        multiplier = np.where(self._height <= 0, 1.0, _applyPowerLaw(np.maximum(self._height, 0.0), 1.0))
+        return groundWind * multiplier[:, None]
+
+@dataclass
+class AtmosphereData:
+    '''
+    大気の状態 (各値は高度と同じ形状の配列)
+    '''
+    geopotentialHeight : np.ndarray
+    gravity : np.ndarray
+    temperature : np.ndarray
+    pressure : np.ndarray
+    density : np.ndarray
+
+def atmosphereAt(heights : np.ndarray) -> AtmosphereData:
+    '''
+    複数の高度における大気の状態を一括で計算する.  
+    AppSetting.atmosphere.tabulatedが有効な場合は事前計算したテーブルを補間する.
+    Args:
+        heights : 高度.
+    '''
+    heights = np.asarray(heights, dtype=float)
+    if AppSetting.atmosphere.tabulated:
+        values = _getAtmosphereTable().valuesAt(heights)
+        return AtmosphereData(*np.moveaxis(values, -1, 0))
+    return _calcAtmosphere(heights)
+
+def _calcAtmosphere(heights : np.ndarray) -> AtmosphereData:
+    '''WindModel.updateの大気計算をベクトル化したもの'''
+    geopotentialHeight = Constant.EarthRadius * heights / (Constant.EarthRadius + heights)
+    gravity = Constant.G * (Constant.EarthRadius / (Constant.EarthRadius + heights))**2
+    
+    layers = _getLayerArrays()
+    layerIndex = np.searchsorted(_layerThresholds[1:], geopotentialHeight, side="right")
+    if np.any(layerIndex >= layers.shape[1]):
+        raise ValueError(f"Current height is {np.max(heights)} m. "
+                + "Wind model is not defined above 32000 m.")
+    baseTemperature, lapseRate, basePressure = layers[:, layerIndex]
+    
+    temperature = baseTemperature + lapseRate * geopotentialHeight
+    k = lapseRate * heights
+    pressure = basePressure * (1  + k / (temperature - Constant.AbsoluteZero - k)) ** 5.257
+    density = pressure / ((temperature - Constant.AbsoluteZero) * Constant.GasConstant)
+    
+    return AtmosphereData(geopotentialHeight, gravity, temperature, pressure, density)
+
+class _AtmosphereTable:
+    '''
+    ジオポテンシャル高度, 重力加速度, 気温, 気圧, 空気密度を_tableStep毎に事前計算したテーブル.  
+    等間隔なので補間区間はインデックス計算で直接求まる.
+    '''
+    def __init__(self):
+        # ジオポテンシャル高度32000 mに対応する幾何高度まで
+        maxHeight = _layerThresholds[-1] * Constant.EarthRadius / (Constant.EarthRadius - _layerThresholds[-1])
+        heights = np.arange(_tableMinHeight, maxHeight, _tableStep)
+        atmosphere = _calcAtmosphere(heights)
+        
+        self._minHeight : float = float(heights[0]) # numpyのスカラーは演算が遅いのでfloatにしておく
+        self._maxHeight : float = float(heights[-1])
+        self._values : np.ndarray = np.stack([atmosphere.geopotentialHeight,
+                                              atmosphere.gravity,
+                                              atmosphere.temperature,
+                                              atmosphere.pressure,
+                                              atmosphere.density], axis=-1)
+        self._rows : list[list[float]] = self._values.tolist() # スカラー用
+    
+    def valueAt(self, height : float) -> tuple[float, float, float, float, float]:
+        if height > self._maxHeight:
+            raise ValueError(f"Current height is {height} m. "
+                + "Wind model is not defined above 32000 m.")
+        
+        x = (height - self._minHeight) / _tableStep
+        idx = min(max(int(x), 0), len(self._rows) - 2) # テーブルより低い場合は最初の区間で外挿
+        frac = x - idx
+        # 要素数5の配列に対するnumpyの演算はオーバーヘッドの方が大きいので, floatのまま計算する
+        lower = self._rows[idx]
+        upper = self._rows[idx + 1]
+        return (lower[0] + frac * (upper[0] - lower[0]),
+                lower[1] + frac * (upper[1] - lower[1]),
+                lower[2] + frac * (upper[2] - lower[2]),
+                lower[3] + frac * (upper[3] - lower[3]),
+                lower[4] + frac * (upper[4] - lower[4]))
+    
+    def valuesAt(self, heights : np.ndarray) -> np.ndarray:
+        if np.any(heights > self._maxHeight):
+            raise ValueError(f"Current height is {np.max(heights)} m. "
+                + "Wind model is not defined above 32000 m.")
+        
+        x = (heights - self._minHeight) / _tableStep
+        idx = np.clip(x.astype(int), 0, len(self._values) - 2)
+        lower = self._values[idx]
+        upper = self._values[idx + 1]
+        return lower + (x - idx)[..., None] * (upper - lower)
+
+_tableMinHeight : float = -1000.0 # [m]
+_tableStep : float = 1.0 # [m]
+_atmosphereTable : _AtmosphereTable | None = None
+
+def _getAtmosphereTable() -> _AtmosphereTable:
+    '''テーブルは初回の呼び出し時に一度だけ作成する'''
+    global _atmosphereTable
+    if _atmosphereTable is None:
+        _atmosphereTable = _AtmosphereTable()
+    return _atmosphereTable
+
+def _loadWindProfile(filepath : Path) -> np.ndarray:
+    '''
+    実測風データ (高度, 風速, 風向) を高度の昇順に並べた(n, 3)の配列として読み込む.  
+    ファイルの解析はInputLoaderでキャッシュされるので, 解析毎に読み直すことはない.
+    '''
+    profile = LoadTable(filepath, usecols=(0, 1, 2))
+    return profile[np.argsort(profile[:, 0], kind="stable")] # sort by geopotentialheight
@@ -43,5 +43,13 @@ class GeoCoordinate:
         '''
         return self.__longitude + length / self.__degPerLen_longitude
     
+    def latitudeToLength(self, latitude) -> float:
+        '''latitudeAtの逆 (発射点からの南北方向の距離)'''
+        return (latitude - self.__latitude) * self.__degPerLen_latitude
+    
+    def longitudeToLength(self, longitude) -> float:
+        '''longitudeAtの逆 (発射点からの東西方向の距離)'''
+        return (longitude - self.__longitude) * self.__degPerLen_longitude
+    
     
         
\ No newline at end of file
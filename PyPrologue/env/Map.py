@@ -42,46 +42,42 @@ def __InitValue(*keys : str):
     
     return GetValueExc(__config_json_dict, *keys)
 
-NoshiroLand : MapData = MapData(
-    keyForJson="noshiro_land",
-    mapType=MapType.NOSHIRO_LAND,
-    magneticDeclination=__InitValue("nosiro_land", "magnetic_declination"), # type: ignore
-    launchPointLatitude=__InitValue("nosiro_land", "latitude"), # type: ignore
-    launchPointLongitude=__InitValue("nosiro_land", "longitude") # type: ignore
-)
-NoshiroSea : MapData = MapData(
-    keyForJson="nosiro_sea",
-    mapType=MapType.NOSHIRO_LAND,
-    magneticDeclination=__InitValue("nosiro_sea", "magnetic_declination"), # type: ignore
-    launchPointLatitude=__InitValue("nosiro_sea", "latitude"), # type: ignore
-    launchPointLongitude=__InitValue("nosiro_sea", "longitude") # type: ignore
-)
-IzuLand : MapData = MapData(
-    keyForJson="izu_land",
-    mapType=MapType.NOSHIRO_LAND,
-    magneticDeclination=__InitValue("izu_land", "magnetic_declination"), # type: ignore
-    launchPointLatitude=__InitValue("izu_land", "latitude"), # type: ignore
-    launchPointLongitude=__InitValue("izu_land", "longitude") # type: ignore
-)
-IzuSea : MapData = MapData(
-    keyForJson="izu_sea",
-    mapType=MapType.NOSHIRO_LAND,
-    magneticDeclination=__InitValue("izu_sea", "magnetic_declination"), # type: ignore
-    launchPointLatitude=__InitValue("izu_sea", "latitude"), # type: ignore
-    launchPointLongitude=__InitValue("izu_sea", "longitude") # type: ignore
-)
+# 変数名 -> (keyForJson, config.jsonのキー)
+# 各地図 (NoshiroLand等) は import時ではなく最初に参照したときに作る (config.jsonもその時に読み込む)
+__mapKeys : dict[str, tuple[str, str]] = {
+    "NoshiroLand" : ("noshiro_land", "nosiro_land"),
+    "NoshiroSea"  : ("nosiro_sea",   "nosiro_sea"),
+    "IzuLand"     : ("izu_land",     "izu_land"),
+    "IzuSea"      : ("izu_sea",      "izu_sea")
+}
+
+def __getattr__(name : str) -> MapData:
+    if name not in __mapKeys:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    keyForJson, configKey = __mapKeys[name]
+    mapData = MapData(
+        keyForJson=keyForJson,
+        mapType=MapType.NOSHIRO_LAND,
+        magneticDeclination=__InitValue(configKey, "magnetic_declination"), # type: ignore
+        launchPointLatitude=__InitValue(configKey, "latitude"), # type: ignore
+        launchPointLongitude=__InitValue(configKey, "longitude") # type: ignore
+    )
+    globals()[name] = mapData # 2回目以降は通常の変数として参照される
+    return mapData
+
+def __Map(name : str) -> MapData:
+    return globals()[name] if name in globals() else __getattr__(name)
 
 def GetMap(key : str) -> MapData | None:
-    global NoshiroLand, NoshiroSea, IzuLand, IzuSea
     match key:
         case "nosiro_land":
-            return NoshiroLand
+            return __Map("NoshiroLand")
         case "nosiro_sea":
-            return NoshiroSea
+            return __Map("NoshiroSea")
         case "izu_land":
-            return IzuLand
+            return __Map("IzuLand")
         case "izu_sea":
-            return IzuSea
+            return __Map("IzuSea")
         case _: # case default:
             return None
 
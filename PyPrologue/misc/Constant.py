@@ -9,4 +9,5 @@ Cl = 1.0
 G = 9.80665              # Base gravity [m/s^2]
 EarthRadius = 6378.137e3 # Earth radius [m]
 GasConstant = 287.0      # Gas constant of dry air [J/Kg*K]
+HeatCapacityRatio = 1.4  # Heat capacity ratio of dry air
 AbsoluteZero = -273.15   # kelvin<->celsius [K]
\ No newline at end of file
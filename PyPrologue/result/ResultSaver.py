@@ -5,8 +5,10 @@
 from PyPrologue.app.AppSetting import *
 from PyPrologue.app.CommandLine import *
 from PyPrologue.result.SimuResult import *
+from PyPrologue.result.ResultStore import SaveColumns
 from PyPrologue.solver.Solver import *
 
+import json
 import numpy as np
 from numpy.linalg import norm
 from pathlib import Path
@@ -70,14 +72,27 @@ class ResultSaver:
     ]
     
     @staticmethod
-    def SaveScatter(dir : Path | str, result : np.ndarray[SimuResultSummary]) -> None:
+    def SaveScatter(dir : Path | str, result : np.ndarray[SimuResultSummary], metadata : dict | None = None,
+                    footprint : dict | None = None) -> None:
+        '''
+        metadata  : バイナリ出力 (AppSetting.result.binaryFormat) に格納する実行条件
+        footprint : 落下範囲の統計量 (footprint.jsonに保存する)
+        '''
         if not isinstance(dir, Path): dir = Path(dir)
         if not dir.is_dir: return # error
         
         ResultSaver._write_summary_scatter(dir, result)
+        
+        if footprint:
+            with open(dir/"footprint.json", mode="w") as f:
+                json.dump(footprint, f, indent=4)
+        
+        if AppSetting.result.binaryFormat != BinaryFormat.NoOutput:
+            SaveColumns(dir/"summary", ResultSaver._summary_columns(result), metadata or {}, AppSetting.result.binaryFormat)
     
     @staticmethod
-    def SaveDetail(dir : Path | str, result : SimuResultSummary) -> None:
+    def SaveDetail(dir : Path | str, result : SimuResultSummary, metadata : dict | None = None) -> None:
+        '''metadata : バイナリ出力 (AppSetting.result.binaryFormat) に格納する実行条件'''
         if not isinstance(dir, Path): dir = Path(dir)
         if not dir.is_dir: return # error
         
@@ -89,45 +104,99 @@ class ResultSaver:
         for i in range(bodyCount):
             path : Path = dir/f"detail_body{i+1}.csv"
             with open(path, mode="w") as f:
-                ResultSaver._write_body_result(f, result.bodyResults[i].steps)
+                ResultSaver._write_body_result(f, result.bodyResults[i].record)
+        
+        # バイナリ出力は派生量ではなく記録したチャンネルをそのまま格納する
+        if AppSetting.result.binaryFormat != BinaryFormat.NoOutput:
+            SaveColumns(dir/"summary", ResultSaver._summary_columns(np.array([result])), metadata or {}, AppSetting.result.binaryFormat)
+            for i in range(bodyCount):
+                SaveColumns(dir/f"detail_body{i+1}", result.bodyResults[i].record.columns,
+                            {**(metadata or {}), "body": i + 1}, AppSetting.result.binaryFormat)
     
     @staticmethod
-    def _write_body_result(f : TextIOWrapper, stepResult : np.ndarray[SimuResultStep]) -> None:
+    def SaveDispersion(dir : Path | str, result : np.ndarray[SimuResultSummary], parameterNames : list[str],
+                       deviations : np.ndarray, statistics : dict, metadata : dict | None = None) -> None:
+        '''
+        Monte Carlo等の分散解析の結果を保存する.
+            summary.csv     : サンプル毎の主要な値 (Scatterと同じ書式)
+            samples.csv     : サンプル毎の偏差 (列はparameterNames)
+            dispersion.json : 落下地点の誤差楕円等の統計量
+        '''
+        if not isinstance(dir, Path): dir = Path(dir)
+        if not dir.is_dir: return # error
+        
+        ResultSaver._write_summary_scatter(dir, result)
+        
+        with open(dir/"samples.csv", mode="w") as f:
+            f.write(",".join(parameterNames) + "\n")
+            ResultSaver._write_columns(f, list(deviations.T))
+        
+        with open(dir/"dispersion.json", mode="w") as f:
+            json.dump(statistics, f, indent=4)
+        
+        if AppSetting.result.binaryFormat != BinaryFormat.NoOutput:
+            columns = ResultSaver._summary_columns(result)
+            columns.update({f"deviation_{name}": deviations[:, i] for i, name in enumerate(parameterNames)})
+            SaveColumns(dir/"summary", columns, metadata or {}, AppSetting.result.binaryFormat)
+    
+    @staticmethod
+    def _write_body_result(f : TextIOWrapper, record : SimuResultRecorder) -> None:
+        col = record.columns
+        mass = col["rocket_mass"]
+        forceNormal = np.hypot(col["rocket_force_b_y"], col["rocket_force_b_z"])
+        force = np.hypot(col["rocket_force_b_x"], forceNormal)
+        
+        boolean = lambda name: np.where(col[name] != 0.0, "True", "False")
+        vectorNorm = lambda name: np.sqrt(col[name + "_x"]**2 + col[name + "_y"]**2 + col[name + "_z"]**2)
+        
+        columns = [
+            # general
+            col["gen_timeFromLaunch"], col["gen_elapsedTime"],
+            
+            # boolean
+            boolean("launchClear"), boolean("combusting"), boolean("parachuteOpened"),
+            
+            # air
+            col["air_density"], col["air_gravity"], col["air_pressure"],
+            col["air_temperature"], col["air_wind_x"], col["air_wind_y"], col["air_wind_z"],
+            
+            # body
+            mass, col["rocket_cgLength"], col["rocket_iyz"],
+            col["rocket_ix"], col["rocket_attackAngle"],
+            col["rocket_pos_z"], vectorNorm("rocket_velocity"),
+            vectorNorm("rocket_airspeed_b"), force / mass,
+            col["rocket_force_b_x"] / mass,
+            forceNormal,
+            col["Cnp"], col["Cny"], col["Cmqp"], col["Cmqy"],
+            col["Cp"], col["Cd"], col["Cna"],
+            
+            # position
+            col["latitude"], col["longitude"], col["downrange"],
+            
+            # calculated
+            col["Fst"], col["dynamicPressure"]
+        ]
+        
         # write header
         f.write(",".join(ResultSaver.headerDetail))
-        
         f.write("\n")
-        for step, _ in zip(stepResult, progress_bar(len(stepResult))):
-            step : SimuResultStep
-            
-            line = ",".join(map(str, [
-                # general
-                step.gen_timeFromLaunch, step.gen_elapsedTime,
-                
-                # boolean
-                step.launchClear, step.combusting, step.parachuteOpened,
-                
-                # air
-                step.air_density, step.air_gravity, step.air_pressure,
-                step.air_temperature, step.air_wind[0], step.air_wind[1], step.air_wind[2],
-                
-                # body
-                step.rocket_mass, step.rocket_cgLength, step.rocket_iyz, 
-                step.rocket_ix, step.rocket_attackAngle,
-                step.rocket_pos[2], norm(step.rocket_velocity),
-                norm(step.rocket_airspeed_b), norm(step.rocket_force_b) / step.rocket_mass,
-                step.rocket_force_b[0] / step.rocket_mass,
-                norm(step.rocket_force_b[1:]),
-                step.Cnp, step.Cny, step.Cmqp, step.Cmqy,
-                step.Cp, step.Cd, step.Cna,
-                
-                # position
-                step.latitude, step.longitude, step.downrange,
-                
-                # calculated
-                step.Fst, step.dynamicPressure
-            ]))  # 文字列型にキャストしてからカンマで結合
-            f.write(line + "\n") # 書き込み
+        ResultSaver._write_columns(f, columns)
+    
+    @staticmethod
+    def _write_columns(f : TextIOWrapper, columns : list[np.ndarray], chunkSize : int = 10000) -> None:
+        '''
+        列毎の配列をCSVの行として書き込む.
+        数値は "%.{precision}g" (AppSetting.result.precision), 文字列の列はそのまま書き込む.
+        chunkSize行毎に, 列をfloatのリストにしてから行の書式文字列で%演算する.
+        '''
+        floatFormat = f"%.{AppSetting.result.precision}g"
+        rowFormat = ",".join("%s" if column.dtype.kind == "U" else floatFormat for column in columns)
+        
+        rowCount = len(columns[0]) if len(columns) > 0 else 0
+        for start in range(0, rowCount, chunkSize):
+            stop = min(start + chunkSize, rowCount)
+            rows = zip(*[column[start:stop].tolist() for column in columns])
+            f.write("\n".join(rowFormat % row for row in rows) + "\n")
     
     @staticmethod
     def _write_summary_header(f : TextIOWrapper, bodyCount : int) -> None:
@@ -153,7 +222,25 @@ class ResultSaver:
             itertools.chain.from_iterable([[pos.latitude, pos.longitude] for pos in result.bodyFinalPositions])
         ) # PrologueではbodyがbodyCountに足りない場合に0で埋めているが，結果は変わらないので省略
         
-        f.write(",".join(map(str, cols)) + "\n")
+        f.write(",".join(f"%.{AppSetting.result.precision}g" % col for col in cols) + "\n")
+    
+    @staticmethod
+    def _summary_columns(results : np.ndarray[SimuResultSummary]) -> dict[str, np.ndarray]:
+        '''サマリーの列 (列名はCSVのヘッダーと同じ). bodyが足りない場合の落下地点はNaN'''
+        bodyCount = max([len(result.bodyFinalPositions) for result in results], default=0)
+        columns = dict(zip(ResultSaver.headerSumamry, np.array([[
+            result.windSpeed, result.windDirection,
+            result.launchClearTime, norm(result.launchClearVelocity),
+            result.maxAltitude, result.detectPeakTime,
+            result.maxVelocity, result.maxAirspeed,
+            result.maxNormalForceDuringRising
+        ] for result in results], dtype=float).reshape(len(results), -1).T))
+        for i in range(bodyCount):
+            columns[f"{i}_final_latitude"]  = np.array([result.bodyFinalPositions[i].latitude
+                                                        if i < len(result.bodyFinalPositions) else np.nan for result in results])
+            columns[f"{i}_final_longitude"] = np.array([result.bodyFinalPositions[i].longitude
+                                                        if i < len(result.bodyFinalPositions) else np.nan for result in results])
+        return columns
     
     @staticmethod
     def _write_summary_scatter(dir : Path, results : np.ndarray[SimuResultSummary]):
@@ -170,4 +257,4 @@ class ResultSaver:
         with open(file=dir/"summary.csv", mode="w") as f:
             ResultSaver._write_summary_header(f, len(result.bodyFinalPositions))
             
-            ResultSaver._write_summary(f, result)
\ No newline at end of file
+            ResultSaver._write_summary(f, result)
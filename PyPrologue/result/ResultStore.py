@@ -0,0 +1,131 @@
+'''
+結果の列指向バイナリ形式での保存・読み込み
+
+列名 -> 1次元配列 の辞書と, 実行条件のメタデータ (JSON化できる辞書) を1ファイルに格納する.
+- NPZ     : 列毎の .npy を非圧縮のzipに格納する. メタデータはJSON文字列として "__metadata__" に格納.
+            非圧縮なので, 各列をファイル上の位置から直接memmapできる.
+- Parquet : pyarrowがある場合のみ使用できる. メタデータはスキーマのメタデータ (b"pyprologue") に格納.
+            全ての列が同じ長さである必要がある.
+BinaryFormat.Auto (result.binary_format = "auto") はpyarrowがあり列の長さが揃っていればParquet, そうでなければNPZで保存する.
+
+読み込みは列を指定でき, 指定した列だけをmemmap (またはmemory_map) で開く.
+'''
+from PyPrologue.app.AppSetting import *
+from PyPrologue.app.CommandLine import *
+
+import json
+import struct
+import zipfile
+import importlib.util
+import numpy as np
+from pathlib import Path
+
+_metadataKey : str = "__metadata__"
+_parquetMetadataKey : bytes = b"pyprologue"
+_parquetWarned : bool = False
+
+def ParquetAvailable() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None # pyarrowは任意
+
+def SaveColumns(path : Path | str, columns : dict[str, np.ndarray], metadata : dict, format : BinaryFormat) -> Path:
+    '''
+    列を保存する. 拡張子はformatに合わせて付け替える.
+    Returns:
+        保存したファイルのパス.
+    '''
+    if not isinstance(path, Path): path = Path(path)
+    if format == BinaryFormat.Auto:
+        uniform = len({len(column) for column in columns.values()}) <= 1
+        format = BinaryFormat.Parquet if uniform and ParquetAvailable() else BinaryFormat.NPZ
+    if format == BinaryFormat.Parquet and not ParquetAvailable():
+        global _parquetWarned
+        if not _parquetWarned:
+            PrintInfo(PrintInfoType.Warning,
+                      "pyarrow is not installed.",
+                      "Result is saved as npz instead of parquet.")
+            _parquetWarned = True
+        format = BinaryFormat.NPZ
+
+    match format:
+        case BinaryFormat.Parquet:
+            path = path.with_suffix(".parquet")
+            import pyarrow as pa, pyarrow.parquet as pq # 重いので, 使うときに初めてインポートする
+            table = pa.table({name: np.ascontiguousarray(column) for name, column in columns.items()})
+            table = table.replace_schema_metadata({_parquetMetadataKey: json.dumps(metadata).encode()})
+            pq.write_table(table, path)
+        case _: # NPZ
+            path = path.with_suffix(".npz")
+            np.savez(path, **{name: np.ascontiguousarray(column) for name, column in columns.items()},
+                     **{_metadataKey: np.array(json.dumps(metadata))})
+    return path
+
+def LoadColumns(path : Path | str, columns : list[str] | None = None, mmap : bool = True) -> dict[str, np.ndarray]:
+    '''
+    列を読み込む.
+    Args:
+        path    : SaveColumnsで保存したファイル.
+        columns : 読み込む列名 (Noneなら全て).
+        mmap    : Trueならファイルをメモリに読み込まずmemmapで開く (読み取り専用).
+    '''
+    if not isinstance(path, Path): path = Path(path)
+
+    if path.suffix == ".parquet":
+        if not ParquetAvailable():
+            raise ImportError("pyarrow is required to read " + str(path))
+        import pyarrow.parquet as pq
+        table = pq.read_table(path, columns=columns, memory_map=mmap)
+        return {name: table.column(name).to_numpy() for name in table.column_names}
+
+    with zipfile.ZipFile(path) as archive:
+        names = [name[:-4] for name in archive.namelist() if name.endswith(".npy") and name[:-4] != _metadataKey]
+    if columns is not None:
+        missing = set(columns) - set(names)
+        if missing: raise KeyError(f"{sorted(missing)} are not in {path}")
+        names = columns
+
+    if mmap:
+        return {name: _memmapNpzMember(path, name) for name in names}
+    with np.load(path) as npz:
+        return {name: npz[name] for name in names}
+
+def LoadMetadata(path : Path | str) -> dict:
+    '''SaveColumnsで保存したメタデータを読み込む'''
+    if not isinstance(path, Path): path = Path(path)
+
+    if path.suffix == ".parquet":
+        if not ParquetAvailable():
+            raise ImportError("pyarrow is required to read " + str(path))
+        import pyarrow.parquet as pq
+        return json.loads(pq.read_schema(path).metadata[_parquetMetadataKey])
+
+    with np.load(path) as npz:
+        return json.loads(npz[_metadataKey].item())
+
+def _memmapNpzMember(path : Path, name : str) -> np.ndarray:
+    '''非圧縮npz内の .npy をmemmapで開く (圧縮されている場合は読み込む)'''
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(name + ".npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        with np.load(path) as npz:
+            return npz[name]
+
+    with open(path, "rb") as f:
+        # zipのローカルファイルヘッダ (30 byte + ファイル名 + 拡張フィールド) の後ろに .npy がそのまま入っている
+        f.seek(info.header_offset)
+        localHeader = f.read(30)
+        nameLength, extraLength = struct.unpack("<HH", localHeader[26:30])
+        f.seek(info.header_offset + 30 + nameLength + extraLength)
+
+        version = np.lib.format.read_magic(f)
+        match version:
+            case (1, 0):
+                shape, fortranOrder, dtype = np.lib.format.read_array_header_1_0(f)
+            case _:
+                shape, fortranOrder, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+
+    if np.prod(shape) == 0: # 空の領域はmemmapできない
+        return np.empty(shape, dtype=dtype)
+    if dtype.hasobject:
+        raise ValueError(f"{name} in {path} can not be memory-mapped")
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape, order="F" if fortranOrder else "C")
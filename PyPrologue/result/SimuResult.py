@@ -54,10 +54,101 @@ class SimuResultStep:
     Fst : float = 0
     dynamicPressure : float = 0
 
+class SimuResultRecorder:
+    '''ステップ毎の結果を列 (チャンネル) 毎のfloat64配列として格納する.  
+    容量が足りなくなったら2倍に拡張するので, 1ステップ当たりの追加はならしO(1).  
+    ベクトル量は成分毎 (e.g., rocket_pos -> rocket_pos_x, rocket_pos_y, rocket_pos_z), 真偽値は0/1として格納する.'''
+    channels : tuple[str, ...] = (
+        # general
+        "gen_timeFromLaunch", "gen_elapsedTime",
+        # Boolean
+        "launchClear", "combusting", "parachuteOpened",
+        # Air
+        "air_density", "air_gravity", "air_pressure", "air_temperature",
+        "air_wind_x", "air_wind_y", "air_wind_z",
+        # Body
+        "rocket_mass", "rocket_cgLength", "rocket_iyz", "rocket_ix", "rocket_attackAngle",
+        "rocket_pos_x", "rocket_pos_y", "rocket_pos_z",
+        "rocket_velocity_x", "rocket_velocity_y", "rocket_velocity_z",
+        "rocket_airspeed_b_x", "rocket_airspeed_b_y", "rocket_airspeed_b_z",
+        "rocket_force_b_x", "rocket_force_b_y", "rocket_force_b_z",
+        "Cnp", "Cny", "Cmqp", "Cmqy", "Cp", "Cd", "Cna",
+        # position
+        "latitude", "longitude", "downrange",
+        # calculated
+        "Fst", "dynamicPressure"
+    )
+    _channelIndex : dict[str, int] = {name: i for i, name in enumerate(channels)}
+    
+    def __init__(self, capacity : int = 1024):
+        self._buffer = np.empty((len(SimuResultRecorder.channels), max(1, capacity))) # 各行が1チャンネル
+        self._size : int = 0
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def append(self, values) -> None:
+        '''1ステップ分の値をchannelsの順に追加する'''
+        if self._size == self._buffer.shape[1]:
+            buffer = np.empty((self._buffer.shape[0], 2 * self._buffer.shape[1]))
+            buffer[:, :self._size] = self._buffer[:, :self._size]
+            self._buffer = buffer
+        self._buffer[:, self._size] = values
+        self._size += 1
+    
+    def column(self, name : str) -> np.ndarray:
+        '''チャンネルの値 (コピーではなくビューなので, 変更すると記録も変わる)'''
+        return self._buffer[SimuResultRecorder._channelIndex[name], :self._size]
+    
+    @property
+    def columns(self) -> dict[str, np.ndarray]:
+        '''チャンネル名と値の辞書'''
+        return {name: self._buffer[i, :self._size] for i, name in enumerate(SimuResultRecorder.channels)}
+    
+    def toStructuredArray(self) -> np.ndarray:
+        '''チャンネル名をフィールド名とする構造化配列 (コピー)'''
+        array = np.empty(self._size, dtype=[(name, np.float64) for name in SimuResultRecorder.channels])
+        for i, name in enumerate(SimuResultRecorder.channels):
+            array[name] = self._buffer[i, :self._size]
+        return array
+    
+    def keepLast(self) -> None:
+        '''最後のステップ以外を破棄する'''
+        if self._size > 1:
+            self._buffer = self._buffer[:, self._size-1:self._size].copy()
+            self._size = 1
+    
+    def toSteps(self) -> np.ndarray:
+        '''SimuResultStepの配列に変換する'''
+        col = self.columns
+        vec = lambda name, i: np.array([col[name + "_x"][i], col[name + "_y"][i], col[name + "_z"][i]])
+        return np.array([SimuResultStep(
+            gen_timeFromLaunch=col["gen_timeFromLaunch"][i], gen_elapsedTime=col["gen_elapsedTime"][i],
+            launchClear=bool(col["launchClear"][i]), combusting=bool(col["combusting"][i]),
+            parachuteOpened=bool(col["parachuteOpened"][i]),
+            air_density=col["air_density"][i], air_gravity=col["air_gravity"][i],
+            air_pressure=col["air_pressure"][i], air_temperature=col["air_temperature"][i],
+            air_wind=vec("air_wind", i),
+            rocket_mass=col["rocket_mass"][i], rocket_cgLength=col["rocket_cgLength"][i],
+            rocket_iyz=col["rocket_iyz"][i], rocket_ix=col["rocket_ix"][i],
+            rocket_attackAngle=col["rocket_attackAngle"][i],
+            rocket_pos=vec("rocket_pos", i), rocket_velocity=vec("rocket_velocity", i),
+            rocket_airspeed_b=vec("rocket_airspeed_b", i), rocket_force_b=vec("rocket_force_b", i),
+            Cnp=col["Cnp"][i], Cny=col["Cny"][i], Cmqp=col["Cmqp"][i], Cmqy=col["Cmqy"][i],
+            Cp=col["Cp"][i], Cd=col["Cd"][i], Cna=col["Cna"][i],
+            latitude=col["latitude"][i], longitude=col["longitude"][i], downrange=col["downrange"][i],
+            Fst=col["Fst"][i], dynamicPressure=col["dynamicPressure"][i]
+        ) for i in range(self._size)], dtype=SimuResultStep)
+
 @dataclass
 class SimuResultBody:
-    '''各body(rocket1, rocket2, rocket3, ...)でのSimuResultStepを格納'''
-    steps : np.ndarray = field(default_factory=lambda: np.array([], dtype=SimuResultStep))
+    '''各body(rocket1, rocket2, rocket3, ...)でのステップ毎の結果を格納'''
+    record : SimuResultRecorder = field(default_factory=SimuResultRecorder)
+    
+    @property
+    def steps(self) -> np.ndarray:
+        '''SimuResultStepの配列 (呼び出す度に生成するので注意)'''
+        return self.record.toSteps()
 
 @dataclass
 class BodyFinalPosition:
@@ -91,9 +182,13 @@ class SimuResultLogger:
     _rocketSpec :RocketSpecification
     _map : MapData
     _result : SimuResultSummary
+    _summaryOnly : bool = False
     
-    def __init__(self, rocketSpec : RocketSpecification, map : MapData, windSpeed : float, windDirection : float):
+    def __init__(self, rocketSpec : RocketSpecification, map : MapData, windSpeed : float, windDirection : float,
+                 summaryOnly : bool = False):
+        '''summaryOnly : ステップ毎の結果を記録せず, 最大値等の主要な値のみを更新する (scatter用)'''
         # あくまでもクラス変数としてアクセス
+        SimuResultLogger._summaryOnly = summaryOnly
         SimuResultLogger._rocketSpec = rocketSpec
         SimuResultLogger._map = map
         SimuResultLogger._result = SimuResultSummary()
@@ -104,20 +199,25 @@ class SimuResultLogger:
     def result(self):
         return SimuResultLogger._result
 
+    @property
+    def summaryOnly(self) -> bool:
+        return SimuResultLogger._summaryOnly
+
     @property
     def resultScatterFormat(self):
         result : SimuResultSummary = self._result
         
         # remove steps that are not landing point
         for body in result.bodyResults:
-            lastBody : SimuResultStep = body.steps[-1]
-            body.steps = np.array([lastBody])
+            body.record.keepLast()
         
         # remove body result that not contain valid landing point
-        return result.bodyResults[[body_result.steps[-1].rocket_pos[2]  <= 0 for body_result in result.bodyResults]]
+        return result.bodyResults[[body_result.record.column("rocket_pos_z")[-1]  <= 0 for body_result in result.bodyResults]]
     
     def pushBody(self):
-        SimuResultLogger._result.bodyResults = np.append(SimuResultLogger._result.bodyResults, SimuResultBody())
+        # summaryOnlyでは最終ステップのみ記録するので容量は1でよい
+        body = SimuResultBody(SimuResultRecorder(capacity=1)) if SimuResultLogger._summaryOnly else SimuResultBody()
+        SimuResultLogger._result.bodyResults = np.append(SimuResultLogger._result.bodyResults, body)
         SimuResultLogger._result.bodyFinalPositions = np.append(SimuResultLogger._result.bodyFinalPositions, BodyFinalPosition())
     
     def setLaunchClear(self, body : Body):
@@ -131,69 +231,64 @@ class SimuResultLogger:
     def update(self, bodyIndex : int, rocket : Rocket, body : Body, windModel : WindModel, combusting : bool):
         spec = SimuResultLogger._rocketSpec.bodySpec(bodyIndex=bodyIndex)
         
-        step = SimuResultStep(
+        SimuResultLogger._result.bodyResults[bodyIndex].record.append((
             # General
-            gen_elapsedTime=rocket.timeFromLaunch,
-            gen_timeFromLaunch=body.elapsedTime,
+            body.elapsedTime, rocket.timeFromLaunch,
             
             # Boolean
-            launchClear=rocket.launchClear,
-            combusting=combusting,
-            parachuteOpened=body.parachuteOpened,
+            rocket.launchClear, combusting, body.parachuteOpened,
             
             # Air
-            air_density=windModel.density,
-            air_gravity=windModel.gravity,
-            air_pressure=windModel.pressure,
-            air_temperature=windModel.temperature,
-            air_wind=windModel.wind,
+            windModel.density, windModel.gravity, windModel.pressure, windModel.temperature,
+            *windModel.wind,
             
             # body
-            rocket_mass=body.mass,
-            rocket_cgLength=body.refLength,
-            rocket_iyz=body.iyz,
-            rocket_ix=body.ix,
-            rocket_attackAngle=body.attackAngle,
-            rocket_pos=deepcopy(body.pos),
-            rocket_velocity=deepcopy(body.velocity),
-            rocket_airspeed_b=deepcopy(body.airspeed_b),
-            rocket_force_b=deepcopy(body.force_b),
-            Cnp=body.Cnp,
-            Cny=body.Cny,
-            Cmqp=body.Cmqp,
-            Cmqy=body.Cmqy,
-            Cp=body.aeroCoef.Cp,
-            Cd=body.aeroCoef.Cd,
-            Cna=body.aeroCoef.Cna,
+            body.mass, body.refLength, body.iyz, body.ix, body.attackAngle,
+            *body.pos, *body.velocity, *body.airspeed_b, *body.force_b,
+            body.Cnp, body.Cny, body.Cmqp, body.Cmqy,
+            body.aeroCoef.Cp, body.aeroCoef.Cd, body.aeroCoef.Cna,
             
             # position
-            latitude=SimuResultLogger._map.coordinate.latitudeAt(body.pos[1]),
-            longitude=SimuResultLogger._map.coordinate.longitudeAt(body.pos[0]),
-            downrange=norm(body.pos[0:2]),
+            SimuResultLogger._map.coordinate.latitudeAt(body.pos[1]),
+            SimuResultLogger._map.coordinate.longitudeAt(body.pos[0]),
+            norm(body.pos[0:2]),
             
             # calculated
-            Fst=100 * (body.aeroCoef.Cp - body.refLength) / spec.length,
-            dynamicPressure=0.5 * windModel.density * norm(body.airspeed_b)**2
-        )
-        
-        SimuResultLogger._result.bodyResults[bodyIndex].steps = np.append(SimuResultLogger._result.bodyResults[bodyIndex].steps, step)
+            100 * (body.aeroCoef.Cp - body.refLength) / spec.length,
+            0.5 * windModel.density * norm(body.airspeed_b)**2
+        ))
         
-        # update max
-        rising : bool = body.velocity[2] > 0
-        if SimuResultLogger._result.maxAltitude < body.pos[2]:
-            SimuResultLogger._result.maxAltitude   = body.pos[2]
-            SimuResultLogger._result.detectPeakTime = body.elapsedTime
-        if SimuResultLogger._result.maxVelocity < norm(body.velocity):
-            SimuResultLogger._result.maxVelocity = norm(body.velocity)
-        if SimuResultLogger._result.maxAirspeed < norm(body.airspeed_b):
-            SimuResultLogger._result.maxAirspeed = norm(body.airspeed_b)
-        if rising and SimuResultLogger._result.maxNormalForceDuringRising < norm(body.force_b[1:]):
-            SimuResultLogger._result.maxNormalForceDuringRising = norm(body.force_b[1:])
+        self.updateMaxima(body)
+    
+    def updateMaxima(self, body : Body):
+        '''最大値のみ更新する (summaryOnlyの場合はupdateの代わりに毎ステップ呼ぶ)'''
+        result = SimuResultLogger._result
+        if result.maxAltitude < body.pos[2]:
+            result.maxAltitude   = body.pos[2]
+            result.detectPeakTime = body.elapsedTime
+        velocity = norm(body.velocity)
+        if result.maxVelocity < velocity:
+            result.maxVelocity = velocity
+        airspeed = norm(body.airspeed_b)
+        if result.maxAirspeed < airspeed:
+            result.maxAirspeed = airspeed
+        if body.velocity[2] > 0: # rising
+            normalForce = norm(body.force_b[1:])
+            if result.maxNormalForceDuringRising < normalForce:
+                result.maxNormalForceDuringRising = normalForce
+    
     
+    def mergeMaxima(self, maxAltitude : float, detectPeakTime : float, maxVelocity : float, maxAirspeed : float):
+        '''ステップを経由せずに求めた最大値 (DescentSolverの結果等) を反映する'''
+        result = SimuResultLogger._result
+        if result.maxAltitude < maxAltitude:
+            result.maxAltitude    = maxAltitude
+            result.detectPeakTime = detectPeakTime
+        result.maxVelocity = max(result.maxVelocity, maxVelocity)
+        result.maxAirspeed = max(result.maxAirspeed, maxAirspeed)
     
     def organize(self):
         for bodyResult in SimuResultLogger._result.bodyResults:
-            for step in bodyResult.steps:
-                if step.rocket_pos[2] < 0:
-                    step.rocket_pos[2] = 0.0
+            altitude = bodyResult.record.column("rocket_pos_z") # ビューなので記録が書き換わる
+            altitude[altitude < 0] = 0.0
     
\ No newline at end of file
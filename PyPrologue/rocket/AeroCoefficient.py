@@ -1,13 +1,16 @@
 '''
-対気速度に対する係数決定のためのクラス
+対気速度 (またはMach数×迎角) に対する係数決定のためのクラス
 '''
+import copy
 import numpy as np
-import pandas as pd
 from pathlib import Path
+from PyPrologue.utils.InputLoader import LoadTable
+from bisect import bisect_right
 from dataclasses import dataclass
 
 @dataclass
 class AeroCoefSpec:
+    '''係数テーブルの1行 (AeroCoefficientStrage.tableの列の並び)'''
     airspeed : float = 0
     Cp : float   = 0
     Cp_a : float = 0
@@ -22,21 +25,142 @@ class AeroCoefficient:
     Cd : float  = 0
     Cna : float = 0
 
+class AeroCoefficientTable2D:
+    '''
+    Mach数×迎角の格子上で与えた係数テーブル (双線形補間).  
+    格子は等間隔 (インデックスを直接計算) でも不等間隔 (二分探索) でもよい. 範囲外は端の値.  
+    各セルの補間式 f = a + b*u + c*v + d*u*v (u, v はセル内の正規化座標) の係数を事前に計算しておく.
+    '''
+    # 値の並び
+    CP, CD_I, CD_F, CNA = range(4)
+    
+    def __init__(self, machs : np.ndarray, attackAngles : np.ndarray, values : np.ndarray):
+        '''
+        Args:
+            machs        : Mach数の格子 (昇順, 2点以上).
+            attackAngles : 迎角の格子 [rad] (昇順, 2点以上).
+            values       : (len(machs), len(attackAngles), 4) の係数 [Cp, Cd_i, Cd_f, Cna].
+        '''
+        self._machs = np.asarray(machs, dtype=float)
+        self._attackAngles = np.asarray(attackAngles, dtype=float)
+        v = np.asarray(values, dtype=float)
+        
+        c00, c10, c01, c11 = v[:-1, :-1], v[1:, :-1], v[:-1, 1:], v[1:, 1:]
+        self._cells = np.stack([c00, c10 - c00, c01 - c00, c11 - c10 - c01 + c00], axis=-1) # (nm-1, na-1, 4, 4)
+        self._cellRows : list[list[float]] = self._cells.reshape(-1, 16).tolist() # スカラー用
+        
+        self._machList : list[float] = self._machs.tolist()
+        self._attackAngleList : list[float] = self._attackAngles.tolist()
+        # 等間隔なら刻み幅, 不等間隔ならNone
+        self._machStep : float | None = _uniformStep(self._machs)
+        self._attackAngleStep : float | None = _uniformStep(self._attackAngles)
+    
+    @staticmethod
+    def fromCSV(filepath : Path) -> "AeroCoefficientTable2D":
+        '''
+        縦持ちのCSV (1行目はヘッダー) から読み込む.
+        列: Mach, 迎角[deg], Cp, Cd_i, Cd_f, Cna. (Mach, 迎角) の全ての組み合わせが必要.
+        Raises:
+            FileNotFoundError : ファイルが無い.
+            ValueError        : 拡張子が.csvでない, 列が足りない, 格子が埋まっていない (欠け・重複).
+        '''
+        if not isinstance(filepath, Path): filepath = Path(filepath)
+        if not filepath.exists():
+            raise FileNotFoundError(f"{filepath} does not exist.")
+        if filepath.suffix != ".csv":
+            raise ValueError(f"{filepath} is not a .csv file.")
+        
+        data = LoadTable(filepath)
+        if data.shape[1] < 6:
+            raise ValueError(f"{filepath} has {data.shape[1]} columns. Mach, AoA[deg], Cp, Cd_i, Cd_f and Cna are required.")
+        machs = np.unique(data[:, 0])
+        attackAngles = np.unique(data[:, 1])
+        if len(machs) < 2 or len(attackAngles) < 2:
+            raise ValueError(f"{filepath} needs at least 2 Mach numbers and 2 angles of attack.")
+        
+        values = np.full((len(machs), len(attackAngles), 4), np.nan)
+        values[np.searchsorted(machs, data[:, 0]), np.searchsorted(attackAngles, data[:, 1])] = data[:, 2:6]
+        if len(data) != len(machs) * len(attackAngles) or np.isnan(values).any():
+            raise ValueError(f"{filepath} must have exactly one row for each (Mach, AoA) pair "
+                             f"({len(machs)} x {len(attackAngles)} = {len(machs) * len(attackAngles)} rows, got {len(data)}).")
+        
+        return AeroCoefficientTable2D(machs, np.radians(attackAngles), values)
+    
+    def valueAt(self, mach : float, attackAngle : float) -> tuple[float, float, float, float]:
+        '''(Cp, Cd_i, Cd_f, Cna)'''
+        i, u = _locate(self._machList, self._machStep, mach)
+        j, v = _locate(self._attackAngleList, self._attackAngleStep, attackAngle)
+        c = self._cellRows[i * (len(self._attackAngleList) - 1) + j]
+        uv = u * v
+        return (c[0]  + c[1]  * u + c[2]  * v + c[3]  * uv,
+                c[4]  + c[5]  * u + c[6]  * v + c[7]  * uv,
+                c[8]  + c[9]  * u + c[10] * v + c[11] * uv,
+                c[12] + c[13] * u + c[14] * v + c[15] * uv)
+    
+    def valuesAt(self, machs : np.ndarray, attackAngles : np.ndarray) -> np.ndarray:
+        '''valueAtのベクトル版. (N, 4) の [Cp, Cd_i, Cd_f, Cna]'''
+        i, u = _locateArray(self._machs, machs)
+        j, v = _locateArray(self._attackAngles, attackAngles)
+        c = self._cells[i, j] # (N, 4, 4)
+        return c[..., 0] + c[..., 1] * u[..., None] + c[..., 2] * v[..., None] + c[..., 3] * (u * v)[..., None]
+    
+    def scaled(self, scales : np.ndarray) -> "AeroCoefficientTable2D":
+        '''係数 [Cp, Cd_i, Cd_f, Cna] をそれぞれ scales 倍したテーブルのコピー (補間式は係数に対して線形)'''
+        table = copy.copy(self)
+        table._cells = self._cells * np.asarray(scales, dtype=float)[:, None]
+        table._cellRows = table._cells.reshape(-1, 16).tolist()
+        return table
+
+def _uniformStep(grid : np.ndarray) -> float | None:
+    step = (grid[-1] - grid[0]) / (len(grid) - 1)
+    return float(step) if np.allclose(np.diff(grid), step, rtol=1e-9, atol=0.0) else None
+
+def _locate(grid : list[float], step : float | None, x : float) -> tuple[int, float]:
+    '''xを含むセルのインデックスとセル内の位置 (0~1)'''
+    if step is not None:
+        position = (x - grid[0]) / step
+        idx = min(max(int(position), 0), len(grid) - 2)
+    else:
+        idx = min(max(bisect_right(grid, x) - 1, 0), len(grid) - 2)
+        position = idx + (x - grid[idx]) / (grid[idx + 1] - grid[idx])
+    return idx, min(max(position - idx, 0.0), 1.0)
+
+def _locateArray(grid : np.ndarray, x : np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    x = np.asarray(x, dtype=float)
+    idx = np.clip(np.searchsorted(grid, x, side="right") - 1, 0, len(grid) - 2)
+    return idx, np.clip((x - grid[idx]) / (grid[idx + 1] - grid[idx]), 0.0, 1.0)
+
 class AeroCoefficientStrage:
+    '''
+    対気速度毎の係数テーブル.  
+    (n, 7) のfloat配列 [airspeed, Cp, Cp_a, Cd_i, Cd_f, Cd_a2, Cna] を対気速度の昇順に保持し,
+    二分探索した区間で全係数を一度に線形補間する (範囲外は端の値).
+    '''
+    # テーブルの列
+    AIRSPEED, CP, CP_A, CD_I, CD_F, CD_A2, CNA = range(7)
     
     def __init__(self):
-        self._aeroCoefSpec : np.ndarray[AeroCoefSpec] = np.array([], dtype=AeroCoefSpec)
+        self._table : np.ndarray = np.zeros((1, 7)) # 係数0の1行
+        self._airspeeds : list[float] = [0.0] # スカラー用 (bisect)
+        self._rows : list[list[float]] = self._table.tolist() # スカラー用
         self._constant : AeroCoefficient = AeroCoefficient()
         self._isTimeSeries : bool = False
+        self._table2D : AeroCoefficientTable2D | None = None # 指定した場合は対気速度のテーブルより優先
         
     
     @property
     def isTimeSeriesSpec(self): return self._isTimeSeries
     
+    @property
+    def is2DTable(self) -> bool: return self._table2D is not None
+    
+    @property
+    def table(self) -> np.ndarray:
+        '''(n, 7) の係数テーブル (列はAIRSPEED, CP, ..., CNA)'''
+        return self._table
+    
     def init_by_JSON(self, Cp : float, Cp_a : float, Cd_i : float, Cd_f : float, Cd_a2 : float, Cna : float):
-        self._aeroCoefSpec = np.array([AeroCoefSpec(
-            airspeed=0, Cp=Cp, Cp_a=Cp_a, Cd_i=Cd_i, Cd_f=Cd_f, Cd_a2=Cd_a2, Cna=Cna
-        )]) # type: ignore # 
+        self.__setTable(np.array([[0.0, Cp, Cp_a, Cd_i, Cd_f, Cd_a2, Cna]], dtype=float))
     
     def setConstant(self, Cp : float, Cd : float, Cna : float):
         self._constant = AeroCoefficient(Cp=Cp, Cd=Cd, Cna=Cna)
@@ -46,44 +170,92 @@ class AeroCoefficientStrage:
         if not filepath.exists() or filepath.suffix != ".csv":
             return
         
-        df = pd.read_csv(filepath)
-        if len(df.columns) < 7: return
-        df = df.sort_values(by=df.columns[0]) # airspeedで昇順ソート
-        self._aeroCoefSpec = df.apply(lambda row: AeroCoefSpec(row[0], row[1], row[2], row[3], row[4], row[5], row[6]), axis=1) # type: ignore
+        table = LoadTable(filepath)
+        if table.shape[1] < 7: return
+        table = table[:, :7]
+        self.__setTable(table[np.argsort(table[:, 0], kind="stable")]) # airspeedで昇順ソート
         
         self._isTimeSeries = True
     
-    def valueIn(self, airspeed : float, attackAngle : float, CombustionEnded : bool) -> AeroCoefficient:
-        spec : AeroCoefSpec
+    def init_by_table2D(self, filepath : Path) -> None:
+        '''Mach数×迎角のテーブル (AeroCoefficientTable2D.fromCSVの形式) を読み込む. 読み込めなければ例外を送出する'''
+        self._table2D = AeroCoefficientTable2D.fromCSV(filepath)
+    
+    def scaled(self, CdScale : float = 1.0, CnaScale : float = 1.0) -> "AeroCoefficientStrage":
+        '''抗力係数 (Cd_i, Cd_f, Cd_a2) を CdScale 倍, 法線力係数傾斜を CnaScale 倍したコピー'''
+        storage = copy.copy(self)
+        table = self._table.copy()
+        table[:, [AeroCoefficientStrage.CD_I, AeroCoefficientStrage.CD_F, AeroCoefficientStrage.CD_A2]] *= CdScale
+        table[:, AeroCoefficientStrage.CNA] *= CnaScale
+        storage.__setTable(table)
+        storage._constant = AeroCoefficient(Cp=self._constant.Cp, Cd=self._constant.Cd * CdScale, Cna=self._constant.Cna * CnaScale)
+        if self._table2D is not None:
+            storage._table2D = self._table2D.scaled([1.0, CdScale, CdScale, CnaScale])
+        return storage
+    
+    def __setTable(self, table : np.ndarray) -> None:
+        self._table = np.ascontiguousarray(table)
+        self._airspeeds = self._table[:, AeroCoefficientStrage.AIRSPEED].tolist()
+        self._rows = self._table.tolist()
+    
+    def valueIn(self, airspeed : float, attackAngle : float, CombustionEnded : bool, mach : float = 0.0) -> AeroCoefficient:
+        '''mach : Mach数 (2Dテーブルの場合のみ使う)'''
+        return self.valueInto(AeroCoefficient(), airspeed, attackAngle, CombustionEnded, mach)
+
+    def valueInto(self, out : AeroCoefficient, airspeed : float, attackAngle : float, CombustionEnded : bool,
+                  mach : float = 0.0) -> AeroCoefficient:
+        '''valueInの結果を呼び出し側のAeroCoefficient (out) に書き込み, outを返す'''
+        if self._table2D is not None:
+            Cp, Cd_i, Cd_f, Cna = self._table2D.valueAt(mach, attackAngle)
+            out.Cp = self._constant.Cp + Cp
+            out.Cd = self._constant.Cd + (Cd_f if CombustionEnded else Cd_i)
+            out.Cna = self._constant.Cna + Cna
+            return out
+
+        rows = self._rows
+        if airspeed <= self._airspeeds[0]:
+            row = rows[0]
+        elif airspeed >= self._airspeeds[-1]:
+            row = rows[-1]
+        else:
+            idx = bisect_right(self._airspeeds, airspeed)
+            lower, upper = rows[idx - 1], rows[idx]
+            ratio = (airspeed - lower[0]) / (upper[0] - lower[0])
+            # 要素数7の配列に対するnumpyの演算はオーバーヘッドの方が大きいので, floatのまま計算する
+            row = [l + ratio * (u - l) for l, u in zip(lower, upper)]
+
+        out.Cp = self._constant.Cp + row[1] + row[2] * attackAngle
+        out.Cd = self._constant.Cd + (row[4] if CombustionEnded else row[3]) + row[5] * attackAngle**2
+        out.Cna = self._constant.Cna + row[6]
+        return out
+    
+    def valuesIn(self, airspeeds : np.ndarray, attackAngles : np.ndarray, burnout : bool | np.ndarray,
+                 machs : np.ndarray | float = 0.0) -> AeroCoefficient:
+        '''
+        valueInのベクトル版.
+        Returns:
+            各フィールドが配列のAeroCoefficient.
+        '''
+        airspeeds = np.asarray(airspeeds, dtype=float)
+        if self._table2D is not None:
+            values = self._table2D.valuesAt(np.broadcast_to(machs, airspeeds.shape), np.broadcast_to(attackAngles, airspeeds.shape))
+            return AeroCoefficient(
+                Cp=self._constant.Cp + values[..., AeroCoefficientTable2D.CP],
+                Cd=self._constant.Cd + np.where(burnout, values[..., AeroCoefficientTable2D.CD_F], values[..., AeroCoefficientTable2D.CD_I]),
+                Cna=self._constant.Cna + values[..., AeroCoefficientTable2D.CNA]
+            )
         
-        if len(self._aeroCoefSpec) == 1:
-            spec = self._aeroCoefSpec[0]
+        table = self._table
+        if len(table) == 1:
+            rows = np.broadcast_to(table[0], airspeeds.shape + (7,))
         else:
-            if airspeed < self._aeroCoefSpec[0].airspeed:
-                spec = self._aeroCoefSpec[0]
-            elif airspeed > self._aeroCoefSpec[-1].airspeed:
-                spec = self._aeroCoefSpec[-1]
-            else:
-                idx = 0
-                for __spec in self._aeroCoefSpec:
-                    if __spec.airspeed > airspeed:
-                        idx = idx+1
-                    else: break
-                spec1 = self._aeroCoefSpec[idx-1]
-                spec2 = self._aeroCoefSpec[idx]
-                
-                spec = AeroCoefSpec(
-                    airspeed,
-                    np.interp(airspeed, [spec1.airspeed, spec2.airspeed], [spec1.Cp, spec2.Cp]), # type: ignore
-                    np.interp(airspeed, [spec1.airspeed, spec2.airspeed], [spec1.Cp_a, spec2.Cp_a]), # type: ignore
-                    np.interp(airspeed, [spec1.airspeed, spec2.airspeed], [spec1.Cd_i, spec2.Cd_i]), # type: ignore
-                    np.interp(airspeed, [spec1.airspeed, spec2.airspeed], [spec1.Cd_f, spec2.Cd_f]), # type: ignore
-                    np.interp(airspeed, [spec1.airspeed, spec2.airspeed], [spec1.Cd_a2, spec2.Cd_a2]), # type: ignore
-                    np.interp(airspeed, [spec1.airspeed, spec2.airspeed], [spec1.Cna, spec2.Cna]), # type: ignore
-                )
+            idx = np.clip(np.searchsorted(table[:, 0], airspeeds, side="right"), 1, len(table) - 1)
+            lower, upper = table[idx - 1], table[idx]
+            ratio = np.clip((airspeeds - lower[..., 0]) / (upper[..., 0] - lower[..., 0]), 0.0, 1.0)
+            rows = lower + ratio[..., None] * (upper - lower)
         
         return AeroCoefficient(
-            Cp=self._constant.Cp + spec.Cp + spec.Cp_a * attackAngle,
-            Cd=self._constant.Cd + (spec.Cd_f if CombustionEnded else spec.Cd_i) + spec.Cd_a2 * attackAngle**2,
-            Cna= self._constant.Cna + spec.Cna
-        )
\ No newline at end of file
+            Cp=self._constant.Cp + rows[..., 1] + rows[..., 2] * attackAngles,
+            Cd=self._constant.Cd + np.where(burnout, rows[..., 4], rows[..., 3]) + rows[..., 5] * np.square(attackAngles),
+            Cna=self._constant.Cna + rows[..., 6]
+        )
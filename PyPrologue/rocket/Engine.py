@@ -1,65 +1,230 @@
 '''
 エンジンクラス
+
+推力履歴は読み込み時に一度だけ前処理する.
+- 区間毎の傾きと, 各データ点までの累積力積 (台形則. 区分線形なので厳密) を計算.
+- 最小の時間間隔を幅とする等間隔の格子を作り, 各格子が始まる区間の番号を記録.
+  格子幅が最小間隔以下なので, 1つの格子に含まれるデータ点は高々数点であり,
+  時刻から格子番号を直接計算すれば二分探索無しで区間が決まる.
+同じ時刻のデータ点 (推力の不連続) はそのまま残し, np.interpと同様にその時刻では最後の点の値を使う.
 '''
+import copy
 import numpy as np
-import pandas as pd
 from pathlib import Path
 import PyPrologue.misc.Constant as Constant
-from dataclasses import dataclass
+from PyPrologue.app.CommandLine import *
+from PyPrologue.utils.InputLoader import LoadTable
+from dataclasses import dataclass, field
+from enum import Enum
+
+class MassDepletionType(Enum):
+    Linear = 1  # 燃焼時間に対して線形に減少
+    Impulse = 2 # 累積力積に比例して減少
 
 @dataclass
 class ThrustData:
-    time : np.ndarray[float] = np.array([])
-    thrust : np.ndarray[float] = np.array([])
+    time : np.ndarray[float] = field(default_factory=lambda: np.array([]))
+    thrust : np.ndarray[float] = field(default_factory=lambda: np.array([]))
+
+class Engine:
+    # 格子数の上限 (時刻が極端に近いデータ点がある場合)
+    _maxGridCount : int = 1 << 16
 
-class Engine:   
     def __init__(self):
         self.__thrustData : ThrustData = ThrustData()
         self.__thrustMeasurePressure = 101325  # [Pa]
         self.__nozzleArea = 0.0  # [m^2]
-        
+        self.massDepletion : MassDepletionType = MassDepletionType.Linear
+
         self.__exist : bool = False
-    
+        self.__setCurve(np.array([]), np.array([]))
+
     def loadThrustData(self, filepath : Path):
         if not isinstance(filepath, Path): filepath = Path(filepath)
         filepath = "input/thrust"/filepath
         if not filepath.is_file(): return False
-        print(filepath)
-        
-        df = pd.read_csv(filepath, header=None, sep=None, engine="python")
-        df = df.sort_values(df.columns[0])
-        
-        self.__thrustData = ThrustData(df.iloc[:, 0].to_numpy(), df.iloc[:, 1].to_numpy())
-                
+        PrintInfo(PrintInfoType.Information, f"Thrust data: {filepath}")
+
+        table = LoadTable(filepath, usecols=(0, 1))
+        if table.shape[1] < 2: return False
+        table = table[np.argsort(table[:, 0], kind="stable")] # 時刻で昇順ソート (コピー)
+
+        self.__thrustData = ThrustData(table[:, 0], table[:, 1])
+        self.__setCurve(self.__thrustData.time, self.__thrustData.thrust)
+
         self.__exist = True
-        return True        
-    
+        return True
+
+    def __setCurve(self, times : np.ndarray, thrusts : np.ndarray) -> None:
+        '''推力履歴の前処理'''
+        if len(times) == 0:
+            times, thrusts = np.zeros(1), np.zeros(1)
+
+        width = np.diff(times)
+        slope = np.divide(np.diff(thrusts), width, out=np.zeros_like(width), where=width > 0.0)
+        cumulativeImpulse = np.concatenate(([0.0], np.cumsum(0.5 * (thrusts[1:] + thrusts[:-1]) * width)))
+
+        # 等間隔の格子 -> その格子の開始時刻を含む区間
+        span = times[-1] - times[0]
+        if span > 0.0:
+            gridCount = min(int(np.ceil(span / np.min(width[width > 0.0]))), Engine._maxGridCount)
+            gridStep = span / gridCount
+            gridTimes = times[0] + gridStep * np.arange(gridCount + 1)
+            # 丸め誤差で格子番号が1つずれても良いように, 1つ前の格子の開始時刻を含む区間から探す
+            gridSegment = np.clip(np.searchsorted(times, gridTimes - gridStep, side="right") - 1, 0, max(len(times) - 2, 0))
+            self.__invGridStep : float = 1.0 / gridStep
+        else:
+            gridSegment = np.zeros(1, dtype=int)
+            self.__invGridStep = 0.0
+
+        self.__times = times
+        self.__thrusts = thrusts
+        self.__slopes = slope
+        self.__cumulativeImpulses = cumulativeImpulse
+        self.__gridSegments = gridSegment
+        # スカラー版はPythonのリストの方が速い
+        self.__timeList : list[float] = times.tolist()
+        self.__thrustList : list[float] = thrusts.tolist()
+        self.__slopeList : list[float] = slope.tolist()
+        self.__cumulativeImpulseList : list[float] = cumulativeImpulse.tolist()
+        self.__gridSegmentList : list[int] = gridSegment.tolist()
+        self.__lastSegment : int = max(len(times) - 2, 0)
+
+        self.__startTime : float = float(times[0])
+        self.__combustionTime : float = float(times[-1])
+        self.__totalImpulse : float = float(cumulativeImpulse[-1])
+        self.__maxThrust : float = float(np.max(thrusts))
+
+    def __segment(self, time : float) -> int:
+        '''時刻を含む区間の番号 (startTime <= time <= combustionTime)'''
+        s = self.__gridSegmentList[min(int((time - self.__startTime) * self.__invGridStep), len(self.__gridSegmentList) - 1)]
+        times = self.__timeList
+        while s < self.__lastSegment and time >= times[s + 1]:
+            s += 1
+        return s
+
+    def __segments(self, times : np.ndarray) -> np.ndarray:
+        '''__segmentのベクトル版'''
+        k = np.clip(((times - self.__startTime) * self.__invGridStep).astype(int), 0, len(self.__gridSegments) - 1)
+        s = self.__gridSegments[k]
+        while True:
+            advance = (s < self.__lastSegment) & (times >= self.__times[np.minimum(s + 1, len(self.__times) - 1)])
+            if not advance.any(): return s
+            s = s + advance
+
+    def __curveAt(self, time : float) -> float:
+        '''推力履歴の値 (区間外は0)'''
+        if time < self.__startTime or time > self.__combustionTime: return 0.0
+        if time == self.__combustionTime: return self.__thrustList[-1] # 終端の時刻が重複していても最後の値 (np.interpと同じ)
+        s = self.__segment(time)
+        return self.__thrustList[s] + self.__slopeList[s] * (time - self.__timeList[s])
+
     def thrustAt(self, time : float, pressure : float):
-        if self.didCombustion(time=time): return 0.0
-        
-        thrust = np.interp(time, self.__thrustData.time, self.__thrustData.thrust, left=0.0, right=0.0) # 外挿はせずに0. 内部はcだから早いはず...
-        
-        return thrust + (self.thrustMeasuredPressure - pressure) * self.__nozzleArea
-    
+        if time > self.__combustionTime or not self.__exist: return 0.0 # 燃焼終了
+
+        return self.__curveAt(time) + (self.thrustMeasuredPressure - pressure) * self.__nozzleArea
+
+    def thrustsAt(self, times : np.ndarray, pressures : np.ndarray | float, thrustScale : np.ndarray | float = 1.0) -> np.ndarray:
+        '''thrustAtのベクトル版. thrustScale : 推力履歴に掛ける倍率 (大気圧補正には掛けない)'''
+        times = np.asarray(times, dtype=float)
+        if not self.__exist: return np.zeros(np.broadcast(times, pressures).shape)
+
+        curve = self.__curvesAt(times) * thrustScale
+        return np.where(times > self.__combustionTime, 0.0, curve + (self.thrustMeasuredPressure - pressures) * self.__nozzleArea)
+
+    def __curvesAt(self, times : np.ndarray) -> np.ndarray:
+        '''__curveAtのベクトル版'''
+        inCurve = (times >= self.__startTime) & (times <= self.__combustionTime)
+        s = self.__segments(times)
+        curve = np.where(times == self.__combustionTime, self.__thrusts[-1], self.__thrusts[s] + self.__slopes[s] * (times - self.__times[s]))
+        return np.where(inCurve, curve, 0.0)
+
+    def impulseAt(self, time : float) -> float:
+        '''time までの累積力積 [N*s] (大気圧補正は含まない)'''
+        if not self.__exist or time <= self.__startTime: return 0.0
+        if time >= self.__combustionTime: return self.__totalImpulse
+        s = self.__segment(time)
+        return self.__cumulativeImpulseList[s] + 0.5 * (self.__thrustList[s] + self.__curveAt(time)) * (time - self.__timeList[s])
+
+    def burnRate(self, time : float) -> float:
+        '''
+        燃焼の進行率 (0 -> 1) の時間微分 [1/s].
+        質量・重心位置・慣性モーメントの変化量は (燃焼後の値 - 燃焼前の値) * burnRate.
+        '''
+        if not self.isCombusting(time): return 0.0
+        match self.massDepletion:
+            case MassDepletionType.Impulse if self.__totalImpulse > 0.0:
+                return self.__curveAt(time) / self.__totalImpulse
+            case _:
+                return 1.0 / self.__combustionTime
+
+    def burnRates(self, times : np.ndarray) -> np.ndarray:
+        '''burnRateのベクトル版'''
+        times = np.asarray(times, dtype=float)
+        if not self.__exist: return np.zeros(times.shape)
+        match self.massDepletion:
+            case MassDepletionType.Impulse if self.__totalImpulse > 0.0:
+                rates = self.__curvesAt(times) / self.__totalImpulse
+            case _:
+                rates = np.full(times.shape, 1.0 / self.__combustionTime)
+        return np.where(times < self.__combustionTime, rates, 0.0)
+
+    def scaled(self, thrustScale : float = 1.0, timeScale : float = 1.0) -> "Engine":
+        '''
+        推力を thrustScale 倍, 時刻を timeScale 倍 (燃焼時間を伸縮) した推力履歴のコピー.
+        全力積は thrustScale * timeScale 倍になる.
+        '''
+        engine = copy.copy(self)
+        if self.__exist:
+            engine.__thrustData = ThrustData(self.__thrustData.time * timeScale, self.__thrustData.thrust * thrustScale)
+            engine.__setCurve(engine.__thrustData.time, engine.__thrustData.thrust)
+        return engine
+
     @property
     def thrustMeasuredPressure(self): return self.__thrustMeasurePressure
-    
+
     @thrustMeasuredPressure.setter
     def thrustMeasuredPressure(self, pressure) -> None: self.__thrustMeasurePressure = pressure
-    
+
     @property
     def nozzleDiameter(self): return 2 * np.sqrt(self.__nozzleArea / np.pi)
-    
+
     @nozzleDiameter.setter
     def nozzleDiameter(self, diameter) -> None: self.__nozzleArea = np.pi * (diameter ** 2) / 4
-    
+
     @property
     def combustionTime(self) -> float:
         '''燃焼時間'''
-        return self.__thrustData.time[-1] if self.__exist else 0.0
-    
+        return self.__combustionTime if self.__exist else 0.0
+
+    @property
+    def ignitionTime(self) -> float:
+        '''推力履歴の開始時刻'''
+        return self.__startTime if self.__exist else 0.0
+
+    @property
+    def totalImpulse(self) -> float:
+        '''全力積 [N*s]'''
+        return self.__totalImpulse if self.__exist else 0.0
+
+    @property
+    def averageThrust(self) -> float:
+        '''平均推力 [N]'''
+        burnTime = self.combustionTime - self.ignitionTime
+        return self.totalImpulse / burnTime if burnTime > 0.0 else 0.0
+
+    @property
+    def maxThrust(self) -> float:
+        '''最大推力 [N]'''
+        return self.__maxThrust if self.__exist else 0.0
+
     def isCombusting(self, time : float) -> bool:
-        return time < self.combustionTime if self.__exist else False
-    
+        return time < self.__combustionTime if self.__exist else False
+
     def didCombustion(self, time : float) -> bool:
-        return time > self.combustionTime if self.__exist else True
\ No newline at end of file
+        return time > self.__combustionTime if self.__exist else True
+
+    def didCombustions(self, times : np.ndarray) -> np.ndarray:
+        '''didCombustionのベクトル版'''
+        times = np.asarray(times, dtype=float)
+        return times > self.__combustionTime if self.__exist else np.ones(times.shape, dtype=bool)
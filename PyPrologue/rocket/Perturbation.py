@@ -0,0 +1,69 @@
+'''
+機体仕様・発射環境の摂動 (分散解析用)
+
+倍率 (公称値で1) : mass (質量. 燃焼前後とも), Cd (抗力係数), Cna (法線力係数傾斜),
+                   thrust (推力), burnTime (推力履歴の時刻. 燃焼時間の伸縮), parachuteCd (パラシュートの抗力係数)
+差 (公称値で0)   : railAzimuth, railElevation (ランチャの方位角・上下角 [deg])
+多段ロケットでは全ての機体に同じ倍率を適用する.
+
+各値はスカラー (1ケース分) または (N,) の配列 (N ケース分. BatchSolver用) とする.
+'''
+from PyPrologue.rocket.RocketSpec import *
+from PyPrologue.env.Environment import Environment
+
+import copy
+import numpy as np
+from dataclasses import dataclass, fields
+
+@dataclass
+class Perturbation:
+    mass : np.ndarray | float = 1.0
+    Cd : np.ndarray | float = 1.0
+    Cna : np.ndarray | float = 1.0
+    thrust : np.ndarray | float = 1.0
+    burnTime : np.ndarray | float = 1.0
+    parachuteCd : np.ndarray | float = 1.0
+    railAzimuth : np.ndarray | float = 0.0
+    railElevation : np.ndarray | float = 0.0
+
+    @staticmethod
+    def fromDeviations(names : list[str], deviations : np.ndarray) -> "Perturbation":
+        '''
+        公称値からの偏差 (N, len(names)) から作る. 倍率は 1 + 偏差, 角度は偏差そのもの.
+        names : 摂動させる量 (Perturbationのフィールド名).
+        '''
+        deviations = np.asarray(deviations, dtype=float)
+        perturbation = Perturbation()
+        for name, deviation in zip(names, np.moveaxis(deviations, -1, 0)):
+            if name not in _nominal:
+                raise KeyError(f"\"{name}\" is not a perturbable parameter.")
+            setattr(perturbation, name, _nominal[name] + deviation)
+        return perturbation
+
+    def case(self, index : int) -> "Perturbation":
+        '''index番目のケースの摂動 (各値はスカラー)'''
+        values = {name : getattr(self, name) for name in _nominal}
+        return Perturbation(**{name : float(value[index]) if np.ndim(value) > 0 else float(value) for name, value in values.items()})
+
+    def broadcast(self, N : int) -> "Perturbation":
+        '''各値を (N,) の配列にする'''
+        return Perturbation(**{name: np.broadcast_to(np.asarray(getattr(self, name), dtype=float), (N,)) for name in _nominal})
+
+    def apply(self, spec : RocketSpecification, env : Environment) -> tuple[RocketSpecification, Environment]:
+        '''摂動を適用した仕様・環境のコピー (1ケース分. Solver用)'''
+        spec = copy.deepcopy(spec)
+        env = copy.copy(env)
+        for i in range(spec.bodyCount):
+            body : BodySpecification = spec.bodySpec(i)
+            body.massInitial *= self.mass
+            body.massFinal   *= self.mass
+            body.aeroCoeffStorage = body.aeroCoeffStorage.scaled(self.Cd, self.Cna)
+            body.engine = body.engine.scaled(self.thrust, self.burnTime)
+            for parachute in body.parachutes:
+                parachute.Cd *= self.parachuteCd
+        env.railAzimuth   += self.railAzimuth
+        env.railElevation += self.railElevation
+        return spec, env
+
+# フィールド名 -> 公称値 (倍率は1, 角度は0)
+_nominal : dict[str, float] = {field.name : field.default for field in fields(Perturbation)}
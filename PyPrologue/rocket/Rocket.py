@@ -2,47 +2,133 @@
 解析に用いる機体のパラメータ
 '''
 import numpy as np
-import quaternion
+from PyPrologue.utils.LazyImport import LazyImport
+quaternion = LazyImport("quaternion")
 from PyPrologue.rocket.AeroCoefficient import *
 from dataclasses import dataclass, field
 
-@dataclass
+# 状態ベクトルの並び (BodyのバッファとRocketDynamicsの状態ベクトルで共通)
+StateSize = 17
+POS       = slice(0, 3)
+VELOCITY  = slice(3, 6)
+QUAT      = slice(6, 10)
+OMEGA     = slice(10, 13)
+MASS      = 13
+REF_LENGTH= 14
+IYZ       = 15
+IX        = 16
+
 class Body:
-    # ========================delta exists========================= #
-    mass : float = 0                 # mass [kg]
-    refLength : float = 0            # length from nose to center of mass[m]
-    iyz : float = 0                  # inertia moment of pitching & yawing [kg*m^2]
-    ix : float = 0                   # inertia moment of rolling [kg*m^2]
-    pos : np.ndarray = 0             # position [m] (ENU coordinate)
-    velocity : np.ndarray = 0        # velocity [m/s] (ground speed)
-    omega_b : np.ndarray = 0        # angular velocity (roll,pitch,yaw)
-    quat : quaternion.quaternion = field(default_factory=lambda: np.quaternion(0, 0, 0, 0)) # quaternion
-    
-    # ========================delta not exists===================== #
-    aeroCoef : AeroCoefficient = field(default_factory=AeroCoefficient)
-    Cnp : float = 0; Cny : float = 0
-    Cmqp : float = 0; Cmqy : float = 0
-    force_b : np.ndarray = field(default_factory=lambda: np.array([0.0, 0.0, 0.0]))
-    moment_b : np.ndarray = field(default_factory=lambda: np.array([0.0, 0.0, 0.0]))
-    
-    # status
-    elapsedTime : float = 0.0  # [s]
-    parachuteIndex : int = 0
-    parachuteOpened : bool = False
-    waitForOpenPara : bool = False
-    detectPeak : bool = False
-    maxAltitude : float     = 0.0  # [m]
-    maxAltitudeTime : float = 0.0  # [s]
-    
-    # calculated
-    airspeed_b : np.ndarray = field(default_factory=lambda: np.array([0.0, 0.0, 0.0]))
-    attackAngle : float = 0
-    
+    '''
+    機体1つ分の状態.
+    微小変化量が存在する量 (pos, velocity, quat, omega_b, mass, refLength, iyz, ix) は
+    連続した1本のfloat64配列 (state) に格納し, pos, velocity, omega_b はそのビューを返す.
+    そのため状態のコピー・スナップショットは配列1本のコピーで済む.
+    '''
+    __slots__ = ("_state", "_pos", "_velocity", "_omega_b",
+                 "aeroCoef", "Cnp", "Cny", "Cmqp", "Cmqy", "force_b", "moment_b",
+                 "elapsedTime", "parachuteIndex", "parachuteOpened", "waitForOpenPara", "detectPeak",
+                 "maxAltitude", "maxAltitudeTime",
+                 "airspeed_b", "attackAngle")
+
+    def __init__(self, state : np.ndarray | None = None):
+        # ========================delta exists========================= #
+        self._state : np.ndarray = np.zeros(StateSize) if state is None else np.array(state, dtype=float)
+        self._pos : np.ndarray      = self._state[POS]      # position [m] (ENU coordinate)
+        self._velocity : np.ndarray = self._state[VELOCITY] # velocity [m/s] (ground speed)
+        self._omega_b : np.ndarray  = self._state[OMEGA]    # angular velocity (roll,pitch,yaw)
+
+        # ========================delta not exists===================== #
+        self.aeroCoef : AeroCoefficient = AeroCoefficient()
+        self.Cnp : float = 0; self.Cny : float = 0
+        self.Cmqp : float = 0; self.Cmqy : float = 0
+        self.force_b : np.ndarray = np.array([0.0, 0.0, 0.0])
+        self.moment_b : np.ndarray = np.array([0.0, 0.0, 0.0])
+
+        # status
+        self.elapsedTime : float = 0.0  # [s]
+        self.parachuteIndex : int = 0
+        self.parachuteOpened : bool = False
+        self.waitForOpenPara : bool = False
+        self.detectPeak : bool = False
+        self.maxAltitude : float     = 0.0  # [m]
+        self.maxAltitudeTime : float = 0.0  # [s]
+
+        # calculated
+        self.airspeed_b : np.ndarray = np.array([0.0, 0.0, 0.0])
+        self.attackAngle : float = 0
+
+    @property
+    def state(self) -> np.ndarray:
+        '''状態ベクトル (ビュー). 並びはRocketDynamicsの状態ベクトルと同じ'''
+        return self._state
+
+    @state.setter
+    def state(self, state : np.ndarray) -> None: self._state[:] = state
+
+    # 代入は値のコピー (ビューを差し替えない)
+    @property
+    def pos(self) -> np.ndarray: return self._pos
+    @pos.setter
+    def pos(self, value) -> None: self._pos[:] = value
+
+    @property
+    def velocity(self) -> np.ndarray: return self._velocity
+    @velocity.setter
+    def velocity(self, value) -> None: self._velocity[:] = value
+
+    @property
+    def omega_b(self) -> np.ndarray: return self._omega_b
+    @omega_b.setter
+    def omega_b(self, value) -> None: self._omega_b[:] = value
+
+    @property
+    def quat(self) -> "quaternion.quaternion":
+        '''姿勢 (np.quaternionは値型なので, 取得毎にバッファから作る)'''
+        return quaternion.quaternion(*self._state[QUAT].tolist())
+    @quat.setter
+    def quat(self, value : "quaternion.quaternion") -> None:
+        self._state[QUAT] = (value.w, value.x, value.y, value.z)
+
+    @property
+    def mass(self) -> float: return self._state.item(MASS) # mass [kg]
+    @mass.setter
+    def mass(self, value : float) -> None: self._state[MASS] = value
+
+    @property
+    def refLength(self) -> float: return self._state.item(REF_LENGTH) # length from nose to center of mass[m]
+    @refLength.setter
+    def refLength(self, value : float) -> None: self._state[REF_LENGTH] = value
+
+    @property
+    def iyz(self) -> float: return self._state.item(IYZ) # inertia moment of pitching & yawing [kg*m^2]
+    @iyz.setter
+    def iyz(self, value : float) -> None: self._state[IYZ] = value
+
+    @property
+    def ix(self) -> float: return self._state.item(IX) # inertia moment of rolling [kg*m^2]
+    @ix.setter
+    def ix(self, value : float) -> None: self._state[IX] = value
+
+    def copy(self) -> "Body":
+        '''状態バッファと配列を複製したBody (copy.deepcopyも同じ)'''
+        body = Body(self._state)
+        for name in Body.__slots__[4:]:
+            value = getattr(self, name)
+            setattr(body, name, value.copy() if isinstance(value, np.ndarray) else value)
+        body.aeroCoef = AeroCoefficient(self.aeroCoef.Cp, self.aeroCoef.Cd, self.aeroCoef.Cna)
+        return body
+
+    def __deepcopy__(self, memo) -> "Body": return self.copy()
+
+    def __repr__(self) -> str:
+        return f"Body(pos={self._pos}, velocity={self._velocity}, quat={self.quat}, omega_b={self._omega_b}, " \
+               f"mass={self.mass}, refLength={self.refLength}, iyz={self.iyz}, ix={self.ix}, elapsedTime={self.elapsedTime})"
 
 @dataclass
 class Rocket:
     # rocket1, rocket2+ , rocket3, ...
-    bodies : np.ndarray = field(default_factory=lambda: np.array([], dtype=Body))
-    
+    bodies : list[Body] = field(default_factory=list)
+
     timeFromLaunch : float = 0.0  # [s]
-    launchClear : bool = False
\ No newline at end of file
+    launchClear : bool = False
@@ -125,18 +125,37 @@ class RocketSpecification:
             spec.engine.thrustMeasuredPressure = specJson_dict[key]["thrust_measured_pressure"]
         if "engine_nozzle_diameter" in specJson_dict[key]:
             spec.engine.nozzleDiameter = specJson_dict[key]["engine_nozzle_diameter"]
+        if "mass_depletion" in specJson_dict[key]:
+            match str(specJson_dict[key]["mass_depletion"]).lower():
+                case "linear":
+                    spec.engine.massDepletion = MassDepletionType.Linear
+                case "impulse":
+                    spec.engine.massDepletion = MassDepletionType.Impulse
+                case _:
+                    PrintInfo(PrintInfoType.Warning,
+                              f"Rocket: {key}",
+                              "mass_depletion must be \"linear\" or \"impulse\".",
+                              "Mass is decreased linearly.")
         
-        spec.aeroCoeffStorage.init_by_CSV(GetValue(specJson_dict, key, "aero_coef_file", default_value=""))
-        if spec.aeroCoeffStorage.isTimeSeriesSpec:
-            PrintInfo(PrintInfoType.Information, f"Rocket: {key}", "Aero coefficients are set from CSV")
+        if HasKey(specJson_dict, key, "aero_coef_2d_file"):
+            try:
+                spec.aeroCoeffStorage.init_by_table2D(specJson_dict[key]["aero_coef_2d_file"])
+            except (OSError, ValueError) as e: # 指定したテーブルが使えない場合は1次元の係数で代用しない
+                PrintInfo(PrintInfoType.Error, f"Rocket: {key}", "aero_coef_2d_file could not be loaded.", str(e))
+                raise
+            PrintInfo(PrintInfoType.Information, f"Rocket: {key}", "Aero coefficients are set from Mach-AoA table")
         else:
-            PrintInfo(PrintInfoType.Information, f"Rocket: {key}", "Aero coefficients are set from JSON")
-            spec.aeroCoeffStorage.init_by_JSON(GetValueExc(specJson_dict, key, "CPlen"),
-                                               GetValue(specJson_dict, key, "CP_alpha"),
-                                               GetValueExc(specJson_dict, key, "Cd_i"),
-                                               GetValueExc(specJson_dict, key, "Cd_f"),
-                                               GetValue(specJson_dict, key, "Cd_alpha2"),
-                                               GetValueExc(specJson_dict, key, "Cna"))
+            spec.aeroCoeffStorage.init_by_CSV(specJson_dict[key]["aero_coef_file"] if HasKey(specJson_dict, key, "aero_coef_file") else "")
+            if spec.aeroCoeffStorage.isTimeSeriesSpec:
+                PrintInfo(PrintInfoType.Information, f"Rocket: {key}", "Aero coefficients are set from CSV")
+            else:
+                PrintInfo(PrintInfoType.Information, f"Rocket: {key}", "Aero coefficients are set from JSON")
+                spec.aeroCoeffStorage.init_by_JSON(GetValueExc(specJson_dict, key, "CPlen"),
+                                                   GetValue(specJson_dict, key, "CP_alpha"),
+                                                   GetValueExc(specJson_dict, key, "Cd_i"),
+                                                   GetValueExc(specJson_dict, key, "Cd_f"),
+                                                   GetValue(specJson_dict, key, "Cd_alpha2"),
+                                                   GetValueExc(specJson_dict, key, "Cna"))
         self._bodySpecs = np.append(self._bodySpecs, spec)
         
         try:
@@ -0,0 +1,297 @@
+'''
+分散解析 (Monte Carlo・Unscented変換) 用の関数
+
+不確かさのある量 (UncertainParameter) は prologue.settings.json の simulation.dispersion.parameters で指定する.
+    "dispersion": {
+        "samples" : 10000,
+        "seed"    : 0,
+        "parameters" : {
+            "mass"           : {"distribution": "normal",  "sigma": 0.02},          // 倍率の偏差 (1 + N(0, 0.02^2))
+            "Cd"             : {"distribution": "uniform", "min": -0.1, "max": 0.1},
+            "rail_azimuth"   : {"distribution": "normal",  "mean": 0.0, "sigma": 2.0} // 角度は偏差 [deg] そのもの
+        }
+    }
+キー : mass, Cd, Cna, thrust, burn_time, parachute_Cd (倍率 - 1), rail_azimuth, rail_elevation ([deg]),
+       wind_speed ([m/s]), wind_direction ([deg]) (解析条件の風速・風向からの偏差)
+分布 : normal (mean (省略時0), sigma), uniform (min, max)
+
+サンプルは [0, 1) の点 (PyPrologue/utils/Sampler.py) を各分布の逆累積分布関数 (ppf) で変換して作る.
+点の生成方法は "sampler" で指定する ("random" (省略時), "lhs", "sobol").
+"lhs", "sobol" は空間を一様に埋めるので, 同じ精度の誤差楕円をより少ないサンプル数で得られる.
+収束の様子は, サンプル数を倍々にした先頭からの部分集合での推定値 (FootprintConvergence) として出力する.
+
+Unscented変換 (SigmaPoints) は各分布の平均・分散のみを使い, パラメータ数nに対して2n+1点の解析で
+出力の平均・共分散を近似する. シグマ点の広がりは simulation.dispersion.unscented の alpha, beta, kappa で指定する.
+'''
+from PyPrologue.rocket.Perturbation import Perturbation
+from PyPrologue.result.SimuResult import *
+from PyPrologue.env.GeoCoordinate import GeoCoordinate
+from PyPrologue.utils.Sampler import *
+
+import numpy as np
+from enum import Enum, auto
+from statistics import NormalDist
+from dataclasses import dataclass
+
+class DistributionType(Enum):
+    Normal = 1
+    Uniform = auto()
+
+@dataclass
+class UncertainParameter:
+    name : str # Perturbationのフィールド名
+    distribution : DistributionType
+    a : float  # Normal: 平均, Uniform: 最小値
+    b : float  # Normal: 標準偏差, Uniform: 最大値
+
+    def ppf(self, u : np.ndarray) -> np.ndarray:
+        '''逆累積分布関数 (u : [0, 1) の一様乱数)'''
+        u = np.asarray(u, dtype=float)
+        match self.distribution:
+            case DistributionType.Normal:
+                u = np.clip(u, 1e-12, 1.0 - 1e-12) # inv_cdfは0, 1で発散する
+                inv_cdf = np.vectorize(NormalDist(self.a, self.b).inv_cdf, otypes=[float])
+                return inv_cdf(u)
+            case DistributionType.Uniform:
+                return self.a + (self.b - self.a) * u
+
+    @property
+    def mean(self) -> float:
+        match self.distribution:
+            case DistributionType.Normal:  return self.a
+            case DistributionType.Uniform: return 0.5 * (self.a + self.b)
+
+    @property
+    def variance(self) -> float:
+        match self.distribution:
+            case DistributionType.Normal:  return self.b**2
+            case DistributionType.Uniform: return (self.b - self.a)**2 / 12.0
+
+# 設定ファイルのキー -> Perturbationのフィールド名
+_parameterKeys : dict[str, str] = {
+    "mass"           : "mass",
+    "Cd"             : "Cd",
+    "Cna"            : "Cna",
+    "thrust"         : "thrust",
+    "burn_time"      : "burnTime",
+    "parachute_Cd"   : "parachuteCd",
+    "rail_azimuth"   : "railAzimuth",
+    "rail_elevation" : "railElevation",
+    "wind_speed"     : "windSpeed",
+    "wind_direction" : "windDirection"
+}
+# Perturbationではなく解析条件の風速・風向に加えるもの
+_windNames : tuple[str, ...] = ("windSpeed", "windDirection")
+
+# 楕円の確率 (2次元正規分布で楕円の内側に落ちる確率)
+_ellipseProbabilities : tuple[float, ...] = (0.5, 0.95, 0.99)
+
+def LoadUncertainParameters(parameters : dict) -> list[UncertainParameter]:
+    '''設定 (simulation.dispersion.parameters) を解釈する (不正な値があればValueError)'''
+    result : list[UncertainParameter] = []
+    for key, value in parameters.items():
+        if key not in _parameterKeys:
+            raise ValueError(f"\"{key}\" is not a perturbable parameter. Set one of {', '.join(_parameterKeys)}.")
+        match value.get("distribution", "normal"):
+            case "normal":
+                parameter = UncertainParameter(_parameterKeys[key], DistributionType.Normal,
+                                               float(value.get("mean", 0.0)), float(value["sigma"]))
+                if parameter.b < 0:
+                    raise ValueError(f"{key}: sigma must not be negative.")
+            case "uniform":
+                parameter = UncertainParameter(_parameterKeys[key], DistributionType.Uniform,
+                                               float(value["min"]), float(value["max"]))
+                if parameter.b < parameter.a:
+                    raise ValueError(f"{key}: max must not be less than min.")
+            case distribution:
+                raise ValueError(f"{key}: distribution \"{distribution}\" is invalid. Set \"normal\" or \"uniform\".")
+        result.append(parameter)
+    return result
+
+def SampleDeviations(parameters : list[UncertainParameter], count : int, seedSequence : np.random.SeedSequence,
+                     sampler : SamplerType = SamplerType.Random) -> np.ndarray:
+    '''
+    公称値からの偏差を count 個サンプリングする.
+    Returns:
+        (count, len(parameters)) の配列. ToPerturbation, WindConditionsにそのまま渡せる.
+    '''
+    return ToDeviations(parameters, SampleUnitCube(sampler, count, len(parameters), seedSequence))
+
+def ToDeviations(parameters : list[UncertainParameter], u : np.ndarray) -> np.ndarray:
+    '''[0, 1) の一様乱数 (count, len(parameters)) を各分布の偏差に変換する'''
+    deviations = np.empty_like(u, dtype=float)
+    for i, parameter in enumerate(parameters):
+        deviations[:, i] = parameter.ppf(u[:, i])
+    return deviations
+
+def ToPerturbation(parameters : list[UncertainParameter], deviations : np.ndarray) -> Perturbation:
+    '''風速・風向以外の偏差から仕様の摂動を作る'''
+    columns = [i for i, parameter in enumerate(parameters) if parameter.name not in _windNames]
+    return Perturbation.fromDeviations([parameters[i].name for i in columns], np.asarray(deviations)[..., columns])
+
+def WindConditions(parameters : list[UncertainParameter], deviations : np.ndarray,
+                   windSpeed : float, windDirection : float) -> tuple[np.ndarray, np.ndarray]:
+    '''各サンプルの風速・風向 (解析条件の風速・風向 + 偏差. 風速は0以上, 風向は [0, 360))'''
+    deviations = np.atleast_2d(deviations)
+    windSpeeds     = np.full(len(deviations), float(windSpeed))
+    windDirections = np.full(len(deviations), float(windDirection))
+    for i, parameter in enumerate(parameters):
+        match parameter.name:
+            case "windSpeed":     windSpeeds     += deviations[:, i]
+            case "windDirection": windDirections += deviations[:, i]
+    return np.maximum(windSpeeds, 0.0), windDirections % 360.0
+
+def LandingPoints(results : np.ndarray[SimuResultSummary], coordinate : GeoCoordinate, body : int) -> np.ndarray:
+    '''
+    body番目の機体の落下地点 (発射点からの東, 北 [m]) の (N, 2) の配列.
+    bodyが足りないケースはNaN.
+    '''
+    points = np.full((len(results), 2), np.nan)
+    for i, result in enumerate(results):
+        if body < len(result.bodyFinalPositions):
+            position : BodyFinalPosition = result.bodyFinalPositions[body]
+            points[i] = (coordinate.longitudeToLength(position.longitude), coordinate.latitudeToLength(position.latitude))
+    return points
+
+def ErrorEllipses(points : np.ndarray) -> dict:
+    '''
+    落下地点 (N, 2) の平均・共分散と, 各確率の誤差楕円 (2次元正規分布を仮定).
+    楕円の半径は共分散行列の固有値の平方根 × sqrt(-2 ln(1 - p)).
+    '''
+    points = points[~np.isnan(points).any(axis=1)]
+    if len(points) < 2:
+        return {"count": int(len(points))}
+
+    return _ellipseStatistics(len(points), points.mean(axis=0), np.cov(points, rowvar=False))
+
+def _ellipseStatistics(count : int, mean : np.ndarray, covariance : np.ndarray) -> dict:
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance) # 昇順
+    major = eigenvectors[:, 1]
+
+    return {
+        "count"       : int(count),
+        "mean_east"   : float(mean[0]),
+        "mean_north"  : float(mean[1]),
+        "covariance"  : covariance.tolist(), # [[east-east, east-north], [north-east, north-north]] [m2]
+        "ellipses" : [{
+            "probability"     : p,
+            "semi_major[m]"   : float(np.sqrt(max(eigenvalues[1], 0.0) * -2.0 * np.log(1.0 - p))),
+            "semi_minor[m]"   : float(np.sqrt(max(eigenvalues[0], 0.0) * -2.0 * np.log(1.0 - p))),
+            "azimuth[deg]"    : float(np.degrees(np.arctan2(major[0], major[1])) % 180.0) # 長軸の向き (北から時計回り)
+        } for p in _ellipseProbabilities]
+    }
+
+def ConvexHullArea(points : np.ndarray) -> float:
+    '''点 (N, 2) の凸包の面積 (Andrewのmonotone chain)'''
+    points = np.unique(points[~np.isnan(points).any(axis=1)], axis=0) # x, yの辞書順
+    if len(points) < 3:
+        return 0.0
+    cross = lambda o, a, b: (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+    def chain(sortedPoints):
+        hull = []
+        for p in sortedPoints:
+            while len(hull) >= 2 and cross(hull[-2], hull[-1], p) <= 0: hull.pop()
+            hull.append(p)
+        return hull[:-1]
+    hull = np.array(chain(points) + chain(points[::-1]))
+    return float(0.5 * abs(np.dot(hull[:, 0], np.roll(hull[:, 1], -1)) - np.dot(hull[:, 1], np.roll(hull[:, 0], -1))))
+
+def FootprintConvergence(points : np.ndarray, minimumCount : int = 16) -> list[dict]:
+    '''
+    落下地点 (N, 2) の先頭から 16, 32, 64, ... 個 (と全N個) を使った落下範囲の推定値.
+    サンプル数に対する推定値の変化から収束を判断する (Grid等, 並び順が空間を埋めない点列では全N個のみ意味がある).
+    '''
+    counts = []
+    count = minimumCount
+    while count < len(points):
+        counts.append(count)
+        count *= 2
+    counts.append(len(points))
+    convergence = []
+    for count in counts:
+        prefix = points[:count]
+        prefix = prefix[~np.isnan(prefix).any(axis=1)]
+        entry = {"count": count}
+        if len(prefix) >= 2:
+            ellipse = _ellipseStatistics(len(prefix), prefix.mean(axis=0), np.cov(prefix, rowvar=False))
+            ellipse95 = next(e for e in ellipse["ellipses"] if e["probability"] == 0.95)
+            entry.update({
+                "mean_east"          : ellipse["mean_east"],
+                "mean_north"         : ellipse["mean_north"],
+                "semi_major_95[m]"   : ellipse95["semi_major[m]"],
+                "semi_minor_95[m]"   : ellipse95["semi_minor[m]"],
+                "hull_area[m2]"      : ConvexHullArea(prefix),
+                "max_distance[m]"    : float(np.hypot(prefix[:, 0], prefix[:, 1]).max()) # 発射点からの最大距離
+            })
+        convergence.append(entry)
+    return convergence
+
+def FootprintStatistics(results : np.ndarray[SimuResultSummary], coordinate : GeoCoordinate) -> dict:
+    '''機体毎の落下範囲 (凸包の面積・発射点からの最大距離等) とサンプル数に対する収束 (scatter用)'''
+    bodyCount = max([len(result.bodyFinalPositions) for result in results], default=0)
+    return {
+        "samples" : len(results),
+        "bodies"  : [{"convergence": FootprintConvergence(LandingPoints(results, coordinate, i))} for i in range(bodyCount)]
+    }
+
+def DispersionStatistics(results : np.ndarray[SimuResultSummary], coordinate : GeoCoordinate) -> dict:
+    '''機体毎の落下地点の誤差楕円と, 最高高度・最大対気速度の平均・標準偏差 (落下範囲の収束も含む)'''
+    bodyCount = max([len(result.bodyFinalPositions) for result in results], default=0)
+    maxAltitudes = np.array([result.maxAltitude for result in results])
+    maxAirspeeds = np.array([result.maxAirspeed for result in results])
+    return {
+        "samples" : len(results),
+        "max_altitude[m]"   : {"mean": float(maxAltitudes.mean()), "std": float(maxAltitudes.std(ddof=1)) if len(results) > 1 else 0.0},
+        "max_airspeed[m/s]" : {"mean": float(maxAirspeeds.mean()), "std": float(maxAirspeeds.std(ddof=1)) if len(results) > 1 else 0.0},
+        "bodies" : [{**ErrorEllipses(points), "convergence": FootprintConvergence(points)}
+                    for points in (LandingPoints(results, coordinate, i) for i in range(bodyCount))]
+    }
+
+def SigmaPoints(parameters : list[UncertainParameter], alpha : float = 1.0, beta : float = 2.0, kappa : float = 0.0) \
+    -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Unscented変換のシグマ点 (パラメータは互いに独立とする).
+        x_0 = mean, x_(+-i) = mean +- sqrt((n + lambda) * variance_i) e_i,  lambda = alpha^2 (n + kappa) - n
+    Returns:
+        (偏差 (2n+1, n), 平均の重み (2n+1,), 共分散の重み (2n+1,))
+    '''
+    n = len(parameters)
+    if n == 0:
+        return np.zeros((1, 0)), np.ones(1), np.ones(1)
+    scale = alpha**2 * (n + kappa) # n + lambda
+    if scale <= 0:
+        raise ValueError(f"alpha^2 * (n + kappa) must be positive (n = {n}, alpha = {alpha}, kappa = {kappa}).")
+
+    mean = np.array([parameter.mean for parameter in parameters])
+    spread = np.diag(np.sqrt(scale * np.array([parameter.variance for parameter in parameters])))
+    deviations = np.vstack([mean, mean + spread, mean - spread])
+
+    weightsMean = np.full(2 * n + 1, 0.5 / scale)
+    weightsMean[0] = 1.0 - n / scale # lambda / (n + lambda)
+    weightsCovariance = weightsMean.copy()
+    weightsCovariance[0] += 1.0 - alpha**2 + beta
+    return deviations, weightsMean, weightsCovariance
+
+def UnscentedStatistics(results : np.ndarray[SimuResultSummary], coordinate : GeoCoordinate,
+                        weightsMean : np.ndarray, weightsCovariance : np.ndarray) -> dict:
+    '''シグマ点の結果から, DispersionStatisticsと同じ形式で平均・共分散を求める'''
+    def moments(values : np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        mean = weightsMean @ values
+        residuals = values - mean
+        return mean, (weightsCovariance * residuals.T) @ residuals
+
+    bodyCount = max([len(result.bodyFinalPositions) for result in results], default=0)
+    (maxAltitude, maxAirspeed), covariance = moments(np.array([[result.maxAltitude, result.maxAirspeed] for result in results]))
+    bodies = []
+    for i in range(bodyCount):
+        points = LandingPoints(results, coordinate, i)
+        if np.isnan(points).any(): # シグマ点の一部でこの機体が無い場合は重みが合わないので求めない
+            bodies.append({"count": int((~np.isnan(points).any(axis=1)).sum())})
+            continue
+        bodies.append(_ellipseStatistics(len(points), *moments(points)))
+    return {
+        "sigma_points" : len(results),
+        "max_altitude[m]"   : {"mean": float(maxAltitude), "std": float(np.sqrt(max(covariance[0, 0], 0.0)))},
+        "max_airspeed[m/s]" : {"mean": float(maxAirspeed), "std": float(np.sqrt(max(covariance[1, 1], 0.0)))},
+        "bodies" : bodies
+    }
@@ -0,0 +1,172 @@
+'''
+ジョブマニフェスト (JSON) に従って, 対話的な入力なしで複数の解析を1プロセスで実行する
+
+    python -m PyPrologue run jobs.json
+
+マニフェストの例:
+    {
+        "jobs": [
+            {
+                "spec"            : "single.json",   // input/spec/ からの相対パス (または任意のパス)
+                "simulation_mode" : "detail",        // "detail", "scatter", "monte_carlo" または "unscented"
+                "trajectory_mode" : "parachute",     // "trajectory" または "parachute"
+                "wind"            : [[3.0, 220.0], [5.0, 270.0]] // detailの場合の [風速 [m/s], 風向 [deg]] のリスト
+            },
+            {
+                "spec"            : "multi.json",
+                "simulation_mode" : "scatter",
+                "trajectory_mode" : "trajectory",
+                "detach_type"     : "time",          // 多段の場合のみ. "burning_finished", "time", "sync_parachute", "do_not_detach"
+                "detach_time"     : 5.0
+            }
+        ]
+    }
+トップレベルはジョブのリストでもよい. scatterの風条件は prologue.settings.json の simulation.scatter に従う.
+monte_carlo, unscentedは風条件毎に simulation.dispersion の設定で分散解析する (PyPrologue/simulator/Dispersion.py).
+実測風・無風の場合は風条件を指定せず, scatterの代わりにdetailとして1回解析する (SimulatorFactory.Createと同じ).
+
+仕様ファイル・推力履歴・空力係数・実測風の各ファイルはInputLoaderのキャッシュにより,
+同じファイルを使うジョブの間では一度しか解析しない.
+'''
+from PyPrologue.app.AppSetting import *
+from PyPrologue.app.CommandLine import *
+from PyPrologue.simulator.SimulatorFactory import *
+from PyPrologue.utils.InputLoader import LoadJson
+
+import time
+from pathlib import Path
+from dataclasses import dataclass
+
+@dataclass
+class Job:
+    specFile : Path
+    setting : SimulatorBase.SimulationSetting # 風条件はジョブ毎に1つ (マニフェストの"wind"はジョブに展開する)
+
+@dataclass
+class JobResult:
+    job : Job
+    success : bool
+    elapsedTime : float   # [s]
+    outputDirectory : str # result/ 以下のディレクトリ名 (生成に失敗した場合は"")
+
+_specDirPath : Path = Path("input/spec")
+
+def LoadJobs(manifestPath : Path | str) -> list[Job]:
+    '''マニフェストを読み込み, 風条件毎のジョブに展開する (不正な値があればValueError)'''
+    manifest = LoadJson(manifestPath)
+    entries = manifest if isinstance(manifest, list) else GetValueExc(manifest, "jobs")
+    if not isinstance(entries, list):
+        raise ValueError(f"{manifestPath}: \"jobs\" must be a list.")
+
+    jobs : list[Job] = []
+    for i, entry in enumerate(entries):
+        try:
+            jobs += _parseJob(entry)
+        except (KeyError, ValueError, TypeError) as e:
+            raise ValueError(f"{manifestPath}: jobs[{i}]: {e}") from e
+    return jobs
+
+def RunJobs(jobs : list[Job], output : bool = True) -> list[JobResult]:
+    '''ジョブを順に実行する. 失敗したジョブがあっても残りのジョブは実行する'''
+    results : list[JobResult] = []
+    for i, job in enumerate(jobs):
+        PrintInfo(PrintInfoType.Information, f"Job {i + 1}/{len(jobs)}: {_describe(job)}")
+        start = time.time()
+        simulator = None
+        try:
+            simulator = SimulatorFactory.CreateFromSetting(job.specFile.stem, LoadJson(job.specFile), job.setting)
+            success = simulator.run(output)
+        except Exception as e:
+            PrintInfo(PrintInfoType.Error, f"Job {i + 1}: {_describe(job)}", e)
+            success = False
+        results.append(JobResult(job, success, time.time() - start,
+                                 simulator.getOutputDirectory if simulator is not None else ""))
+    return results
+
+def PrintJobSummary(results : list[JobResult]) -> None:
+    '''ジョブ毎の成否と実行時間を出力する (quietでも出力する)'''
+    print(f"{'#':>4}  {'status':<8}{'time [s]':>10}  job")
+    for i, result in enumerate(results):
+        status = "ok" if result.success else "FAILED"
+        print(f"{i + 1:>4}  {status:<8}{result.elapsedTime:>10.2f}  {_describe(result.job)}")
+    failed = sum(not result.success for result in results)
+    print(f"\n{len(results) - failed} succeeded, {failed} failed, {sum(result.elapsedTime for result in results):.2f} [s] in total\n")
+
+def _describe(job : Job) -> str:
+    setting = job.setting
+    text = f"{job.specFile.name} {setting.simulationMode.name} {setting.trajectoryMode.name}"
+    if setting.simulationMode != SimulationMode.Scatter and _needsWindCondition():
+        text += f" [{setting.windSpeed:.2f}ms, {setting.windDirection:.2f}deg]"
+    return text
+
+def _needsWindCondition() -> bool:
+    '''風速・風向を指定する風モデルか (SimulatorFactory._setupSimulatorと同じ条件)'''
+    return AppSetting.windModel.type != WindModelType.Real and AppSetting.windModel.type != WindModelType.NoWind
+
+def _parseJob(entry : dict) -> list[Job]:
+    specFile = _resolveSpecFile(GetValueExc(entry, "spec"))
+    setting = SimulatorBase.SimulationSetting()
+
+    match entry.get("simulation_mode", "scatter"):
+        case "scatter":
+            setting.simulationMode = SimulationMode.Scatter if _needsWindCondition() else SimulationMode.Detail
+        case "detail":
+            setting.simulationMode = SimulationMode.Detail
+        case "monte_carlo":
+            setting.simulationMode = SimulationMode.MonteCarlo
+        case "unscented":
+            setting.simulationMode = SimulationMode.Unscented
+        case mode:
+            raise ValueError(f"simulation_mode \"{mode}\" is invalid. "
+                             "Set \"scatter\", \"detail\", \"monte_carlo\" or \"unscented\".")
+
+    match entry.get("trajectory_mode", "trajectory"):
+        case "trajectory":
+            setting.trajectoryMode = TrajectoryMode.Trajectory
+        case "parachute":
+            setting.trajectoryMode = TrajectoryMode.Parachute
+        case mode:
+            raise ValueError(f"trajectory_mode \"{mode}\" is invalid. Set \"trajectory\" or \"parachute\".")
+
+    if RocketSpecification.isMultipleRocket(LoadJson(specFile)):
+        match entry.get("detach_type", "burning_finished"):
+            case "burning_finished":
+                setting.detachType = DetachType.BurningFinished
+            case "time":
+                setting.detachType = DetachType.Time
+                setting.detachTime = float(GetValueExc(entry, "detach_time"))
+                if setting.detachTime <= 0:
+                    raise ValueError("detach_time must be positive.")
+            case "sync_parachute":
+                setting.detachType = DetachType.SyncPara
+            case "do_not_detach":
+                setting.detachType = DetachType.DoNotDetach
+            case detachType:
+                raise ValueError(f"detach_type \"{detachType}\" is invalid. "
+                                 "Set \"burning_finished\", \"time\", \"sync_parachute\" or \"do_not_detach\".")
+
+    winds = entry.get("wind")
+    if setting.simulationMode == SimulationMode.Scatter or not _needsWindCondition():
+        if winds is not None:
+            PrintInfo(PrintInfoType.Warning, f"{specFile.name}: \"wind\" is ignored in this mode.")
+        return [Job(specFile, setting)]
+
+    if not winds:
+        raise ValueError("\"wind\" ([[wind speed, wind direction], ...]) is required in detail, monte_carlo and unscented mode.")
+    jobs = []
+    for wind in winds:
+        windSpeed, windDirection = (float(value) for value in wind)
+        jobs.append(Job(specFile, SimulatorBase.SimulationSetting(
+            simulationMode=setting.simulationMode,
+            trajectoryMode=setting.trajectoryMode,
+            detachType=setting.detachType,
+            detachTime=setting.detachTime,
+            windSpeed=windSpeed,
+            windDirection=windDirection)))
+    return jobs
+
+def _resolveSpecFile(spec : str) -> Path:
+    '''input/spec/ からの相対パス (拡張子は省略可能) または任意のパス'''
+    for path in [_specDirPath / spec, _specDirPath / (spec + ".json"), Path(spec)]:
+        if path.is_file(): return path
+    raise ValueError(f"Specification file \"{spec}\" is not found in {_specDirPath}/.")
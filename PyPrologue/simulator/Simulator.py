@@ -2,7 +2,7 @@
 シミュレータークラス
 ファイル読み取り、初期化を行い結果を元にSolverクラスで解析を実行する
 class SimulatorBaseは抽象クラスとして定義しているためそのままでは使えない
-Detail/Scatterモードに対して、SimulatorBaseクラスを継承したDetailSimulator/ScatterSimulatorを定義している
+Detail/Scatter/MonteCarlo/Unscentedモードに対して、SimulatorBaseクラスを継承したDetailSimulator/ScatterSimulator/MonteCarloSimulator/UnscentedSimulatorを定義している
 抽象クラスでは、継承したクラスでその内部実装を変更することできる
 デコレータ : @abstractmethodを付けた関数は継承先で必ず実装しなければならない
 '''
@@ -14,9 +14,15 @@ from PyPrologue.env.Map import *
 from PyPrologue.rocket.RocketSpec import *
 from PyPrologue.result.ResultSaver import *
 from PyPrologue.solver.Solver import *
+from PyPrologue.solver.BatchSolver import BatchSolver
+from PyPrologue.simulator.Dispersion import *
+from PyPrologue.utils.Profiler import Profiler, Profiling
 
 import time
+import itertools
 from pathlib import Path
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
 
 from abc import ABC, abstractmethod # 抽象クラス
 from enum import Enum, auto
@@ -25,6 +31,8 @@ from dataclasses import dataclass
 class SimulationMode(Enum):
     Scatter : int = 1
     Detail : int = auto()
+    MonteCarlo : int = auto()
+    Unscented : int = auto()
 
 class SimulatorBase(ABC):
     @dataclass
@@ -46,6 +54,7 @@ class SimulatorBase(ABC):
         self._environment    = Environment(specJson=specJson)
         self._mapData        = self.__getMapData()
         self._outputdDirName = self.__getOutputDirectoryName()
+        self._profiler : Profiler | None = None
     
     def run(self, output : bool) -> bool:
         self.__createResultDirectory()
@@ -53,17 +62,24 @@ class SimulatorBase(ABC):
         # Simulate
         start = time.time()
         
-        if not self.simulate(): return False # faild
+        self._profiler = Profiler() if AppSetting.processing.profile else None
+        with Profiling(self._profiler) if self._profiler is not None else nullcontext():
+            if not self.simulate(): return False # faild
         
         elapsed_time = time.time() - start
         PrintInfo(PrintInfoType.Information,
                   f"Finish processing: {elapsed_time:.2f}[s]")
+        if self._profiler is not None:
+            PrintInfo(PrintInfoType.Information,
+                      f"Profile: {self._profiler.steps} steps, {self._profiler.report()['steps_per_sec']:.0f}[steps/s]")
         
         # Save result and init commandline
         if output:
             PrintInfo(PrintInfoType.Information, "Saving result...")
             
             self.saveResult()
+            if self._profiler is not None:
+                self._profiler.save(Path(f"result/{self._outputdDirName}")/"profile.json")
             
             PrintInfo(PrintInfoType.Information, f"Result is saved in \"{self._outputdDirName}\"")
         
@@ -71,7 +87,12 @@ class SimulatorBase(ABC):
     
     @property
     def getOutputDirectory(self) -> str:
-        return self._outputDirName
+        return self._outputdDirName
+    
+    @property
+    def profiler(self) -> Profiler | None:
+        '''最後のrun()の計測結果 (AppSetting.processing.profileが無効ならNone)'''
+        return self._profiler
     
     @abstractmethod
     def simulate(self) -> bool:
@@ -81,6 +102,30 @@ class SimulatorBase(ABC):
     def saveResult(self) -> None:
         pass
     
+    def _resultMetadata(self) -> dict:
+        '''バイナリ出力に格納する実行条件'''
+        metadata = {
+            "spec_name"       : self._specName,
+            "simulation_mode" : self._setting.simulationMode.name,
+            "trajectory_mode" : self._setting.trajectoryMode.name,
+            "wind_model"      : AppSetting.windModel.type.name,
+            "dt"              : AppSetting.simulation.dt,
+            "integrator"      : AppSetting.simulation.integrator.name,
+            "step_save_interval" : AppSetting.result.stepSaveInterval,
+            "map" : {
+                "key"       : self._mapData.key,
+                "latitude"  : self._mapData.coordinate.latitude,
+                "longitude" : self._mapData.coordinate.longitude,
+                "magnetic_declination" : self._mapData.magneticDeclination
+            }
+        }
+        if AppSetting.windModel.type == WindModelType.Real:
+            metadata["realdata_filename"] = AppSetting.windModel.realdataFileName
+        if self._setting.simulationMode != SimulationMode.Scatter:
+            metadata["wind_speed"]     = self._setting.windSpeed
+            metadata["wind_direction"] = self._setting.windDirection
+        return metadata
+    
     def __createResultDirectory(self) -> None:
         output = Path(f"result/{self._outputdDirName}")
         output.mkdir(parents=True, exist_ok=True)
@@ -111,8 +156,15 @@ class SimulatorBase(ABC):
                     dir += "_scatter"
                 case SimulationMode.Detail:
                     dir += "_detail"
+                case SimulationMode.MonteCarlo | SimulationMode.Unscented:
+                    pass
                 case _: # default:
                     dir += "unknown"
+        match self._setting.simulationMode:
+            case SimulationMode.MonteCarlo:
+                dir += "_montecarlo"
+            case SimulationMode.Unscented:
+                dir += "_unscented"
         
         match self._setting.trajectoryMode:
             case TrajectoryMode.Parachute:
@@ -124,7 +176,7 @@ class SimulatorBase(ABC):
         
         dir += "]"
         
-        if self._setting.simulationMode == SimulationMode.Detail and \
+        if self._setting.simulationMode != SimulationMode.Scatter and \
            AppSetting.windModel.type != WindModelType.Real and \
            AppSetting.windModel.type != WindModelType.NoWind:
             dir += f"[{self._setting.windSpeed:.2f}ms, {self._setting.windDirection:.2f}deg]"
@@ -164,4 +216,326 @@ class DetailSimulator(SimulatorBase):
     
     def saveResult(self) -> None:
         dir : Path = Path(f"result/{self._outputdDirName}")
-        ResultSaver.SaveDetail(dir, self._result)
\ No newline at end of file
+        ResultSaver.SaveDetail(dir, self._result, self._resultMetadata())
+
+class ScatterSimulator(SimulatorBase):
+    def __init__(self, specName: str, specJson: dict, setting: SimulatorBase.SimulationSetting) -> None:
+        super().__init__(specName, specJson, setting)
+        self._result = np.array([], dtype=SimuResultSummary)
+        self._footprint : dict = {}
+    
+    def simulate(self) -> bool:
+        solverArgs = (self._mapData,
+                      self._rocketType,
+                      self._setting.trajectoryMode,
+                      self._setting.detachType,
+                      self._setting.detachTime,
+                      self._environment,
+                      self._rocketSpec)
+        windConditions = np.array(self.__getWindConditions())
+        if len(windConditions) == 0:
+            PrintInfo(PrintInfoType.Error,
+                "There are no wind conditions to simulate.",
+                f"wind speed: [{AppSetting.simulation.windSpeedMin}, {AppSetting.simulation.windSpeedMax}] [m/s], "
+                f"sampler: {AppSetting.simulation.scatterSampler.name}, samples: {AppSetting.simulation.scatterSamples}",
+                "Check simulation.scatter in prologue.settings.json.")
+            return False
+        
+        try:
+            workerCount = max(1, AppSetting.processing.threadCount) if AppSetting.processing.multiThread else 1
+            # 単段ロケットで1ワーカー当たり_minBatchSizeケース以上ある場合は, BatchSolverでまとめて解くのでワーカー数だけに分割する
+            # (それより少ないとBatchSolverの1ステップ当たりのオーバーヘッドが勝るので, 1ケースずつSolverで解く)
+            if BatchSolver.isSupported(self._rocketType, self._rocketSpec) and len(windConditions) // workerCount >= _minBatchSize:
+                chunkCount = workerCount
+            else:
+                chunkCount = len(windConditions)
+            chunks = np.array_split(windConditions, chunkCount)
+            windSpeeds     = [chunk[:, 0] for chunk in chunks]
+            windDirections = [chunk[:, 1] for chunk in chunks]
+            
+            if workerCount > 1:
+                PrintInfo(PrintInfoType.Information, f"Run {len(windConditions)} cases with {workerCount} processes")
+                # Solverの引数は各プロセスで一度だけ受け取り, タスク毎には風速・風向のみを送る
+                # 計測する場合は各ワーカーで計測し, 結果をこのプロセスのProfilerに加算する
+                with ProcessPoolExecutor(max_workers=workerCount,
+                                         initializer=_initScatterWorker,
+                                         initargs=(solverArgs, self._profiler is not None)) as executor:
+                    outputs = [output for output, _ in zip(executor.map(_solveScatterCases, windSpeeds, windDirections),
+                                                           progress_bar(chunkCount))]
+            else:
+                _initScatterWorker(solverArgs)
+                outputs = [_solveScatterCases(windSpeed, windDirection)
+                           for windSpeed, windDirection, _ in zip(windSpeeds, windDirections, progress_bar(chunkCount))]
+            for _, report in outputs:
+                if report is not None: self._profiler.merge(report)
+            self._result = np.concatenate([result for result, _ in outputs])
+            self._footprint = FootprintStatistics(self._result, self._mapData.coordinate)
+        except Exception as e:
+            print(e)
+            return False # どっかでエラー吐いたらここでキャッチする
+        return True
+    
+    @property
+    def footprint(self) -> dict:
+        '''落下範囲とサンプル数に対する収束 (Dispersion.FootprintStatistics)'''
+        return self._footprint
+    
+    def saveResult(self) -> None:
+        dir : Path = Path(f"result/{self._outputdDirName}")
+        metadata = self._resultMetadata()
+        metadata["sampler"] = AppSetting.simulation.scatterSampler.name
+        ResultSaver.SaveScatter(dir, self._result, metadata, self._footprint)
+    
+    @staticmethod
+    def __getWindConditions() -> list[tuple[float, float]]:
+        '''
+        Grid : 風速 (1 m/s刻み) × 風向 (windDirInterval刻み) の全組み合わせ
+        それ以外 : 風速 [windSpeedMin, windSpeedMax] × 風向 [0, 360) からscatterSamples個サンプリングする
+        '''
+        if AppSetting.simulation.scatterSampler != SamplerType.Grid:
+            points = SampleUnitCube(AppSetting.simulation.scatterSampler, AppSetting.simulation.scatterSamples, 2,
+                                    np.random.SeedSequence(AppSetting.simulation.scatterSeed))
+            windSpeedMin, windSpeedMax = AppSetting.simulation.windSpeedMin, AppSetting.simulation.windSpeedMax
+            return [(float(windSpeedMin + (windSpeedMax - windSpeedMin) * u), float(360.0 * v)) for u, v in points]
+        
+        windSpeeds = np.arange(AppSetting.simulation.windSpeedMin,
+                               AppSetting.simulation.windSpeedMax + 1e-9, 1.0)
+        windDirections = np.arange(0.0, 360.0 - 1e-9, AppSetting.simulation.windDirInterval)
+        return [(float(windSpeed), float(windDirection))
+                for windSpeed, windDirection in itertools.product(windSpeeds, windDirections)]
+
+class MonteCarloSimulator(SimulatorBase):
+    '''
+    仕様の不確かさ (AppSetting.dispersion) による落下分散を, 風条件を固定してMonte Carlo法で解析する.
+    サンプルは_dispersionChunkSize個ずつのチャンクに分け, チャンク毎にSeedSequence.spawnで独立な乱数列を割り当てるので,
+    結果はシードとサンプル数のみで決まる (プロセス数によらない).
+    AppSetting.dispersion.samplerがLatinHypercube・Sobolの場合は全サンプルの点列をこのプロセスで生成して分割する.
+    '''
+    def __init__(self, specName: str, specJson: dict, setting: SimulatorBase.SimulationSetting) -> None:
+        super().__init__(specName, specJson, setting)
+        self._parameters : list[UncertainParameter] = LoadUncertainParameters(AppSetting.dispersion.parameters)
+        self._deviations = np.empty((0, len(self._parameters)))
+        self._result = np.array([], dtype=SimuResultSummary)
+        self._statistics : dict = {}
+    
+    def simulate(self) -> bool:
+        solverArgs = (self._mapData,
+                      self._rocketType,
+                      self._setting.trajectoryMode,
+                      self._setting.detachType,
+                      self._setting.detachTime,
+                      self._environment,
+                      self._rocketSpec)
+        samples = AppSetting.dispersion.samples
+        counts = [min(_dispersionChunkSize, samples - start) for start in range(0, samples, _dispersionChunkSize)]
+        if AppSetting.dispersion.sampler == SamplerType.Random:
+            chunkSamples = np.random.SeedSequence(AppSetting.dispersion.seed).spawn(len(counts))
+        else:
+            points = SampleUnitCube(AppSetting.dispersion.sampler, samples, len(self._parameters),
+                                    np.random.SeedSequence(AppSetting.dispersion.seed))
+            chunkSamples = np.split(points, np.cumsum(counts)[:-1])
+        workerArgs = (solverArgs, self._parameters, self._setting.windSpeed, self._setting.windDirection)
+        
+        try:
+            workerCount = max(1, AppSetting.processing.threadCount) if AppSetting.processing.multiThread else 1
+            if workerCount > 1:
+                PrintInfo(PrintInfoType.Information, f"Run {samples} samples with {workerCount} processes")
+                with ProcessPoolExecutor(max_workers=workerCount,
+                                         initializer=_initDispersionWorker,
+                                         initargs=(*workerArgs, self._profiler is not None)) as executor:
+                    outputs = [output for output, _ in zip(executor.map(_solveDispersionCases, chunkSamples, counts),
+                                                           progress_bar(len(counts)))]
+            else:
+                _initDispersionWorker(*workerArgs)
+                outputs = [_solveDispersionCases(chunk, count)
+                           for chunk, count, _ in zip(chunkSamples, counts, progress_bar(len(counts)))]
+            for _, _, report in outputs:
+                if report is not None: self._profiler.merge(report)
+            self._deviations = np.concatenate([deviations for deviations, _, _ in outputs])
+            self._result = np.concatenate([result for _, result, _ in outputs])
+            self._statistics = DispersionStatistics(self._result, self._mapData.coordinate)
+        except Exception as e:
+            print(e)
+            return False # どっかでエラー吐いたらここでキャッチする
+        return True
+    
+    @property
+    def statistics(self) -> dict:
+        '''落下地点の誤差楕円等 (Dispersion.DispersionStatistics)'''
+        return self._statistics
+    
+    def saveResult(self) -> None:
+        dir : Path = Path(f"result/{self._outputdDirName}")
+        metadata = self._resultMetadata()
+        metadata["samples"] = AppSetting.dispersion.samples
+        metadata["seed"]    = AppSetting.dispersion.seed
+        metadata["sampler"] = AppSetting.dispersion.sampler.name
+        metadata["parameters"] = AppSetting.dispersion.parameters
+        ResultSaver.SaveDispersion(dir, self._result, [parameter.name for parameter in self._parameters],
+                                   self._deviations, self._statistics, metadata)
+
+class UnscentedSimulator(SimulatorBase):
+    '''
+    仕様の不確かさ (AppSetting.dispersion) による落下分散を, Unscented変換で近似する.
+    パラメータ数nに対して2n+1個のシグマ点をそれぞれSolverで解析するので, Monte Carloよりはるかに少ない解析で済む.
+    '''
+    def __init__(self, specName: str, specJson: dict, setting: SimulatorBase.SimulationSetting) -> None:
+        super().__init__(specName, specJson, setting)
+        self._parameters : list[UncertainParameter] = LoadUncertainParameters(AppSetting.dispersion.parameters)
+        self._deviations, self._weightsMean, self._weightsCovariance = \
+            SigmaPoints(self._parameters, AppSetting.dispersion.alpha, AppSetting.dispersion.beta, AppSetting.dispersion.kappa)
+        self._result = np.array([], dtype=SimuResultSummary)
+        self._statistics : dict = {}
+    
+    def simulate(self) -> bool:
+        solverArgs = (self._mapData,
+                      self._rocketType,
+                      self._setting.trajectoryMode,
+                      self._setting.detachType,
+                      self._setting.detachTime,
+                      self._environment,
+                      self._rocketSpec)
+        workerArgs = (solverArgs, self._parameters, self._setting.windSpeed, self._setting.windDirection)
+        pointCount = len(self._deviations)
+        
+        try:
+            workerCount = max(1, AppSetting.processing.threadCount) if AppSetting.processing.multiThread else 1
+            if workerCount > 1:
+                PrintInfo(PrintInfoType.Information, f"Run {pointCount} sigma points with {workerCount} processes")
+                with ProcessPoolExecutor(max_workers=workerCount,
+                                         initializer=_initDispersionWorker,
+                                         initargs=(*workerArgs, self._profiler is not None)) as executor:
+                    outputs = [output for output, _ in zip(executor.map(_solveSigmaPoint, self._deviations),
+                                                           progress_bar(pointCount))]
+            else:
+                _initDispersionWorker(*workerArgs)
+                outputs = [_solveSigmaPoint(deviation) for deviation, _ in zip(self._deviations, progress_bar(pointCount))]
+            for _, report in outputs:
+                if report is not None: self._profiler.merge(report)
+            self._result = np.array([result for result, _ in outputs], dtype=SimuResultSummary)
+            self._statistics = UnscentedStatistics(self._result, self._mapData.coordinate,
+                                                   self._weightsMean, self._weightsCovariance)
+        except Exception as e:
+            print(e)
+            return False # どっかでエラー吐いたらここでキャッチする
+        return True
+    
+    @property
+    def statistics(self) -> dict:
+        '''落下地点の平均・共分散等 (Dispersion.UnscentedStatistics)'''
+        return self._statistics
+    
+    def saveResult(self) -> None:
+        dir : Path = Path(f"result/{self._outputdDirName}")
+        metadata = self._resultMetadata()
+        metadata["parameters"] = AppSetting.dispersion.parameters
+        metadata["unscented"] = {"alpha": AppSetting.dispersion.alpha, "beta": AppSetting.dispersion.beta,
+                                 "kappa": AppSetting.dispersion.kappa}
+        ResultSaver.SaveDispersion(dir, self._result, [parameter.name for parameter in self._parameters],
+                                   self._deviations, self._statistics, metadata)
+
+# ProcessPoolExecutorのワーカーから呼び出すため, モジュールレベルで定義する (pickle可能である必要がある)
+_scatterSolverArgs : tuple = ()
+_scatterProfile : bool = False
+# BatchSolverを使う1チャンクの最小ケース数. フィクスチャ (test/benchmark/fixtures) の単段ロケットで
+# Solverで1ケースずつ解くより速くなるのは, 弾道で約16ケース・パラシュート降下で約8ケースから
+_minBatchSize : int = 24
+
+def _initScatterWorker(solverArgs : tuple, profile : bool = False) -> None:
+    '''profile : ワーカー側で計測するか (別プロセスのワーカーのみ. 同じプロセスなら呼び出し元のProfilerで計測される)'''
+    global _scatterSolverArgs, _scatterProfile
+    _scatterSolverArgs = solverArgs
+    _scatterProfile = profile
+
+def _solveScatterCases(windSpeeds : np.ndarray, windDirections : np.ndarray) -> tuple[np.ndarray, dict | None]:
+    '''
+    複数ケースの解析を行う.
+    Returns:
+        (落下地点等の主要な値のみの結果, ワーカー側で計測した場合はProfiler.report())
+    '''
+    if not _scatterProfile:
+        return _solveScatterChunk(windSpeeds, windDirections), None
+    with Profiling() as profiler:
+        results = _solveScatterChunk(windSpeeds, windDirections)
+    return results, profiler.report()
+
+def _solveScatterChunk(windSpeeds : np.ndarray, windDirections : np.ndarray) -> np.ndarray:
+    '''複数ケースの解析を行い, 落下地点等の主要な値のみを返す'''
+    if len(windSpeeds) >= _minBatchSize and BatchSolver.isSupported(_scatterSolverArgs[1], _scatterSolverArgs[-1]):
+        return BatchSolver(*_scatterSolverArgs).solve(windSpeeds, windDirections)
+    
+    results = np.empty(len(windSpeeds), dtype=SimuResultSummary)
+    for i, (windSpeed, windDirection) in enumerate(zip(windSpeeds, windDirections)):
+        solver = Solver(*_scatterSolverArgs, summaryOnly=True)
+        result : SimuResultSummary = solver.solve(windSpeed, windDirection).result
+        result.bodyResults = np.array([], dtype=SimuResultBody) # ステップ毎の結果はプロセス間で転送しない
+        results[i] = result
+    return results
+
+_dispersionArgs : tuple = ()
+_dispersionProfile : bool = False
+_dispersionChunkSize : int = 256 # 1チャンクのサンプル数 (固定. 変えると同じシードでも結果が変わる)
+
+def _initDispersionWorker(solverArgs : tuple, parameters : list[UncertainParameter],
+                          windSpeed : float, windDirection : float, profile : bool = False) -> None:
+    global _dispersionArgs, _dispersionProfile
+    _dispersionArgs = (solverArgs, parameters, windSpeed, windDirection)
+    _dispersionProfile = profile
+
+def _solveDispersionCases(samples : np.random.SeedSequence | np.ndarray, count : int) -> tuple[np.ndarray, np.ndarray, dict | None]:
+    '''
+    count個のサンプルを生成して解析する.
+    Args:
+        samples : このチャンクの乱数列 (Random), または [0, 1) の点 (count, パラメータ数)
+                  (LatinHypercube・Sobolは全サンプルで1つの点列なので, 呼び出し元で生成して分割する)
+    Returns:
+        (偏差 (count, パラメータ数), 主要な値のみの結果, ワーカー側で計測した場合はProfiler.report())
+    '''
+    parameters = _dispersionArgs[1]
+    if isinstance(samples, np.random.SeedSequence):
+        deviations = SampleDeviations(parameters, count, samples)
+    else:
+        deviations = ToDeviations(parameters, samples)
+    if not _dispersionProfile:
+        return deviations, _solvePerturbedChunk(deviations), None
+    with Profiling() as profiler:
+        results = _solvePerturbedChunk(deviations)
+    return deviations, results, profiler.report()
+
+def _solvePerturbedChunk(deviations : np.ndarray) -> np.ndarray:
+    '''偏差 (count, パラメータ数) を与えた各ケースを解析し, 落下地点等の主要な値のみを返す'''
+    solverArgs, parameters, windSpeed, windDirection = _dispersionArgs
+    perturbation = ToPerturbation(parameters, deviations)
+    windSpeeds, windDirections = WindConditions(parameters, deviations, windSpeed, windDirection)
+    if len(deviations) >= _minBatchSize and BatchSolver.isSupported(solverArgs[1], solverArgs[-1]):
+        return BatchSolver(*solverArgs).solve(windSpeeds, windDirections, perturbation)
+    
+    results = np.empty(len(deviations), dtype=SimuResultSummary)
+    for i in range(len(deviations)):
+        spec, env = perturbation.case(i).apply(solverArgs[-1], solverArgs[-2])
+        solver = Solver(*solverArgs[:-2], env, spec, summaryOnly=True)
+        result : SimuResultSummary = solver.solve(windSpeeds[i], windDirections[i]).result
+        result.bodyResults = np.array([], dtype=SimuResultBody) # ステップ毎の結果はプロセス間で転送しない
+        results[i] = result
+    return results
+
+def _solveSigmaPoint(deviation : np.ndarray) -> tuple[SimuResultSummary, dict | None]:
+    '''
+    1つのシグマ点をSolverで解析する.
+    Returns:
+        (主要な値のみの結果, ワーカー側で計測した場合はProfiler.report())
+    '''
+    if not _dispersionProfile:
+        return _solveSigmaPointCase(deviation), None
+    with Profiling() as profiler: # Solverは生成時に計測の有無を決めるので, 生成もこの中で行う
+        result = _solveSigmaPointCase(deviation)
+    return result, profiler.report()
+
+def _solveSigmaPointCase(deviation : np.ndarray) -> SimuResultSummary:
+    solverArgs, parameters, windSpeed, windDirection = _dispersionArgs
+    spec, env = ToPerturbation(parameters, deviation).apply(solverArgs[-1], solverArgs[-2])
+    (windSpeed,), (windDirection,) = WindConditions(parameters, deviation, windSpeed, windDirection)
+    solver = Solver(*solverArgs[:-2], env, spec, summaryOnly=True)
+    result : SimuResultSummary = solver.solve(windSpeed, windDirection).result
+    result.bodyResults = np.array([], dtype=SimuResultBody) # ステップ毎の結果はプロセス間で転送しない
+    return result
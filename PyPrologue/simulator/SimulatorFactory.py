@@ -5,6 +5,7 @@ SimulatorBaseクラスの生成を担う
 from PyPrologue.app.CommandLine import *
 from PyPrologue.simulator.Simulator import *
 from PyPrologue.solver.Solver import *
+from PyPrologue.utils.InputLoader import LoadJson
 
 
 from pathlib import Path
@@ -18,8 +19,7 @@ class SimulatorFactory:
         try:
             # Specification json file
             specFilePath = SimulatorFactory._setSpecFile()
-            file = open(specFilePath) # 外部で try-except-finnally を使っているので with は使わず自前で処理する
-            specJson = json.load(file)
+            specJson = LoadJson(specFilePath)
             
             # Specification name
             specName = specFilePath.stem
@@ -28,20 +28,24 @@ class SimulatorFactory:
             simulationSetting : SimulatorBase.SimulationSetting = SimulatorFactory._setupSimulator(specJson)
             
             # Create simulation instance
-            if AppSetting.windModel.type == WindModelType.Real or AppSetting.windModel.type == WindModelType.NoWind or \
-                simulationSetting.simulationMode == SimulationMode.Detail:
-                return DetailSimulator(specName=specName, specJson=specJson, setting=simulationSetting) # finallyの後にこれが実行されることに注意
-            else:
-                raise RuntimeError("SimulatorFactory::Create(): Detected unhandled return path.")  # TODO : ScatterSimulatorの実装
+            return SimulatorFactory.CreateFromSetting(specName, specJson, simulationSetting)
         except Exception as e:
             PrintInfo(PrintInfoType.Error, e)
-        finally:
-            try:
-                file.close()  # file が存在すればデストラクタを呼んで正常にクロース
-            except:
-                pass
         return None
     
+    @staticmethod
+    def CreateFromSetting(specName : str, specJson : dict, setting : SimulatorBase.SimulationSetting) -> SimulatorBase:
+        '''対話的な入力をせずに, 指定した設定でインスタンスを生成する (実測風・無風の場合はScatterの代わりにDetailSimulator)'''
+        if setting.simulationMode == SimulationMode.MonteCarlo:
+            return MonteCarloSimulator(specName=specName, specJson=specJson, setting=setting)
+        elif setting.simulationMode == SimulationMode.Unscented:
+            return UnscentedSimulator(specName=specName, specJson=specJson, setting=setting)
+        elif AppSetting.windModel.type == WindModelType.Real or AppSetting.windModel.type == WindModelType.NoWind or \
+            setting.simulationMode == SimulationMode.Detail:
+            return DetailSimulator(specName=specName, specJson=specJson, setting=setting)
+        else:
+            return ScatterSimulator(specName=specName, specJson=specJson, setting=setting)
+    
     @staticmethod
     def _setSpecFile() -> Path:
         specificationFiles = \
@@ -57,8 +61,14 @@ class SimulatorFactory:
     
     @staticmethod
     def _setSimulationMode() -> SimulationMode:
-        Question("Set Simulation Mode", "Scatter Mode", "Detail Mode")
-        return SimulationMode(InputIndex(2))
+        Question("Set Simulation Mode", "Scatter Mode", "Detail Mode", "Monte Carlo Mode", "Unscented Transform Mode")
+        return SimulationMode(InputIndex(4))
+    
+    @staticmethod
+    def _setSimulationModeWithoutScatter() -> SimulationMode:
+        '''風条件が1つに決まる (実測風・無風) 場合'''
+        Question("Set Simulation Mode", "Detail Mode", "Monte Carlo Mode", "Unscented Transform Mode")
+        return [SimulationMode.Detail, SimulationMode.MonteCarlo, SimulationMode.Unscented][InputIndex(3) - 1]
     
     @staticmethod
     def _setTrajectoryMode() -> TrajectoryMode:
@@ -90,11 +100,13 @@ class SimulatorFactory:
 
         if AppSetting.windModel.type != WindModelType.Real and AppSetting.windModel.type != WindModelType.NoWind:
             setting.simulationMode = SimulatorFactory._setSimulationMode()
+        else:
+            setting.simulationMode = SimulatorFactory._setSimulationModeWithoutScatter()
         
         setting.trajectoryMode = SimulatorFactory._setTrajectoryMode()
         
         # set wind condition if need
-        if setting.simulationMode == SimulationMode.Detail and \
+        if setting.simulationMode != SimulationMode.Scatter and \
             AppSetting.windModel.type != WindModelType.Real and AppSetting.windModel.type != WindModelType.NoWind:
             setting.windSpeed, setting.windDirection = SimulatorFactory._setWindCondition()
         
@@ -0,0 +1,250 @@
+'''
+複数ケース一括解析用クラス
+
+Solverと同じ計算 (陽的Euler法) を, 風条件の異なるN個のロケットに対してまとめて行う.
+状態は (N, StateSize) の配列 (各行はSolverの状態ベクトルと同じ並び) として保持し,
+1ステップ毎にNumPyの配列演算で全ケースを更新する. 着地したケースはマスクして以降の計算から除外する.
+運動方程式はSolverと共有する (RocketDynamics.StateDerivatives. StateDerivativeと同じ式を配列に適用する).
+開傘・燃焼終了後のケースは姿勢・空力が降下に影響しないので, 鉛直方向の抗力と風による水平移動だけを計算する.
+Solverと結果が一致することは test/batch_solver_test.py で確認する.
+
+全ケースで時間刻みが共通なので, 経過時間は全ケースで共通のスカラーとして扱う.
+仕様はケース毎に摂動 (Perturbation. 質量・空力係数・推力・燃焼時間・ランチャ角度・パラシュートの倍率) を与えられるので,
+質量・慣性モーメント等はケース毎の配列として扱う.
+'''
+from PyPrologue.solver.Solver import *
+from PyPrologue.solver.DescentSolver import SolveDescent
+from PyPrologue.rocket.Perturbation import Perturbation
+from PyPrologue.dynamics.RocketDynamics import BatchDynamicsParameter, StateDerivatives, ParachuteAcceleration
+from PyPrologue.dynamics.WindModel import BatchWindModel
+from PyPrologue.utils.Profiler import Profiler, ActiveProfiler
+
+import numpy as np
+from numpy.linalg import norm
+from PyPrologue.utils.LazyImport import LazyImport
+quaternion = LazyImport("quaternion")
+
+class BatchSolver:
+    def __init__(self,
+                 mapData : MapData,
+                 rocketType : RocketType,
+                 mode : TrajectoryMode,
+                 detachType : DetachType,
+                 detachTime : float,
+                 env : Environment,
+                 spec : RocketSpecification) -> None:
+        if not BatchSolver.isSupported(rocketType, spec):
+            raise RuntimeError("BatchSolver supports only single rockets without transitions.")
+
+        self._dt : float                        = AppSetting.simulation.dt
+        self._environment : Environment         = env
+        self._mapData : MapData                 = mapData
+        self._trajectoryMode : TrajectoryMode   = mode
+        self._rocketSpec : RocketSpecification  = spec
+
+    @staticmethod
+    def isSupported(rocketType : RocketType, spec : RocketSpecification) -> bool:
+        '''一括解析が可能か (単段かつtransitionsが無く, 積分器がEuler法)'''
+        return rocketType == RocketType.Single and len(spec.bodySpec(0).transitions) == 0 \
+            and AppSetting.simulation.integrator == IntegratorType.Euler
+
+    def solve(self, windSpeeds : np.ndarray, windDirections : np.ndarray, perturbation : Perturbation | None = None) -> np.ndarray:
+        '''
+        全ケースを解析し, 各ケースの主要な値のみを返す.
+        Args:
+            windSpeeds     : 各ケースの地上風速.
+            windDirections : 各ケースの地上風向.
+            perturbation   : 各ケースの仕様の摂動 (Noneなら全ケース公称値).
+        Returns:
+            np.ndarray[SimuResultSummary] (ステップ毎の結果は含まない)
+        '''
+        profiler = ActiveProfiler()
+        if profiler is not None:
+            with profiler.section("batch_solver"):
+                return self._solve(windSpeeds, windDirections, perturbation, profiler)
+        return self._solve(windSpeeds, windDirections, perturbation, None)
+
+    def _solve(self, windSpeeds : np.ndarray, windDirections : np.ndarray, perturbation : Perturbation | None,
+               profiler : Profiler | None) -> np.ndarray:
+        windSpeeds     = np.asarray(windSpeeds, dtype=float)
+        windDirections = np.asarray(windDirections, dtype=float)
+        N = len(windSpeeds)
+        P = (perturbation if perturbation is not None else Perturbation()).broadcast(N)
+
+        SPEC : BodySpecification = self._rocketSpec.bodySpec(0)
+        PARACHUTE : Parachute = SPEC.parachutes[0]
+        dt = self._dt
+        saveInterval = AppSetting.result.stepSaveInterval
+
+        windModel = BatchWindModel(magneticDeclination=self._mapData.magneticDeclination,
+                                   groundWindSpeeds=windSpeeds, groundWindDirections=windDirections)
+        dynamics = BatchDynamicsParameter(SPEC, windModel, P)
+
+        # ========================全ケース共通========================= #
+        elapsedTime : float = 0.0
+
+        # ========================ケース毎============================= #
+        state = np.zeros((N, StateSize))
+        yaw = np.radians(-(self._environment.railAzimuth + P.railAzimuth - self._mapData.magneticDeclination) + 90) # 東 (x軸正の向き) からの角度
+        pitch = np.radians(self._environment.railElevation + P.railElevation)
+        state[:, QUAT]       = quaternion.as_float_array(quaternion.from_euler_angles(yaw, -pitch, np.zeros(N)))
+        state[:, MASS]       = SPEC.massInitial * P.mass
+        state[:, REF_LENGTH] = SPEC.CGLengthInitial
+        state[:, IYZ]        = SPEC.rollingMomentInertiaInitial
+        state[:, IX]         = 0.02 # TODO : このパラメタの出所 (Solverと同じ)
+
+        # status
+        parachuteOpened = np.zeros(N, dtype=bool)
+        waitForOpenPara = np.zeros(N, dtype=bool)
+        launchClear     = np.zeros(N, dtype=bool)
+        maxAltitude     = np.zeros(N)
+        maxAltitudeTime = np.zeros(N)
+        active          = np.ones(N, dtype=bool)
+
+        # result
+        launchClearTime     = np.zeros(N)
+        launchClearVelocity = np.zeros((N, 3))
+        maxVelocity         = np.zeros(N)
+        maxAirspeed         = np.zeros(N)
+        maxNormalForce      = np.zeros(N)
+
+        # 開傘・燃焼終了後にレールを離れたケースは, 姿勢・空力が降下に影響しないので
+        #   fastDescent : ループから外し, 最後にDescentSolverでまとめて解く
+        #   それ以外    : 以降は鉛直方向の抗力と風による水平移動だけを陽的Euler法で進める (Solver._stepParachuteと同じ式)
+        fastDescent = AppSetting.simulation.fastDescent and self._trajectoryMode == TrajectoryMode.Parachute
+        descending  = np.zeros(N, dtype=bool)
+        descentTime = np.zeros(N)
+        parachutePhase = np.zeros(N, dtype=bool)
+
+        steps = 0
+        caseSteps = 0 # 全ケースのステップ数の合計 (計測用)
+        while np.any(active):
+            idx  = np.flatnonzero(active & ~parachutePhase) # 全ての運動方程式を解くケース
+            pidx = np.flatnonzero(active & parachutePhase)  # パラシュート降下のみのケース
+            caseSteps += len(idx) + len(pidx)
+            nextTime = elapsedTime + dt
+            record = steps % saveInterval == 0
+
+            if len(idx) > 0:
+                y = state[idx]
+                p, v = y[:, POS], y[:, VELOCITY]
+
+                # parachute
+                opened = parachuteOpened[idx]
+                if self._trajectoryMode == TrajectoryMode.Parachute:
+                    detectpeakCondition = maxAltitude[idx] > p[:, 2] + AppSetting.simulation.detectPeakThreshold
+                    detectpeak = PARACHUTE.openingType == ParachuteOpeningType.TimeFromDetectPeak
+                    fixedtime  = PARACHUTE.openingType == ParachuteOpeningType.FixedTime
+                    timeFromDetectPeakCondition = elapsedTime - maxAltitudeTime[idx] > PARACHUTE.openingTime
+
+                    wait = waitForOpenPara[idx] | (~opened & timeFromDetectPeakCondition & detectpeakCondition)
+                    newlyOpened = (detectpeak & detectpeakCondition) | (fixedtime and elapsedTime > PARACHUTE.openingTime) | \
+                                  (wait & timeFromDetectPeakCondition)
+                    waitForOpenPara[idx] = wait
+                    opened = opened | newlyOpened
+                    parachuteOpened[idx] = opened
+
+                # phase (Solver._bindStepKernelと同じ判定)
+                onRail = (norm(p, axis=1) <= self._environment.railLength) & (v[:, 2] >= 0.0)
+                para   = ~onRail & opened
+                flight = ~onRail & ~opened
+
+                newlyCleared = flight & ~launchClear[idx]
+                if np.any(newlyCleared):
+                    launchClear[idx[newlyCleared]]         = True
+                    launchClearTime[idx[newlyCleared]]     = elapsedTime
+                    launchClearVelocity[idx[newlyCleared]] = v[newlyCleared]
+
+                derivative = StateDerivatives(elapsedTime, y, dynamics, np.empty_like(y), idx, onRail, para)
+                y[para, 3:5] = derivative[para, 0:2] # 水平方向の速度は風速 (z軸方向は反映しない)
+                y += derivative * dt
+                y[flight, QUAT] /= norm(y[flight, QUAT], axis=1)[:, None] # 姿勢が変化するフェーズのみ正規化する
+                state[idx] = y
+                p, v = y[:, POS], y[:, VELOCITY]
+
+                # organize result
+                finished = ~((p[:, 2] > 0.0) | (nextTime < 0.1))
+                organize = np.ones(len(idx), dtype=bool) if record else finished
+                if np.any(organize):
+                    o = idx[organize]
+                    rising = v[organize, 2] > 0
+
+                    higher = maxAltitude[o] < p[organize, 2]
+                    maxAltitude[o]     = np.where(higher, p[organize, 2], maxAltitude[o])
+                    maxAltitudeTime[o] = np.where(higher, nextTime, maxAltitudeTime[o])
+                    maxVelocity[o]     = np.maximum(maxVelocity[o], norm(v[organize], axis=1))
+                    maxAirspeed[o]     = np.maximum(maxAirspeed[o], dynamics.airspeed[organize])
+                    maxNormalForce[o]  = np.where(rising, np.maximum(maxNormalForce[o], norm(dynamics.force_b[organize, 1:], axis=1)), maxNormalForce[o])
+
+                active[idx[finished]] = False
+
+                handOver = opened & ~finished & SPEC.engine.didCombustions(nextTime / P.burnTime[idx]) & \
+                           ~((norm(p, axis=1) <= self._environment.railLength) & (v[:, 2] >= 0.0))
+                if np.any(handOver):
+                    if fastDescent:
+                        descending[idx[handOver]]  = True
+                        descentTime[idx[handOver]] = nextTime
+                        active[idx[handOver]]      = False
+                    else:
+                        parachutePhase[idx[handOver]] = True
+
+            if len(pidx) > 0:
+                # StateDerivativesのパラシュート降下と同じ計算 (推力・空力・姿勢は降下に影響しないので省く)
+                y = state[pidx]
+                p, v = y[:, POS], y[:, VELOCITY]
+                windModel.update(p[:, 2], pidx)
+                airspeed = norm(v - windModel.wind, axis=1) # 機体座標系へ変換しても大きさは同じ
+
+                dVelZ = ParachuteAcceleration(windModel.density, v[:, 2], dynamics.parachuteCd[pidx], y[:, MASS], windModel.gravity)
+                v[:, 0:2] = windModel.wind[:, 0:2] # z軸方向は反映しない
+                p += v * dt
+                v[:, 2] += dVelZ * dt
+                state[pidx] = y
+
+                finished = ~((p[:, 2] > 0.0) | (nextTime < 0.1))
+                organize = slice(None) if record else finished
+                o = pidx[organize]
+                if len(o) > 0:
+                    higher = maxAltitude[o] < p[organize, 2]
+                    maxAltitude[o]     = np.where(higher, p[organize, 2], maxAltitude[o])
+                    maxAltitudeTime[o] = np.where(higher, nextTime, maxAltitudeTime[o])
+                    maxVelocity[o]     = np.maximum(maxVelocity[o], norm(v[organize], axis=1))
+                    maxAirspeed[o]     = np.maximum(maxAirspeed[o], airspeed[organize])
+
+                active[pidx[finished]] = False
+
+            elapsedTime = nextTime
+            steps += 1
+
+        if profiler is not None:
+            profiler.countSteps(caseSteps)
+
+        pos = state[:, POS]
+        if np.any(descending):
+            d = np.flatnonzero(descending)
+            descent = SolveDescent(windModel, d, pos[d], state[d, 5], descentTime[d], state[d, MASS], dynamics.parachuteCd[d],
+                                   AppSetting.simulation.descentAltitudeStep, AppSetting.simulation.descentMaxStep)
+            pos[d] = descent.pos
+            higher = descent.maxAltitude > maxAltitude[d]
+            maxAltitude[d]     = np.where(higher, descent.maxAltitude, maxAltitude[d])
+            maxAltitudeTime[d] = np.where(higher, descent.maxAltitudeTime, maxAltitudeTime[d])
+            maxVelocity[d]     = np.maximum(maxVelocity[d], descent.maxVelocity)
+            maxAirspeed[d]     = np.maximum(maxAirspeed[d], descent.maxAirspeed)
+
+        results = np.array([SimuResultSummary() for _ in range(N)])
+        for i, result in enumerate(results):
+            result : SimuResultSummary
+            result.bodyResults = np.array([], dtype=SimuResultBody)
+            result.bodyFinalPositions = np.array([
+                BodyFinalPosition(latitude  = self._mapData.coordinate.latitudeAt(pos[i, 1]),
+                                  longitude = self._mapData.coordinate.longitudeAt(pos[i, 0]))])
+            result.windSpeed                  = windSpeeds[i]
+            result.windDirection              = windDirections[i]
+            result.launchClearTime            = launchClearTime[i]
+            result.launchClearVelocity        = launchClearVelocity[i]
+            result.maxAltitude                = maxAltitude[i]
+            result.detectPeakTime             = maxAltitudeTime[i]
+            result.maxVelocity                = maxVelocity[i]
+            result.maxAirspeed                = maxAirspeed[i]
+            result.maxNormalForceDuringRising = maxNormalForce[i]
+        return results
@@ -0,0 +1,109 @@
+'''
+パラシュート降下専用の解析
+
+開傘後 (燃焼終了後) の運動は
+    dz/dt  = vz
+    dvz/dt = 0.5 * rho(z) * vz^2 * Cd / m - g(z)
+    dx/dt, dy/dt = 風速(z) の水平成分 (風に流される)
+だけで決まり, 姿勢・空力係数は影響しない (RocketDynamics.StateDerivativeのパラシュート降下と同じ式).
+これを複数ケースまとめて4次Runge-Kutta法で積分する. 刻み幅はケース毎に
+    - 1ステップの高度変化が altitudeStep 以下 (風の高度分布を解像するため).
+      べき法則の風速は地表付近で高度変化が急なので, 現在高度の半分 (最小0.1 m) 以下にもする
+    - 抗力による速度の緩和時間 m / (rho * Cd * max(|vz|, 終端速度)) 以下 (開傘直後の急減速・頂点付近からの加速のため)
+    - maxStep 以下
+となるように毎ステップ決める. 地表 (z = 0) を跨いだステップは線形補間で着地点を求める.
+'''
+from PyPrologue.dynamics.WindModel import BatchWindModel
+
+import numpy as np
+from dataclasses import dataclass
+
+@dataclass
+class DescentResult:
+    '''各ケースの降下結果 (配列の並びは入力と同じ)'''
+    pos : np.ndarray             # 着地位置 (N, 3)
+    elapsedTime : np.ndarray     # 着地時刻 [s]
+    verticalVelocity : np.ndarray # 着地時の鉛直速度 [m/s]
+    maxAltitude : np.ndarray     # 降下中の最高高度 (開傘時に上昇中だった場合のみ開傘時より高くなる)
+    maxAltitudeTime : np.ndarray
+    maxVelocity : np.ndarray     # 対地速度の最大値
+    maxAirspeed : np.ndarray     # 対気速度 (= |vz|) の最大値
+    steps : int = 0
+
+def SolveDescent(windModel : BatchWindModel,
+                 index : np.ndarray,
+                 pos : np.ndarray,
+                 verticalVelocity : np.ndarray,
+                 elapsedTime : np.ndarray | float,
+                 mass : np.ndarray | float,
+                 Cd : np.ndarray | float,
+                 altitudeStep : float = 10.0,
+                 maxStep : float = 1.0) -> DescentResult:
+    '''
+    開傘した状態から着地までを解く.
+    Args:
+        windModel        : 各ケースの風を与えるモデル.
+        index            : 各ケースのwindModel上のインデックス.
+        pos              : 開傘時の位置 (N, 3).
+        verticalVelocity : 開傘時の鉛直速度 (N,).
+        elapsedTime      : 開傘時の経過時間.
+        mass             : 質量 (燃焼終了後なので一定).
+        Cd               : パラシュートの抗力係数 (Solverと同様に代表面積を含む).
+        altitudeStep     : 1ステップの高度変化の上限 [m].
+        maxStep          : 刻み幅の上限 [s].
+    '''
+    index = np.asarray(index)
+    N = len(index)
+    x, y, z = (np.array(pos[:, i], dtype=float) for i in range(3))
+    vz = np.array(verticalVelocity, dtype=float)
+    t = np.broadcast_to(np.asarray(elapsedTime, dtype=float), (N,)).copy()
+    mass = np.broadcast_to(np.asarray(mass, dtype=float), (N,))
+    Cd = np.broadcast_to(np.asarray(Cd, dtype=float), (N,))
+
+    maxAltitude, maxAltitudeTime = z.copy(), t.copy()
+    maxVelocity, maxAirspeed = np.zeros(N), np.abs(vz)
+
+    active = z > 0.0
+    steps = 0
+    while np.any(active):
+        i = np.flatnonzero(active)
+        zi, vzi, m, cd = z[i], vz[i], mass[i], Cd[i]
+
+        def derivative(height : np.ndarray, velocity : np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+            windModel.update(height, index[i])
+            wind = windModel.wind
+            return velocity, 0.5 * windModel.density * velocity**2 * cd / m - windModel.gravity, wind[:, 0], wind[:, 1]
+
+        k1 = derivative(zi, vzi)
+        # 刻み幅 (k1の評価で求めた現在高度の密度を使う)
+        dragCoefficient = windModel.density * cd
+        terminalVelocity = np.sqrt(2.0 * m * windModel.gravity / np.maximum(dragCoefficient, 1e-300))
+        relaxation = m / (dragCoefficient * np.maximum(np.abs(vzi), terminalVelocity) + 1e-12)
+        heightStep = np.minimum(altitudeStep, np.maximum(0.5 * zi, 0.1))
+        h = np.minimum(np.minimum(heightStep / (np.abs(vzi) + 1e-12), relaxation), maxStep)
+
+        maxVelocity[i] = np.maximum(maxVelocity[i], np.sqrt(k1[2]**2 + k1[3]**2 + vzi**2))
+        maxAirspeed[i] = np.maximum(maxAirspeed[i], np.abs(vzi))
+
+        k2 = derivative(zi + 0.5 * h * k1[0], vzi + 0.5 * h * k1[1])
+        k3 = derivative(zi + 0.5 * h * k2[0], vzi + 0.5 * h * k2[1])
+        k4 = derivative(zi + h * k3[0], vzi + h * k3[1])
+        increment = [h / 6 * (a + 2 * b + 2 * c + d) for a, b, c, d in zip(k1, k2, k3, k4)]
+
+        zNew = zi + increment[0]
+        # 地表を跨いだケースは線形補間で着地させる
+        fraction = np.where(zNew <= 0.0, zi / np.maximum(zi - zNew, 1e-300), 1.0)
+        z[i]  = np.where(zNew <= 0.0, 0.0, zNew)
+        vz[i] = vzi + fraction * increment[1]
+        x[i] += fraction * increment[2]
+        y[i] += fraction * increment[3]
+        t[i] += fraction * h
+
+        higher = z[i] > maxAltitude[i]
+        maxAltitude[i]     = np.where(higher, z[i], maxAltitude[i])
+        maxAltitudeTime[i] = np.where(higher, t[i], maxAltitudeTime[i])
+
+        active[i[zNew <= 0.0]] = False
+        steps += 1
+
+    return DescentResult(np.stack([x, y, z], axis=1), t, vz, maxAltitude, maxAltitudeTime, maxVelocity, maxAirspeed, steps)
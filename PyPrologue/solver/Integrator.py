@@ -0,0 +1,184 @@
+'''
+常微分方程式の積分器
+
+状態を1本のベクトル y として扱い, 微分関数 f(t, y) -> dy/dt を積分する.
+- RK4Integrator             : 固定刻みの4次Runge-Kutta法
+- DormandPrinceIntegrator   : 誤差制御付きの可変刻みRunge-Kutta法 (RK45, Dormand–Prince)
+
+各ステップの結果 (IntegrationStep) は3次Hermite補間による密出力を持ち,
+Eventの符号変化をステップ内で根探索 (Illinois法) して発生時刻を求める.
+
+参考: E. Hairer, S. P. Nørsett, G. Wanner, "Solving Ordinary Differential Equations I", Sec. II.4-6
+'''
+import numpy as np
+from numpy.linalg import norm
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable
+
+Derivative = Callable[[float, np.ndarray], np.ndarray]
+
+@dataclass
+class IntegrationStep:
+    '''1ステップ分の結果. 区間内の任意時刻の状態を補間できる'''
+    t0 : float
+    y0 : np.ndarray
+    f0 : np.ndarray
+    t1 : float
+    y1 : np.ndarray
+    f1 : np.ndarray
+
+    def interpolate(self, t : float) -> np.ndarray:
+        '''3次Hermite補間 (両端の状態と微分値を使う)'''
+        h = self.t1 - self.t0
+        if h == 0.0: return self.y1.copy()
+        s = (t - self.t0) / h
+        h00 = (1 + 2 * s) * (1 - s)**2
+        h10 = s * (1 - s)**2
+        h01 = s**2 * (3 - 2 * s)
+        h11 = s**2 * (s - 1)
+        return h00 * self.y0 + h10 * h * self.f0 + h01 * self.y1 + h11 * h * self.f1
+
+class Event:
+    '''
+    状態の関数 g(t, y) の符号変化で定義されるイベント.
+    Args:
+        function  : g(t, y).
+        direction : 検出する符号変化の向き (1: 負->正, -1: 正->負, 0: 両方).
+    '''
+    def __init__(self, function : Callable[[float, np.ndarray], float], direction : int = 0):
+        self.function = function
+        self.direction = direction
+
+    def crossed(self, g0 : float, g1 : float) -> bool:
+        match self.direction:
+            case 1:  return g0 < 0.0 <= g1
+            case -1: return g0 > 0.0 >= g1
+            case _:  return (g0 < 0.0 <= g1) or (g0 > 0.0 >= g1)
+
+def FindEvent(step : IntegrationStep, events : list[Event], tolerance : float = 1e-9) -> tuple[int, float] | None:
+    '''
+    ステップ内で最初に発生するイベントを探す.
+    Returns:
+        (イベントのインデックス, 発生時刻) または None.
+        発生時刻は符号変化後の側 (イベント条件を満たした側) の値を返す.
+    '''
+    found : tuple[int, float] | None = None
+    for idx, event in enumerate(events):
+        g0 = event.function(step.t0, step.y0)
+        g1 = event.function(step.t1, step.y1)
+        if not event.crossed(g0, g1):
+            continue
+
+        # Illinois法 (はさみうち法の改良版) で [ta, tb] を狭める
+        ta, ga, tb, gb = step.t0, g0, step.t1, g1
+        side = 0
+        for _ in range(100):
+            if tb - ta <= tolerance * max(1.0, abs(tb)):
+                break
+            tc = tb - gb * (tb - ta) / (gb - ga)
+            if not (ta < tc < tb): tc = 0.5 * (ta + tb)
+            gc = event.function(tc, step.interpolate(tc))
+            if event.crossed(ga, gc): # 根は [ta, tc]
+                tb, gb = tc, gc
+                if side == -1: ga *= 0.5
+                side = -1
+            else:                     # 根は [tc, tb]
+                ta, ga = tc, gc
+                if side == 1: gb *= 0.5
+                side = 1
+
+        if found is None or tb < found[1]:
+            found = (idx, tb)
+    return found
+
+class Integrator(ABC):
+    def __init__(self, derivative : Derivative, t0 : float, y0 : np.ndarray):
+        self._derivative : Derivative = derivative
+        self.reset(t0, y0)
+
+    def reset(self, t0 : float, y0 : np.ndarray) -> None:
+        '''状態を設定し直す (イベント後の再開などで使う)'''
+        self._t : float = t0
+        self._y : np.ndarray = np.array(y0, dtype=float)
+        self._f : np.ndarray = np.array(self._derivative(t0, self._y))
+
+    @property
+    def t(self) -> float: return self._t
+
+    @property
+    def y(self) -> np.ndarray: return self._y
+
+    @abstractmethod
+    def step(self, tLimit : float) -> IntegrationStep:
+        '''tLimitを超えない範囲で1ステップ進める'''
+        pass
+
+class RK4Integrator(Integrator):
+    def __init__(self, derivative : Derivative, t0 : float, y0 : np.ndarray, h : float):
+        self._h : float = h
+        super().__init__(derivative, t0, y0)
+
+    def step(self, tLimit : float) -> IntegrationStep:
+        t, y, f = self._t, self._y, self._f
+        h = min(self._h, tLimit - t)
+
+        # 微分関数が出力用の配列を使い回しても良いよう, 各段の値は必ずコピーする
+        K = np.empty((4, len(y)))
+        K[0] = f
+        K[1] = self._derivative(t + 0.5 * h, y + 0.5 * h * K[0])
+        K[2] = self._derivative(t + 0.5 * h, y + 0.5 * h * K[1])
+        K[3] = self._derivative(t + h, y + h * K[2])
+        y1 = y + h / 6 * (K[0] + 2 * K[1] + 2 * K[2] + K[3])
+
+        self._t, self._y = t + h, y1
+        self._f = np.array(self._derivative(self._t, self._y))
+        return IntegrationStep(t, y, f, self._t, self._y, self._f)
+
+class DormandPrinceIntegrator(Integrator):
+    # Butcher tableau
+    _c = np.array([0, 1/5, 3/10, 4/5, 8/9, 1, 1])
+    _a = [
+        np.array([]),
+        np.array([1/5]),
+        np.array([3/40, 9/40]),
+        np.array([44/45, -56/15, 32/9]),
+        np.array([19372/6561, -25360/2187, 64448/6561, -212/729]),
+        np.array([9017/3168, -355/33, 46732/5247, 49/176, -5103/18656]),
+        np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84]),
+    ]
+    _b = np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0])          # 5次
+    _e = _b - np.array([5179/57600, 0, 7571/16695, 393/640, -92097/339200, 187/2100, 1/40]) # 5次 - 4次
+
+    def __init__(self, derivative : Derivative, t0 : float, y0 : np.ndarray,
+                 h : float, rtol : float, atol : float, maxStep : float):
+        self._h : float = h
+        self._rtol : float = rtol
+        self._atol : float = atol
+        self._maxStep : float = maxStep
+        super().__init__(derivative, t0, y0)
+
+    def step(self, tLimit : float) -> IntegrationStep:
+        t, y, f = self._t, self._y, self._f
+        K = np.empty((7, len(y)))
+
+        while True:
+            h = min(self._h, self._maxStep, tLimit - t)
+            K[0] = f
+            for i in range(1, 7):
+                K[i] = self._derivative(t + self._c[i] * h, y + h * (self._a[i] @ K[:i]))
+            y1 = y + h * (self._b @ K) # 7段目はy1における微分値 (FSAL)
+
+            scale = self._atol + self._rtol * np.maximum(np.abs(y), np.abs(y1))
+            error = norm(h * (self._e @ K) / scale) / np.sqrt(len(y))
+
+            # 次の刻み幅 (安全係数0.9, 拡大縮小は0.2~5倍)
+            factor = 5.0 if error == 0.0 else min(5.0, max(0.2, 0.9 * error ** -0.2))
+            if error <= 1.0:
+                if h == min(self._h, self._maxStep): # tLimitに合わせて縮めた場合は元の刻み幅を維持する
+                    self._h = h * factor
+                break
+            self._h = h * factor
+
+        self._t, self._y, self._f = t + h, y1, K[6].copy()
+        return IntegrationStep(t, y, f, self._t, self._y, self._f)
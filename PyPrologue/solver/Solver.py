@@ -2,6 +2,7 @@
 解析用クラス
 '''
 from PyPrologue.dynamics.WindModel import *
+from PyPrologue.dynamics.RocketDynamics import *
 from PyPrologue.env.Environment import *
 from PyPrologue.env.Map import *
 from PyPrologue.result.SimuResult import *
@@ -10,13 +11,17 @@ from PyPrologue.rocket.Rocket import *
 from PyPrologue.rocket.RocketSpec import *
 from PyPrologue.app.AppSetting import *
 from PyPrologue.app.CommandLine import *
+from PyPrologue.solver.Integrator import *
+from PyPrologue.solver.DescentSolver import SolveDescent
+from PyPrologue.utils.Profiler import Profiler, ActiveProfiler
 
 import numpy as np
 from numpy.linalg import norm
-import quaternion
-from copy import deepcopy
+from PyPrologue.utils.LazyImport import LazyImport
+quaternion = LazyImport("quaternion")
 
 from enum import Enum, auto
+from typing import Callable
 
 class TrajectoryMode(Enum):
     Trajectory = 1
@@ -40,7 +45,9 @@ class Solver:
                  detachType : DetachType,
                  detachTime : float,
                  env : Environment,
-                 spec : RocketSpecification) -> None:
+                 spec : RocketSpecification,
+                 summaryOnly : bool = False) -> None:
+        '''summaryOnly : ステップ毎の結果を記録せず, 最大値・レール離脱・落下地点のみを求める (scatter用)'''
         self._dt : float                        = AppSetting.simulation.dt
         self._environment : Environment         = env
         self._mapData : MapData                 = mapData
@@ -49,6 +56,7 @@ class Solver:
         self._detachType : DetachType           = detachType
         self._detachTime : float                = detachTime
         self._rocketSpec : RocketSpecification  = spec
+        self._summaryOnly : bool                = summaryOnly
         
         # Simulation
         self._rocket : Rocket       = Rocket()        
@@ -57,11 +65,38 @@ class Solver:
         self._currentBodyIndex : int= 0
         self._detachCount : int     = 0
         self._steps : int           = 0
+        self._phase : FlightPhase   = FlightPhase.Rail # 積分器使用時のみ
+        self._phaseChanged : bool   = False
+        self._apogeeFound : bool    = False
+        self._dynamics : DynamicsParameter | None = None
+        self._derivativeBuffer : np.ndarray = np.empty(StateSize)
+        self._stepKernel : Callable[[], None] = lambda: None # 現在のフェーズのステップ関数 (陽的Euler法)
+        self._watchParachute : bool = False # 開傘判定が必要か
+        self._descentWindModel : BatchWindModel | None = None # _stepDescent用 (1ケース分)
         
         # Result
         self._resultLogger : SimuResultLogger | None = None
         
-        self._rocket.bodies = np.array([Body() for _ in range(self._rocketSpec.bodyCount)])
+        self._rocket.bodies = [Body() for _ in range(self._rocketSpec.bodyCount)]
+        
+        # Profiling (有効な場合のみ計測対象のメソッドを差し替える)
+        self._profiler : Profiler | None = ActiveProfiler()
+        if self._profiler is not None:
+            self._instrument(self._profiler)
+    
+    def _instrument(self, profiler : Profiler) -> None:
+        '''各フェーズのステップ関数と毎ステップの処理を計測付きにする (インスタンス属性で上書き)'''
+        for name, method in [("update",          "_update"),
+                             ("parachute_check", "_updateParachute"),
+                             ("detachment",      "_updateDetachment"),
+                             ("step.rail",       "_stepRail"),
+                             ("step.powered",    "_stepPowered"),
+                             ("step.coast",      "_stepCoast"),
+                             ("step.parachute",  "_stepParachute"),
+                             ("step.descent",    "_stepDescent"),
+                             ("organize_result", "_organizeResult"),
+                             ("integrator",      "_solveIntegrated")]:
+            setattr(self, method, profiler.wrap(name, getattr(self, method)))
     
     def solve(self, windSpeed : float, windDirection : float) -> SimuResultLogger:
         # initialize wind model
@@ -72,70 +107,55 @@ class Solver:
                 self._windModel = WindModel(magneticDeclination=self._mapData.magneticDeclination, groundwindSpeed=windSpeed, groundWindDirection=windDirection)
         
         # may not failed to create WindModel...
+        self._descentWindModel = BatchWindModel(magneticDeclination=self._mapData.magneticDeclination,
+                                                groundWindSpeeds=[windSpeed], groundWindDirections=[windDirection])
         
         # Initialize result
-        self._resultLogger = SimuResultLogger(self._rocketSpec, self._mapData, windSpeed, windDirection)
+        self._resultLogger = SimuResultLogger(self._rocketSpec, self._mapData, windSpeed, windDirection, self._summaryOnly)
         self._resultLogger.pushBody()
         
         # Loop until all rockets are solved
         # Single rocket: solve once
         # Multi rokcet : every rockets including after detachment
-        for solvedBodyCount in range(2 * self._detachCount + 1):
+        # (分離するとボディが増えるので, 条件は毎回評価する)
+        solvedBodyCount = 0
+        while solvedBodyCount < 2 * self._detachCount + 1:
+            solvedBodyCount += 1
             self._steps = 0
             
             self._initializeRocket()
-            time1 = 0
-            time1_start = 0
-            time2 = 0
-            time2_start = 0
-            time3 = 0
-            time3_start = 0
-            time4 = 0
-            time4_start = 0
-            time5 = 0
-            time5_start = 0
-            time6 = 0
-            time6_start = 0
-            time7 = 0
-            time7_start = 0
+            if AppSetting.simulation.integrator != IntegratorType.Euler:
+                self._solveIntegrated()
+                self._resultLogger.setBodyFinalPosition(self._currentBodyIndex, self._rocket.bodies[self._currentBodyIndex].pos)
+                if self._profiler is not None:
+                    self._profiler.countSteps(self._steps)
+                continue
+            
+            checkDetachment = self._rocketType == RocketType.Multi
+            self._dynamics = DynamicsParameter(self._rocketSpec.bodySpec(self._currentBodyIndex), self._windModel.valueInto)
+            self._bindStepKernel()
+            
             # loop until the rokcket lands
             while (self._rocket.bodies[self._currentBodyIndex].pos[2] > 0.0 or
                     self._rocket.bodies[self._currentBodyIndex].elapsedTime < 0.1):
-                time1_start = time.time()
                 self._update()
-                time1 += time.time() - time1_start
-                if self._trajectoryMode == TrajectoryMode.Parachute:
+                if self._watchParachute:
                     self._updateParachute()
                 
-                if self._rocketType == RocketType.Multi and self._updateDetachment():
+                if checkDetachment and self._updateDetachment():
                     break
-                time2_start = time.time()
-                self._updateAerodynamicParameters()
-                time2 += time.time() - time2_start
-                time3_start = time.time()
-                self._updateRopcketProperties()
-                time3 += time.time() - time3_start
-                time4_start = time.time()
-                self._updateExternalForce()
-                time4 += time.time() - time4_start
-                time5_start = time.time() 
-                self._updateRocketDelta()
-                time5 += time.time() - time5_start
-                time6_start = time.time()
-                self._applyDelta()
-                time6 += time.time() - time6_start
-                time7_start = time.time()
+                self._stepKernel() # 現在のフェーズの微小変化量計算・積分
                 if self._steps % AppSetting.result.stepSaveInterval == 0:
-                    self._organizeResult()
+                    self._organizeResult(self._summaryOnly)
             
                 self._steps += 1
-                time7 += time.time() - time7_start
             # Save last if need
-            if self._steps > 0 and (self._steps - 1) % AppSetting.result.stepSaveInterval != 0:
+            if self._steps > 0 and (self._summaryOnly or (self._steps - 1) % AppSetting.result.stepSaveInterval != 0):
                 self._organizeResult()
             
             self._resultLogger.setBodyFinalPosition(self._currentBodyIndex, self._rocket.bodies[self._currentBodyIndex].pos)
-            print([time1, time2, time3, time4, time5, time6, time7])
+            if self._profiler is not None:
+                self._profiler.countSteps(self._steps)
         return self._resultLogger
         
     def _initializeRocket(self) -> None:
@@ -159,7 +179,7 @@ class Solver:
         self._bodyDelta.quat = \
             quaternion.from_euler_angles(yaw, -pitch, 0) # TODO : 計算式要チェック
     
-        self._rocket.bodies[self._currentBodyIndex] = deepcopy(self._bodyDelta) # deepcopyしないとidを共有してしまい, deltaに代入するとbodyの方にも代入されてしまう
+        self._rocket.bodies[self._currentBodyIndex] = self._bodyDelta.copy() # コピーしないとidを共有してしまい, deltaに代入するとbodyの方にも代入されてしまう
     
     def _update(self):
         self._windModel.update(self._rocket.bodies[self._currentBodyIndex].pos[2])
@@ -230,18 +250,18 @@ class Solver:
             # TODO : 分離時の計算
             # Prologueではエンジンから0.2秒間上部ボディに推力を与える処理がコメントアウトされていた.
 
-            self._rocket.bodies[self._currentBodyIndex + 1] = detach 
+            self._rocket.bodies[self._currentBodyIndex + 1] = detach.copy() # 各ボディは別のオブジェクトにする
             nextBody1 : Body = self._rocket.bodies[self._currentBodyIndex + 1] # ミュータブルオブジェクトは参照渡し
             # nextBody1           = detach # これだと参照が変わってしまい, 元の配列は不変
-            nextBody1.mass      = self._rocketSpec.bodySpec(self._currentBodyIndex + 1).massInitialmassInitial
+            nextBody1.mass      = self._rocketSpec.bodySpec(self._currentBodyIndex + 1).massInitial
             nextBody1.refLength = self._rocketSpec.bodySpec(self._currentBodyIndex + 1).CGLengthInitial
             nextBody1.iyz       = self._rocketSpec.bodySpec(self._currentBodyIndex + 1).rollingMomentInertiaInitial
             
-            self._rocket.bodies[self._currentBodyIndex + 2] = detach 
-            nextBody2 : Body = self._rocket.bodies[self._currentBodyIndex + 1] # ミュータブルオブジェクトは参照渡し
-            nextBody2.mass      = self._rocketSpec.bodySpec(self._currentBodyIndex + 1).massInitialmassInitial
-            nextBody2.refLength = self._rocketSpec.bodySpec(self._currentBodyIndex + 1).CGLengthInitial
-            nextBody2.iyz       = self._rocketSpec.bodySpec(self._currentBodyIndex + 1).rollingMomentInertiaInitial
+            self._rocket.bodies[self._currentBodyIndex + 2] = detach.copy()
+            nextBody2 : Body = self._rocket.bodies[self._currentBodyIndex + 2] # ミュータブルオブジェクトは参照渡し
+            nextBody2.mass      = self._rocketSpec.bodySpec(self._currentBodyIndex + 2).massInitial
+            nextBody2.refLength = self._rocketSpec.bodySpec(self._currentBodyIndex + 2).CGLengthInitial
+            nextBody2.iyz       = self._rocketSpec.bodySpec(self._currentBodyIndex + 2).rollingMomentInertiaInitial
         
             self._detachCount += 1
             
@@ -249,163 +269,287 @@ class Solver:
         
         return False
     
-    def _updateAerodynamicParameters(self) -> None:
-        '''空力特性更新関数'''
+    def _onRail(self, body : Body) -> bool:
+        return norm(body.pos) <= self._environment.railLength and body.velocity[2] >= 0.0
+    
+    def _bindStepKernel(self) -> None:
+        '''
+        現在の状態から飛行フェーズを判定し, そのフェーズのステップ関数を割り当てる.
+        毎ステップではなく, フェーズが変わる時 (と各ボディの解析開始時) にだけ呼ぶ.
+            ランチレール上 -> 燃焼中の飛行 -> 燃焼終了後の飛行 -> パラシュート降下
+        分離後のボディも, 分離時の状態からフェーズを判定して同様に解く.
+        '''
         THIS_BODY : Body = self._rocket.bodies[self._currentBodyIndex] # ミュータブルオブジェクトは参照渡し
         THIS_BODY_SPEC : BodySpecification = self._rocketSpec.bodySpec(self._currentBodyIndex)
-        airspeed = quaternion.from_vector_part(THIS_BODY.velocity - self._windModel.wind) # 地上座標系における風速 (Quaternion)
-        THIS_BODY.airspeed_b = (THIS_BODY.quat.conj() * airspeed * THIS_BODY.quat).imag 
-        
-        THIS_BODY.attackAngle = \
-            np.arctan(norm(THIS_BODY.airspeed_b[1:]) / (THIS_BODY.airspeed_b[0] + 1e-16))
-        
-        THIS_BODY.aeroCoef = \
-            THIS_BODY_SPEC.aeroCoeffStorage.valueIn(norm(THIS_BODY.airspeed_b),
-                                                    THIS_BODY.attackAngle,
-                                                    THIS_BODY_SPEC.engine.didCombustion(THIS_BODY.elapsedTime))
-        
-        alpha = np.arctan(THIS_BODY.airspeed_b[2] / (THIS_BODY.airspeed_b[0] + 1e-16))
-        beta  = np.arctan(THIS_BODY.airspeed_b[1] / (THIS_BODY.airspeed_b[0] + 1e-16))
-        
-        THIS_BODY.Cnp = THIS_BODY.aeroCoef.Cna * alpha
-        THIS_BODY.Cny = THIS_BODY.aeroCoef.Cna * beta
+        self._watchParachute = self._trajectoryMode == TrajectoryMode.Parachute and not THIS_BODY.parachuteOpened
         
-        THIS_BODY.Cmqp = THIS_BODY_SPEC.Cmq
-        THIS_BODY.Cmqy = THIS_BODY_SPEC.Cmq
+        if self._onRail(THIS_BODY): # launch
+            self._stepKernel = self._stepRail
+        elif THIS_BODY.parachuteOpened: # parachute opened
+            # 結果を記録しない場合, 燃焼終了後の降下はDescentSolverで着地まで一度に解ける
+            fastDescent = self._summaryOnly and AppSetting.simulation.fastDescent and \
+                          THIS_BODY_SPEC.engine.didCombustion(THIS_BODY.elapsedTime)
+            self._stepKernel = self._stepDescent if fastDescent else self._stepParachute
+        else: # flight
+            if not self._rocket.launchClear:
+                self._rocket.launchClear = True
+                self._resultLogger.setLaunchClear(THIS_BODY)
+            if THIS_BODY_SPEC.engine.didCombustion(THIS_BODY.elapsedTime):
+                self._stepKernel = self._stepCoast
+            else:
+                self._stepKernel = self._stepPowered
+    
+    def _stepRail(self) -> None:
+        '''ランチレール上のステップ. レールを離れたら次のフェーズへ'''
+        if not self._onRail(self._rocket.bodies[self._currentBodyIndex]):
+            self._bindStepKernel()
+            self._stepKernel()
+            return
+        self._stepState(FlightPhase.Rail)
     
-    def _updateRopcketProperties(self) -> None:
-        '''質量・圧力中心・慣性モーメントの微小変化量更新関数'''
+    def _stepPowered(self) -> None:
+        '''燃焼中の飛行のステップ. 燃焼終了・開傘で次のフェーズへ'''
         THIS_BODY : Body = self._rocket.bodies[self._currentBodyIndex] # ミュータブルオブジェクトは参照渡し
-        THIS_BODY_SPEC : BodySpecification = self._rocketSpec.bodySpec(self._currentBodyIndex)
-        
-        if THIS_BODY_SPEC.engine.isCombusting(THIS_BODY.elapsedTime):
-            self._bodyDelta.mass = \
-                (THIS_BODY_SPEC.massFinal - THIS_BODY_SPEC.massInitial) / THIS_BODY_SPEC.engine.combustionTime
-            self._bodyDelta.refLength = \
-                (THIS_BODY_SPEC.CGLengthFinal - THIS_BODY_SPEC.CGLengthInitial) / THIS_BODY_SPEC.engine.combustionTime
-            self._bodyDelta.iyz = \
-                (THIS_BODY_SPEC.rollingMomentInertiaFinal - THIS_BODY_SPEC.rollingMomentInertiaInitial) / THIS_BODY_SPEC.engine.combustionTime
-            self._bodyDelta.ix = (0.01 - 0.02) / THIS_BODY_SPEC.engine.combustionTime
-        else:
-            self._bodyDelta.mass = 0
-            self._bodyDelta.refLength = 0
-            self._bodyDelta.iyz = 0
-            self._bodyDelta.ix = 0
-            
-    def _updateExternalForce(self) -> None:
-        '''外力更新関数'''
+        if THIS_BODY.parachuteOpened or self._rocketSpec.bodySpec(self._currentBodyIndex).engine.didCombustion(THIS_BODY.elapsedTime):
+            self._bindStepKernel()
+            self._stepKernel()
+            return
+        self._stepState(FlightPhase.Flight)
+    
+    def _stepCoast(self) -> None:
+        '''燃焼終了後の飛行のステップ. 開傘で次のフェーズへ'''
+        if self._rocket.bodies[self._currentBodyIndex].parachuteOpened:
+            self._bindStepKernel()
+            self._stepKernel()
+            return
+        self._stepState(FlightPhase.Flight)
+    
+    def _stepParachute(self) -> None:
+        '''パラシュート降下のステップ (着地まで)'''
         THIS_BODY : Body = self._rocket.bodies[self._currentBodyIndex] # ミュータブルオブジェクトは参照渡し
-        THIS_BODY_SPEC : BodySpecification = self._rocketSpec.bodySpec(self._currentBodyIndex)
-        
-        THIS_BODY.force_b  = np.array([0.0, 0.0, 0.0])
-        THIS_BODY.moment_b = np.array([0.0, 0.0, 0.0])
-        
-        # thrust
-        THIS_BODY.force_b[0] += THIS_BODY_SPEC.engine.thrustAt(THIS_BODY.elapsedTime, self._windModel.pressure)
+        # 空力・外力は降下に影響しないので, 結果を記録するステップ (記録間隔毎と着地直前) だけBodyに書き込む
+        record = self._steps % AppSetting.result.stepSaveInterval == 0 or \
+                 THIS_BODY.pos[2] + THIS_BODY.velocity[2] * self._dt <= 0.0
+        self._stepState(FlightPhase.Parachute, record)
+    
+    def _stepState(self, phase : FlightPhase, record : bool = True) -> None:
+        '''
+        StateDerivativeで求めた微分で状態ベクトルを1ステップ進める (陽的Euler法).
+        record : 結果の記録に使う値 (力・空力係数等) をBodyに書き込むか (ステップ前の状態の値).
+        '''
+        THIS_BODY : Body = self._rocket.bodies[self._currentBodyIndex] # ミュータブルオブジェクトは参照渡し
+        self._dynamics.phase = phase
+        self._dynamics.parachuteIndex = THIS_BODY.parachuteIndex
+        derivative = StateDerivative(THIS_BODY.elapsedTime, THIS_BODY.state, self._dynamics, self._derivativeBuffer,
+                                     THIS_BODY if record else None)
+        if phase == FlightPhase.Parachute:
+            THIS_BODY.velocity[0:2] = derivative[0:2] # 水平方向の速度は風速 (z軸方向は反映しない)
+        
+        state = THIS_BODY.state
+        state += derivative * self._dt
+        if phase == FlightPhase.Flight: # 姿勢が変化するフェーズのみ正規化する
+            quat = state[QUAT]
+            quat /= np.sqrt(quat @ quat)
         
-        if not THIS_BODY.parachuteOpened:
-            # Aero
-            preForceCalc : float = 0.5 * self._windModel.density * norm(THIS_BODY.airspeed_b) ** 2 * THIS_BODY_SPEC.bottomArea
-
-            THIS_BODY.force_b -= np.array([
-                THIS_BODY.aeroCoef.Cd * preForceCalc * np.cos(THIS_BODY.attackAngle),
-                THIS_BODY.Cny * preForceCalc,
-                THIS_BODY.Cnp * preForceCalc
-            ],) # add aerodynamic force
-            
-            # Moment
-            preMomentCalc : float = 0.25 * self._windModel.density * norm(THIS_BODY.airspeed_b) * THIS_BODY_SPEC.length ** 2 * THIS_BODY_SPEC.bottomArea
-            THIS_BODY.moment_b = \
-                np.array([
-                    0.0, 
-                    preMomentCalc * THIS_BODY.Cmqp * THIS_BODY.omega_b[1],
-                    preMomentCalc * THIS_BODY.Cmqy * THIS_BODY.omega_b[2]
-                ]) + \
-                np.array([0.0, THIS_BODY.force_b[2], -THIS_BODY.force_b[1]]) * (THIS_BODY.aeroCoef.Cp - THIS_BODY.refLength)
-            
-            # gravity
-            w = np.quaternion(0.0, 0.0, 0.0, -self._windModel.gravity * THIS_BODY.mass) # 重力の寄与
-            THIS_BODY.force_b += (THIS_BODY.quat.conj() * w * THIS_BODY.quat).imag # 正規化しているので \bar{q}^{-1} = {q^{-1}}^{-1}
+        THIS_BODY.elapsedTime += self._dt
+        self._rocket.timeFromLaunch += self._dt
     
-    def _updateRocketDelta(self) -> None:
+    def _stepDescent(self) -> None:
+        '''パラシュート降下を着地までDescentSolverで解く (summaryOnly用). 1回で着地する'''
         THIS_BODY : Body = self._rocket.bodies[self._currentBodyIndex] # ミュータブルオブジェクトは参照渡し
         THIS_BODY_SPEC : BodySpecification = self._rocketSpec.bodySpec(self._currentBodyIndex)
-        # print(THIS_BODY.pos, THIS_BODY.velocity, THIS_BODY.force_b)
-        if norm(THIS_BODY.pos) <= self._environment.railLength and THIS_BODY.velocity[2] >= 0.0: # launch
-            if THIS_BODY.force_b[0] < 0:
-                self._bodyDelta.pos      = np.array([0.0, 0.0, 0.0])
-                self._bodyDelta.velocity = np.array([0.0, 0.0, 0.0])
-                self._bodyDelta.omega_b  = np.array([0.0, 0.0, 0.0])
-                self._bodyDelta.quat     = np.quaternion(0, 0, 0, 0)
-            else:
-                THIS_BODY.force_b[1] = 0
-                THIS_BODY.force_b[2] = 0 # 機軸方向 (ローンチレール方向) に離床
-                self._bodyDelta.pos = THIS_BODY.velocity
-                
-                self._bodyDelta.velocity = (THIS_BODY.quat * quaternion.from_vector_part(THIS_BODY.force_b) * THIS_BODY.quat.inverse()).imag / THIS_BODY.mass
-                
-                # print(quaternion.from_vector_part(THIS_BODY.force_b))
-                # print(THIS_BODY.quat)
-                # print(self._bodyDelta.velocity)
-                
-                self._bodyDelta.omega_b = np.array([0.0, 0.0, 0.0])
-                self._bodyDelta.quat    = np.quaternion(0, 0, 0, 0)
-        elif THIS_BODY.parachuteOpened: # parachute opened
-            paraSpeed = THIS_BODY.velocity
-            drag = 0.5 * self._windModel.density * paraSpeed[2]**2 * THIS_BODY_SPEC.parachutes[THIS_BODY.parachuteIndex].Cd
+        descent = SolveDescent(self._descentWindModel, np.zeros(1, dtype=int),
+                               THIS_BODY.pos[None, :], THIS_BODY.velocity[2:3], THIS_BODY.elapsedTime, THIS_BODY.mass,
+                               THIS_BODY_SPEC.parachutes[THIS_BODY.parachuteIndex].Cd,
+                               AppSetting.simulation.descentAltitudeStep, AppSetting.simulation.descentMaxStep)
+        self._resultLogger.mergeMaxima(descent.maxAltitude.item(), descent.maxAltitudeTime.item(),
+                                       descent.maxVelocity.item(), descent.maxAirspeed.item())
+        
+        self._rocket.timeFromLaunch += descent.elapsedTime.item() - THIS_BODY.elapsedTime
+        THIS_BODY.elapsedTime = descent.elapsedTime.item()
+        THIS_BODY.pos         = descent.pos[0]
+        self._windModel.update(THIS_BODY.pos[2])
+        THIS_BODY.velocity    = (*self._windModel.wind[0:2], descent.verticalVelocity.item())
+        # 着地点として記録する値
+        self._dynamics.phase = FlightPhase.Parachute
+        StateDerivative(THIS_BODY.elapsedTime, THIS_BODY.state, self._dynamics, self._derivativeBuffer, THIS_BODY)
+    
+    def _solveIntegrated(self) -> None:
+        '''
+        RK4/RK45で現在のボディを着地 (または分離) まで解く.
+        状態を1本のベクトルとして積分し, レール離脱・頂点・頂点検知・着地は根探索で,
+        燃焼終了・パラシュート開傘・分離時刻はステップの区切りとして扱う.
+        '''
+        THIS_BODY : Body = self._rocket.bodies[self._currentBodyIndex] # ミュータブルオブジェクトは参照渡し
+        saveInterval = self._dt * AppSetting.result.stepSaveInterval
+        
+        self._phase = FlightPhase.Flight if self._rocket.launchClear else FlightPhase.Rail
+        self._apogeeFound = False
+        
+        self._dynamics = DynamicsParameter(self._rocketSpec.bodySpec(self._currentBodyIndex), self._windModel.valueInto, self._phase, THIS_BODY.parachuteIndex)
+        self._derivativeBuffer = np.empty(StateSize)
+        
+        startTime = THIS_BODY.elapsedTime
+        integrator = self._createIntegrator(startTime, self._packState(THIS_BODY))
+        saveCount = 0
+        while True:
+            events = self._activeEvents()
+            tLimit = self._nextBoundaryTime(integrator.t)
+            step = integrator.step(tLimit)
+            self._steps += 1
             
-            self._bodyDelta.velocity = np.array([0, 0, drag / THIS_BODY.mass - self._windModel.gravity])
+            hit = FindEvent(step, [event for _, event in events])
+            t = step.t1 if hit is None else hit[1]
             
-            THIS_BODY.velocity[0:2] = self._windModel.wind[0:2] # z軸方向は反映しない
+            # 一定間隔で記録 (密出力を使う)
+            while startTime + saveCount * saveInterval <= t:
+                saveTime = startTime + saveCount * saveInterval
+                self._loadState(saveTime, step.interpolate(saveTime))
+                self._evaluate()
+                self._organizeResult(self._summaryOnly)
+                saveCount += 1
             
-            self._bodyDelta.pos = THIS_BODY.velocity
+            self._loadState(t, step.y1 if hit is None else step.interpolate(t))
+            self._update()
             
-            self._bodyDelta.omega_b = np.array([0.0, 0.0, 0.0])
-            self._bodyDelta.quat    = np.quaternion(0, 0, 0, 0)
-        elif THIS_BODY.pos[2] < -10: # stop simulation
-            self._bodyDelta.velocity = np.array([0.0, 0.0, 0.0]) 
-        else: # flight
-            if not self._rocket.launchClear:
-                self._rocket.launchClear = True
-                self._resultLogger.setLaunchClear(THIS_BODY)
+            landed = False
+            if hit is not None:
+                match events[hit[0]][0]:
+                    case "railClear":
+                        self._phase = FlightPhase.Flight
+                        self._rocket.launchClear = True
+                        self._resultLogger.setLaunchClear(THIS_BODY)
+                    case "apogee":
+                        self._apogeeFound = True
+                        THIS_BODY.maxAltitude     = THIS_BODY.pos[2]
+                        THIS_BODY.maxAltitudeTime = THIS_BODY.elapsedTime
+                    case "detectPeak":
+                        THIS_BODY.detectPeak = True
+                    case "landing":
+                        landed = True
+            # レール上で推力が足りず動かない場合
+            if self._phase == FlightPhase.Rail and t >= 0.1 and THIS_BODY.pos[2] <= 0.0:
+                landed = True
+            
+            if landed:
+                self._evaluate()
+                self._organizeResult()
+                return
             
-            self._bodyDelta.pos      = THIS_BODY.velocity
-            self._bodyDelta.velocity = (THIS_BODY.quat * quaternion.from_vector_part(THIS_BODY.force_b) * THIS_BODY.quat.inverse()).imag / THIS_BODY.mass
+            if self._trajectoryMode == TrajectoryMode.Parachute:
+                self._openParachuteIfReady()
             
-            self._bodyDelta.omega_b = (THIS_BODY.moment_b / np.array([THIS_BODY.ix, THIS_BODY.iyz, THIS_BODY.iyz]))
+            if self._rocketType == RocketType.Multi and self._updateDetachment():
+                # 分離時の状態を最後の行として記録する (Euler法の"Save last"と同じ)
+                self._evaluate()
+                self._organizeResult()
+                return
             
-            self._bodyDelta.quat = THIS_BODY.quat * quaternion.from_vector_part(THIS_BODY.omega_b) * 0.5 # integration
+            if hit is not None or t == tLimit or self._phaseChanged:
+                integrator.reset(t, self._packState(THIS_BODY))
+                self._phaseChanged = False
+    
+    def _createIntegrator(self, t0 : float, y0 : np.ndarray) -> Integrator:
+        setting = AppSetting.simulation
+        match setting.integrator:
+            case IntegratorType.RK4:
+                return RK4Integrator(self._derivative, t0, y0, setting.integratorStep)
+            case _: # RK45
+                return DormandPrinceIntegrator(self._derivative, t0, y0, setting.integratorStep,
+                                               setting.relativeTolerance, setting.absoluteTolerance, setting.maxStep)
+    
+    def _activeEvents(self) -> list[tuple[str, Event]]:
+        '''現在のフェーズで監視するイベント (名前, Event)'''
+        THIS_BODY : Body = self._rocket.bodies[self._currentBodyIndex] # ミュータブルオブジェクトは参照渡し
+        events : list[tuple[str, Event]] = []
+        if self._phase == FlightPhase.Rail:
+            railLength = self._environment.railLength
+            events.append(("railClear", Event(lambda t, y: norm(y[0:3]) - railLength, 1)))
+        if not self._apogeeFound:
+            events.append(("apogee", Event(lambda t, y: y[5], -1)))
+        elif self._trajectoryMode == TrajectoryMode.Parachute and not THIS_BODY.detectPeak:
+            detectHeight = THIS_BODY.maxAltitude - AppSetting.simulation.detectPeakThreshold
+            events.append(("detectPeak", Event(lambda t, y: y[2] - detectHeight, -1)))
+        events.append(("landing", Event(lambda t, y: y[2] if t >= 0.1 else 1.0, -1)))
+        return events
     
-    def _applyDelta(self) -> None:
-        '''積分関数'''
+    def _nextBoundaryTime(self, t : float) -> float:
+        '''tより後で, 微分値が不連続になる (または状態を切り替える) 最初の時刻'''
         THIS_BODY : Body = self._rocket.bodies[self._currentBodyIndex] # ミュータブルオブジェクトは参照渡し
         THIS_BODY_SPEC : BodySpecification = self._rocketSpec.bodySpec(self._currentBodyIndex)
         
-        # Update rocekt
-        THIS_BODY.mass      += self._bodyDelta.mass      * self._dt
-        THIS_BODY.refLength += self._bodyDelta.refLength * self._dt
-        THIS_BODY.iyz       += self._bodyDelta.iyz       * self._dt
-        THIS_BODY.ix        += self._bodyDelta.ix        * self._dt
-        THIS_BODY.pos       += self._bodyDelta.pos       * self._dt
-        THIS_BODY.velocity  += self._bodyDelta.velocity  * self._dt
-        THIS_BODY.omega_b   += self._bodyDelta.omega_b   * self._dt
-        THIS_BODY.quat      += self._bodyDelta.quat      * self._dt
+        boundaries = [THIS_BODY_SPEC.engine.combustionTime]
+        if self._phase == FlightPhase.Rail:
+            boundaries.append(0.1)
+        if self._trajectoryMode == TrajectoryMode.Parachute and not THIS_BODY.parachuteOpened:
+            parachute = THIS_BODY_SPEC.parachutes[0]
+            if parachute.openingType == ParachuteOpeningType.FixedTime:
+                boundaries.append(parachute.openingTime)
+            if self._apogeeFound:
+                boundaries.append(THIS_BODY.maxAltitudeTime + parachute.openingTime)
+        if self._rocketType == RocketType.Multi and self._detachType == DetachType.Time:
+            boundaries.append(self._detachTime)
+        
+        return min([b for b in boundaries if b > t + 1e-12], default=np.inf)
+    
+    def _openParachuteIfReady(self) -> None:
+        '''_updateParachuteと同じ条件でパラシュートを開く (積分器用)'''
+        THIS_BODY : Body = self._rocket.bodies[self._currentBodyIndex] # ミュータブルオブジェクトは参照渡し
+        THIS_BODY_SPEC : BodySpecification = self._rocketSpec.bodySpec(self._currentBodyIndex)
+        if THIS_BODY.parachuteOpened:
+            return
         
-        if np.nonzero(THIS_BODY.quat):
-            THIS_BODY.quat = THIS_BODY.quat.normalized()
+        parachute = THIS_BODY_SPEC.parachutes[0]
+        detectpeak = parachute.openingType == ParachuteOpeningType.TimeFromDetectPeak and THIS_BODY.detectPeak
+        fixedtime  = parachute.openingType == ParachuteOpeningType.FixedTime and THIS_BODY.elapsedTime >= parachute.openingTime
+        time_from_detect_peak = \
+            THIS_BODY.detectPeak and THIS_BODY.elapsedTime - THIS_BODY.maxAltitudeTime >= parachute.openingTime
         
-        THIS_BODY.elapsedTime += self._dt
-        self._rocket.timeFromLaunch += self._dt
+        if detectpeak or fixedtime or time_from_detect_peak:
+            THIS_BODY.parachuteOpened = True
+            THIS_BODY.waitForOpenPara = True
+            self._phase = FlightPhase.Parachute
+            self._phaseChanged = True
     
-    def _organizeResult(self) -> None:
+    def _derivative(self, t : float, y : np.ndarray) -> np.ndarray:
+        '''状態ベクトルの時間微分 (積分器用). Bodyは書き換えない'''
+        self._dynamics.phase = self._phase
+        return StateDerivative(t, y, self._dynamics, self._derivativeBuffer)
+    
+    def _evaluate(self) -> None:
+        '''現在の状態から, 結果の記録に使う値 (力・空力係数等) を求めてBodyに書き込む'''
+        THIS_BODY : Body = self._rocket.bodies[self._currentBodyIndex] # ミュータブルオブジェクトは参照渡し
+        self._windModel.update(THIS_BODY.pos[2])
+        self._dynamics.phase = self._phase
+        derivative = StateDerivative(THIS_BODY.elapsedTime, THIS_BODY.state, self._dynamics, self._derivativeBuffer, THIS_BODY)
+        if self._phase == FlightPhase.Parachute:
+            THIS_BODY.velocity[0:2] = derivative[0:2] # 水平方向の速度は風速
+    
+    def _packState(self, body : Body) -> np.ndarray:
+        '''状態ベクトル: pos(3), velocity(3), quat(4), omega_b(3), mass, refLength, iyz, ix'''
+        return body.state.copy()
+    
+    def _loadState(self, t : float, y : np.ndarray) -> None:
+        THIS_BODY : Body = self._rocket.bodies[self._currentBodyIndex] # ミュータブルオブジェクトは参照渡し
+        THIS_BODY.state = y
+        THIS_BODY.quat  = THIS_BODY.quat.normalized()
+        
+        self._rocket.timeFromLaunch += t - THIS_BODY.elapsedTime
+        THIS_BODY.elapsedTime = t
+    
+    def _organizeResult(self, maximaOnly : bool = False) -> None:
+        '''結果の記録. maximaOnlyならステップの値は記録せず, 最大値のみ更新する'''
         THIS_BODY : Body = self._rocket.bodies[self._currentBodyIndex] # ミュータブルオブジェクトは参照渡し
         THIS_BODY_SPEC : BodySpecification = self._rocketSpec.bodySpec(self._currentBodyIndex)
         
-        self._resultLogger.update(self._currentBodyIndex,
-                                  self._rocket,
-                                  THIS_BODY,
-                                  self._windModel,
-                                  THIS_BODY_SPEC.engine.isCombusting(THIS_BODY.elapsedTime))
+        if maximaOnly:
+            self._resultLogger.updateMaxima(THIS_BODY)
+        else:
+            self._resultLogger.update(self._currentBodyIndex,
+                                      self._rocket,
+                                      THIS_BODY,
+                                      self._windModel,
+                                      THIS_BODY_SPEC.engine.isCombusting(THIS_BODY.elapsedTime))
         if THIS_BODY.maxAltitude < THIS_BODY.pos[2]:
             THIS_BODY.maxAltitude     = THIS_BODY.pos[2]
             THIS_BODY.maxAltitudeTime = THIS_BODY.elapsedTime
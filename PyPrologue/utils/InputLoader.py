@@ -0,0 +1,119 @@
+'''
+入力ファイル (仕様JSON, 推力履歴, 空力係数CSV, 実測風CSV) の読み込み
+
+各ファイルは一度だけ解析し, 結果をプロセス内でキャッシュする (キーはパス. 更新時刻・サイズが変われば読み直す).
+AppSetting.processing.inputCache が有効なら, 数値テーブルは input/.cache に .npz としても保存し,
+別プロセス (scatterのワーカー等) や次回の実行では解析せずにそれを読む.
+.npz はパスのハッシュをファイル名とし, 元ファイルの更新時刻・サイズ・内容のハッシュが一致する場合のみ使う.
+
+数値テーブルはnp.loadtxt (C実装) で読む. 区切り文字 (カンマ, タブ, セミコロン, 空白) とヘッダー行の有無は先頭行から判定する.
+usecolsを指定すると, その列のみを読む (備考・時刻等の数値でない列があってもよい). 行末の空の列 ("10,2,3,") は無視する.
+キャッシュした配列は共有されるので書き込み不可にしてある. 変更する場合はコピーすること.
+'''
+from PyPrologue.app.AppSetting import *
+
+import io
+import os
+import json
+import hashlib
+import numpy as np
+from copy import deepcopy
+from pathlib import Path
+
+_cacheDirectory : Path = Path("input/.cache")
+
+# (path, usecols) -> (更新時刻 [ns], サイズ, 内容)
+_tableCache : dict[tuple[Path, tuple[int, ...] | None], tuple[int, int, np.ndarray]] = {}
+_jsonCache : dict[Path, tuple[int, int, dict]] = {}
+
+def LoadTable(filepath : Path | str, usecols : tuple[int, ...] | None = None) -> np.ndarray:
+    '''
+    数値のテキストテーブルを(行数, 列数)の配列として読み込む (書き込み不可).
+    1行目 (usecolsの列) が数値でなければヘッダーとして読み飛ばす.
+    Args:
+        usecols : 読み込む列 (Noneなら全ての列. 全て数値である必要がある).
+    '''
+    filepath = Path(filepath).resolve()
+    usecols = tuple(usecols) if usecols is not None else None
+    stat = filepath.stat()
+    cached = _tableCache.get((filepath, usecols))
+    if cached is not None and cached[0:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+
+    content = filepath.read_bytes()
+    table = None
+    if AppSetting.processing.inputCache:
+        digest = hashlib.blake2b(content, digest_size=16).hexdigest()
+        table = _loadDiskCache(filepath, usecols, stat, digest)
+    if table is None:
+        table = _parseTable(content.decode(), usecols)
+        if AppSetting.processing.inputCache:
+            _saveDiskCache(filepath, usecols, stat, digest, table)
+
+    table.flags.writeable = False
+    _tableCache[(filepath, usecols)] = (stat.st_mtime_ns, stat.st_size, table)
+    return table
+
+def LoadJson(filepath : Path | str) -> dict:
+    '''JSONファイルを読み込む (キャッシュの辞書のコピーを返す)'''
+    filepath = Path(filepath).resolve()
+    stat = filepath.stat()
+    cached = _jsonCache.get(filepath)
+    if cached is None or cached[0:2] != (stat.st_mtime_ns, stat.st_size):
+        with open(filepath) as f:
+            cached = (stat.st_mtime_ns, stat.st_size, json.load(f))
+        _jsonCache[filepath] = cached
+    return deepcopy(cached[2])
+
+def ClearInputCache() -> None:
+    '''プロセス内のキャッシュを破棄する (ディスク上のキャッシュは残す)'''
+    _tableCache.clear()
+    _jsonCache.clear()
+
+def _parseTable(text : str, usecols : tuple[int, ...] | None = None) -> np.ndarray:
+    lines = text.splitlines()
+    first = next((i for i, line in enumerate(lines) if line.strip() != ""), None)
+    if first is None: return np.zeros((0, 0 if usecols is None else len(usecols)))
+
+    line = lines[first]
+    delimiter = next((d for d in (",", "\t", ";") if d in line), None) # Noneは空白区切り
+    tokens = line.split(delimiter)
+    try:
+        if usecols is None:
+            [float(token) for token in tokens if token.strip() != ""]
+        else:
+            [float(tokens[i]) for i in usecols]
+        skip = first
+    except (ValueError, IndexError): # ヘッダー行
+        skip = first + 1
+    if usecols is None and delimiter is not None: # 行末の空の列を除く (usecolsがあればloadtxtが無視する)
+        text = "\n".join(line.rstrip(delimiter + " \t") for line in lines)
+    return np.loadtxt(io.StringIO(text), delimiter=delimiter, skiprows=skip, usecols=usecols, ndmin=2, dtype=float)
+
+def _cachePath(filepath : Path, usecols : tuple[int, ...] | None) -> Path:
+    key = str(filepath) if usecols is None else f"{filepath}:{','.join(map(str, usecols))}"
+    return _cacheDirectory / (hashlib.blake2b(key.encode(), digest_size=8).hexdigest() + ".npz")
+
+def _loadDiskCache(filepath : Path, usecols : tuple[int, ...] | None, stat : os.stat_result, digest : str) -> np.ndarray | None:
+    path = _cachePath(filepath, usecols)
+    if not path.is_file(): return None
+    try:
+        with np.load(path) as npz:
+            if int(npz["mtime_ns"]) != stat.st_mtime_ns or int(npz["size"]) != stat.st_size or str(npz["digest"]) != digest:
+                return None
+            return npz["table"]
+    except (OSError, KeyError, ValueError): # 壊れたキャッシュは無視して解析し直す
+        return None
+
+def _saveDiskCache(filepath : Path, usecols : tuple[int, ...] | None, stat : os.stat_result, digest : str,
+                   table : np.ndarray) -> None:
+    path = _cachePath(filepath, usecols)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 並列に書き込まれても壊れないよう, 一時ファイルに書いてから置き換える
+        temporary = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npz")
+        np.savez(temporary, table=table, mtime_ns=np.int64(stat.st_mtime_ns), size=np.int64(stat.st_size),
+                 digest=np.array(digest))
+        os.replace(temporary, path)
+    except OSError:
+        pass # キャッシュできなくても解析には影響しない
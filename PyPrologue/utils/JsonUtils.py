@@ -52,4 +52,21 @@ def GetValue(json : dict,*keys, default_value : any = 0):
             "The key of " + ".".join((keys)) + " has no value." )
         return default_value
     
-    return dict_buff
\ No newline at end of file
+    return dict_buff
+
+def HasKey(json : dict, *keys) -> bool:
+    '''
+    json.loadによって読取った辞書にキーが存在するか.
+    Args:
+        json : json.loadによって読取った辞書.
+        keys : キー (上位から順に入力. e.g., simulation.dt -> HasKey(json, "simulation", "dt"))
+    '''
+    dict_buff : dict = json
+    
+    for key in keys:
+        if isinstance(dict_buff, dict) and key in dict_buff:
+            dict_buff = dict_buff[key]
+        else:
+            return False
+    
+    return True
@@ -0,0 +1,25 @@
+'''
+モジュールの遅延インポート
+
+    quaternion = LazyImport("quaternion")
+
+とすると, 属性を最初に参照したときに初めてモジュールを読み込む.
+numpy-quaternionはインポート時にscipyも読み込むので重く, 解析を始めるまで (対話的な入力の間など) 読み込まない.
+既にインポート済みのモジュールはそのまま返す.
+'''
+import sys
+import importlib.util
+from types import ModuleType
+
+def LazyImport(name : str) -> ModuleType:
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
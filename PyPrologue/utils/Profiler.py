@@ -0,0 +1,112 @@
+'''
+解析の計測 (プロファイリング) に関する定義
+
+Profilerは区間 (Solverの各フェーズのステップ関数など) 毎の呼び出し回数と経過時間 [ns] (time.perf_counter_ns),
+解析したステップ数を集計し, JSONとして出力する.
+計測は有効化した間 (with Profiling() または AppSetting.processing.profile) に作られたSolverと,
+その間に呼ばれたBatchSolver.solve (解析全体を1区間として計測) にのみ適用される.
+Solverは生成時に ActiveProfiler() を確認し, 有効な場合のみ計測対象のメソッドを計測付きのものに差し替えるので,
+無効な場合は追加のコストが無い.
+
+区間の時間は包含時間 (呼び出し先の区間の時間を含む) である.
+'''
+import json
+from contextlib import contextmanager
+from pathlib import Path
+from time import perf_counter_ns
+from typing import Callable, Iterator
+
+class Profiler:
+    def __init__(self) -> None:
+        self._sections : dict[str, list[int]] = {} # name -> [呼び出し回数, 経過時間 [ns]]
+        self._steps : int = 0
+        self._start : int = perf_counter_ns()
+        self._wallTime : int | None = None         # stop()するまではNone
+
+    def wrap(self, name : str, function : Callable) -> Callable:
+        '''functionを呼び出し毎に区間nameとして計測する関数にする'''
+        counter = self._sections.setdefault(name, [0, 0])
+        def timed(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                counter[0] += 1
+                counter[1] += perf_counter_ns() - start
+        return timed
+
+    @contextmanager
+    def section(self, name : str) -> Iterator[None]:
+        '''with内を区間nameとして計測する (1回の呼び出し). ステップ毎の計測にはwrapを使う'''
+        start = perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add(name, perf_counter_ns() - start)
+
+    def add(self, name : str, elapsedNs : int, count : int = 1) -> None:
+        counter = self._sections.setdefault(name, [0, 0])
+        counter[0] += count
+        counter[1] += elapsedNs
+
+    def countSteps(self, steps : int) -> None:
+        self._steps += steps
+
+    def stop(self) -> None:
+        '''計測を終了し, 経過時間 (wall time) を確定する'''
+        if self._wallTime is None:
+            self._wallTime = perf_counter_ns() - self._start
+
+    def merge(self, report : dict) -> None:
+        '''他のProfilerのreport() (別プロセスのワーカー等) を加算する'''
+        self._steps += report["steps"]
+        for name, section in report["sections"].items():
+            self.add(name, section["total_ns"], section["count"])
+
+    @property
+    def steps(self) -> int: return self._steps
+
+    def report(self) -> dict:
+        '''集計結果. sectionsは経過時間の長い順 (呼び出されなかった区間は含まない)'''
+        wallTime = perf_counter_ns() - self._start if self._wallTime is None else self._wallTime
+        sections = {
+            name : {
+                "count"    : count,
+                "total_ns" : total,
+                "mean_ns"  : total / count if count > 0 else 0.0,
+                "ratio"    : total / wallTime if wallTime > 0 else 0.0 # 並列実行したワーカーの分を含む場合は1を超える
+            } for name, (count, total) in sorted(self._sections.items(), key=lambda item: -item[1][1]) if count > 0
+        }
+        return {
+            "wall_time_s"    : wallTime * 1e-9,
+            "steps"          : self._steps,
+            "steps_per_sec"  : self._steps / (wallTime * 1e-9) if wallTime > 0 else 0.0,
+            "sections"       : sections
+        }
+
+    def save(self, path : Path | str) -> None:
+        with open(path, mode="w") as f:
+            json.dump(self.report(), f, indent=4)
+
+_activeProfiler : Profiler | None = None
+
+def ActiveProfiler() -> Profiler | None:
+    '''有効なProfiler (無効ならNone)'''
+    return _activeProfiler
+
+@contextmanager
+def Profiling(profiler : Profiler | None = None) -> Iterator[Profiler]:
+    '''
+    with内で生成したSolverを計測する.
+        with Profiling() as profiler:
+            Solver(...).solve(windSpeed, windDirection)
+        profiler.save("profile.json")
+    '''
+    global _activeProfiler
+    previous = _activeProfiler
+    _activeProfiler = Profiler() if profiler is None else profiler
+    try:
+        yield _activeProfiler
+    finally:
+        _activeProfiler.stop()
+        _activeProfiler = previous
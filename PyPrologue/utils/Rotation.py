@@ -0,0 +1,68 @@
+'''
+クォータニオンによる座標変換に関する関数定義
+
+姿勢クォータニオン q から方向余弦行列 R を1度だけ作り, 以降の座標変換は行列とベクトルの積で行う.
+    機体座標系 -> 地上座標系 : q v q^* = R v
+    地上座標系 -> 機体座標系 : q^* v q = R^T v
+q は単位クォータニオンを仮定する (Solverでは毎ステップ正規化している).
+
+全ての関数は1機体分 (q : np.quaternion または (4,), v : (3,)) と,
+複数機体分 (q : (N, 4), v : (N, 3)) の両方を受け付ける.
+out を指定すれば結果をその配列に書き込み, 新たな配列は確保しない.
+'''
+import numpy as np
+from PyPrologue.utils.LazyImport import LazyImport
+quaternion = LazyImport("quaternion") # 最初に使うまで読み込まない
+
+def _outerProductToMatrix() -> np.ndarray:
+    '''q (x) q (外積, 16成分) -> 方向余弦行列 - I (9成分) の係数行列'''
+    coefficients = np.zeros((4, 4, 9))
+    for (i, j, k), c in {(2, 2, 0): -2, (3, 3, 0): -2, (1, 2, 1):  2, (0, 3, 1): -2, (1, 3, 2):  2, (0, 2, 2):  2,
+                         (1, 2, 3):  2, (0, 3, 3):  2, (1, 1, 4): -2, (3, 3, 4): -2, (2, 3, 5):  2, (0, 1, 5): -2,
+                         (1, 3, 6):  2, (0, 2, 6): -2, (2, 3, 7):  2, (0, 1, 7):  2, (1, 1, 8): -2, (2, 2, 8): -2}.items():
+        coefficients[i, j, k] = c
+    return coefficients.reshape(16, 9)
+
+# 複数機体分の行列は q (x) q の線形結合として1回の行列積で作る
+_identity = np.eye(3).ravel()
+_outerToMatrix = _outerProductToMatrix()
+
+def RotationMatrix(q : "quaternion.quaternion | np.ndarray", out : np.ndarray | None = None) -> np.ndarray:
+    '''
+    クォータニオンから方向余弦行列 (機体座標系 -> 地上座標系) を作る.
+    Args:
+        q   : (w, x, y, z). np.quaternion, (4,) または (N, 4).
+        out : 結果を書き込む (3, 3) または (N, 3, 3) の配列.
+    '''
+    if isinstance(q, quaternion.quaternion):
+        w, x, y, z = q.w, q.x, q.y, q.z
+    else:
+        q = np.asarray(q, dtype=float)
+        if q.ndim == 2:
+            R = (_identity + (q[:, :, None] * q[:, None, :]).reshape(-1, 16) @ _outerToMatrix).reshape(-1, 3, 3)
+            if out is None: return R
+            out[...] = R
+            return out
+        w, x, y, z = q.tolist()
+
+    # 1機体分はPythonのfloatで計算した方が速い
+    if out is None: out = np.empty((3, 3))
+    xx, yy, zz = x * x, y * y, z * z
+    xy, xz, yz = x * y, x * z, y * z
+    wx, wy, wz = w * x, w * y, w * z
+    out[:] = ((1.0 - 2.0 * (yy + zz), 2.0 * (xy - wz),       2.0 * (xz + wy)),
+              (2.0 * (xy + wz),       1.0 - 2.0 * (xx + zz), 2.0 * (yz - wx)),
+              (2.0 * (xz - wy),       2.0 * (yz + wx),       1.0 - 2.0 * (xx + yy)))
+    return out
+
+def ToGround(R : np.ndarray, v : np.ndarray, out : np.ndarray | None = None) -> np.ndarray:
+    '''機体座標系 -> 地上座標系 (R v). R : (3, 3) または (N, 3, 3)'''
+    if R.ndim == 2:
+        return np.dot(R, v, out=out)
+    return np.matmul(R, v[:, :, None], out=None if out is None else out[:, :, None])[:, :, 0]
+
+def ToBody(R : np.ndarray, v : np.ndarray, out : np.ndarray | None = None) -> np.ndarray:
+    '''地上座標系 -> 機体座標系 (R^T v). R : (3, 3) または (N, 3, 3)'''
+    if R.ndim == 2:
+        return np.dot(v, R, out=out)
+    return np.matmul(v[:, None, :], R, out=None if out is None else out[:, None, :])[:, 0, :]
@@ -0,0 +1,111 @@
+'''
+[0, 1)^d の点列 (サンプル) の生成
+
+    Random         : 擬似乱数 (Monte Carlo)
+    LatinHypercube : 各次元をcount等分した区間に1点ずつ入るように並べる
+    Sobol          : scrambled Sobol列 (低食い違い量列). countが2のべき乗のとき最も一様になる
+
+LatinHypercube・Sobolは少ないサンプル数でも空間を一様に埋めるので, 擬似乱数より少ない解析で同程度の精度が得られる.
+scipy (scipy.stats.qmc) があればそれを使い, 無ければNumPyのみの実装を使う.
+NumPyのみのSobol列はJoe-Kuoの方向数 (_sobolDirections) の次元数まで対応し, 線形行列スクランブルとランダムシフトを行う.
+'''
+from PyPrologue.app.AppSetting import SamplerType
+from PyPrologue.app.CommandLine import *
+
+import warnings
+import importlib.util
+import numpy as np
+
+def ScipyAvailable() -> bool:
+    return importlib.util.find_spec("scipy") is not None # scipyは任意
+
+def SampleUnitCube(sampler : SamplerType, count : int, dimension : int, seedSequence : np.random.SeedSequence) -> np.ndarray:
+    '''
+    [0, 1)^dimension の点を count 個生成する.
+    Returns:
+        (count, dimension) の配列. 同じ seedSequence (のエントロピー) なら同じ点列.
+    '''
+    rng = np.random.default_rng(seedSequence)
+    if dimension == 0:
+        return np.empty((count, 0))
+    match sampler:
+        case SamplerType.Random:
+            return rng.random((count, dimension))
+        case SamplerType.LatinHypercube:
+            if ScipyAvailable():
+                from scipy.stats import qmc
+                return qmc.LatinHypercube(dimension, seed=rng).random(count)
+            return _latinHypercube(count, dimension, rng)
+        case SamplerType.Sobol:
+            if count & (count - 1) != 0:
+                PrintInfo(PrintInfoType.Warning, f"Sobol sequence is most uniform when the number of samples ({count}) is a power of 2.")
+            if ScipyAvailable():
+                from scipy.stats import qmc
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", UserWarning) # 2のべき乗でない場合の警告 (上で出力済み)
+                    return qmc.Sobol(dimension, scramble=True, seed=rng).random(count)
+            return _sobol(count, dimension, rng)
+        case _:
+            raise ValueError(f"{sampler.name} sampler does not generate points.")
+
+def _latinHypercube(count : int, dimension : int, rng : np.random.Generator) -> np.ndarray:
+    '''各次元で, 区間 [k/count, (k+1)/count) のランダムな順列の各区間内に一様に1点ずつ置く'''
+    strata = np.argsort(rng.random((dimension, count)), axis=1).T # 各列がcountの順列
+    return (strata + rng.random((count, dimension))) / count
+
+# Joe-Kuo (new-joe-kuo-6.21201) の方向数 : (s, a, m_1 ... m_s). 1次元目はファン・デル・コルプト列
+_sobolDirections : list[tuple[int, int, tuple[int, ...]]] = [
+    (1, 0, (1,)),
+    (2, 1, (1, 3)),
+    (3, 1, (1, 3, 1)),
+    (3, 2, (1, 1, 1)),
+    (4, 1, (1, 1, 3, 3)),
+    (4, 4, (1, 3, 5, 13)),
+    (5, 2, (1, 1, 5, 5, 17)),
+    (5, 4, (1, 1, 5, 5, 5)),
+    (5, 7, (1, 1, 7, 11, 19)),
+    (5, 11, (1, 1, 5, 1, 1)),
+    (5, 13, (1, 1, 1, 3, 11)),
+    (5, 14, (1, 3, 5, 5, 31)),
+]
+_sobolBits : int = 32
+
+def _sobolDirectionNumbers(dimension : int) -> np.ndarray:
+    '''(dimension, _sobolBits) の方向数 V[j, k] (k+1ビット目が最上位ビット側から並ぶ整数)'''
+    if dimension > len(_sobolDirections) + 1:
+        raise ValueError(f"Sobol sequence without scipy supports up to {len(_sobolDirections) + 1} dimensions.")
+    V = np.zeros((dimension, _sobolBits), dtype=np.uint64)
+    V[0] = [1 << (_sobolBits - 1 - k) for k in range(_sobolBits)]
+    for j in range(1, dimension):
+        s, a, m = _sobolDirections[j - 1]
+        v = [m[k] << (_sobolBits - 1 - k) for k in range(s)]
+        for k in range(s, _sobolBits):
+            value = v[k - s] ^ (v[k - s] >> s)
+            for i in range(1, s):
+                if (a >> (s - 1 - i)) & 1: value ^= v[k - i]
+            v.append(value)
+        V[j] = v
+    return V
+
+def _sobol(count : int, dimension : int, rng : np.random.Generator) -> np.ndarray:
+    '''
+    スクランブルしたSobol列 (グレイコード順).
+    方向数に下三角のランダムな0-1行列を掛け (線形行列スクランブル), 各次元にランダムな値をXORする (ランダムシフト).
+    '''
+    V = _sobolDirectionNumbers(dimension)
+
+    # 線形行列スクランブル : 方向数の各ビット列 (上位ビットから) に対角成分1の下三角行列を掛ける (mod 2)
+    shifts = np.arange(_sobolBits - 1, -1, -1, dtype=np.uint64)
+    bits = ((V[:, :, None] >> shifts) & 1).astype(np.uint8)                          # (d, k, bit)
+    L = np.tril(rng.integers(0, 2, size=(dimension, _sobolBits, _sobolBits), dtype=np.uint8), -1)
+    L[:, np.arange(_sobolBits), np.arange(_sobolBits)] = 1
+    bits = np.einsum("dij,dkj->dki", L, bits, dtype=np.int64) & 1
+    V = (bits.astype(np.uint64) << shifts).sum(axis=2, dtype=np.uint64)
+
+    points = np.empty((count, dimension), dtype=np.uint64)
+    x = rng.integers(0, 1 << _sobolBits, size=dimension, dtype=np.uint64) # ランダムシフト
+    for i in range(count):
+        points[i] = x
+        c = (~i & (i + 1)).bit_length() - 1 # iの最下位の0ビットの位置 (グレイコード)
+        x = x ^ V[:, c]
+    return points / float(1 << _sobolBits)
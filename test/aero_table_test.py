@@ -0,0 +1,72 @@
+'''
+AeroCoefficientTable2Dデバッグ用コード
+Mach数×迎角テーブルの双線形補間を, np.interpを2回使った補間と比較する
+'''
+#--------------------------------PyPrologueをインポートするための処理--------------------------------#
+import sys; import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) # モジュール検索パス追加
+os.chdir(os.path.join(os.path.dirname(__file__), 'benchmark', 'fixtures')) # カレントディレクトリ変更 (フィクスチャを使う)
+#------------------------------------------------終了-----------------------------------------------#
+
+from PyPrologue.rocket.AeroCoefficient import *
+
+import numpy as np
+import tempfile
+import time
+
+def reference(machs, attackAngles, values, mach, attackAngle):
+    # 迎角方向に補間してからMach数方向に補間
+    column = np.array([[np.interp(attackAngle, attackAngles, values[i, :, k]) for k in range(4)] for i in range(len(machs))])
+    return np.array([np.interp(mach, machs, column[:, k]) for k in range(4)])
+
+rng = np.random.default_rng(0)
+attackAngles = np.radians([0.0, 2.0, 4.0, 8.0, 15.0])
+
+print("------------------------------\n")
+
+for machs in (np.linspace(0.0, 2.0, 9),                          # 等間隔
+              np.array([0.0, 0.3, 0.8, 0.95, 1.05, 1.5, 3.0])):  # 不等間隔
+    values = rng.normal(size=(len(machs), len(attackAngles), 4))
+    table = AeroCoefficientTable2D(machs, attackAngles, values)
+    M = rng.uniform(-0.5, 3.5, 200)
+    A = rng.uniform(-0.1, 0.3, 200)
+    expected = np.array([reference(machs, attackAngles, values, m, a) for m, a in zip(M, A)])
+    scalarError = max(np.max(np.abs(np.array(table.valueAt(m, a)) - e)) for m, a, e in zip(M, A, expected))
+    vectorError = np.max(np.abs(table.valuesAt(M, A) - expected))
+    print("scalar :", scalarError)
+    print("vector :", vectorError)
+    assert scalarError < 1e-12 and vectorError < 1e-12
+
+print("------------------------------\n")
+
+start = time.time()
+for _ in range(100000):
+    table.valueAt(0.7, 0.05)
+print(f"valueAt: {(time.time() - start) / 100000 * 1e6:.2f} us/call")
+
+print("------------------------------\n")
+
+# 読み込めないテーブルは理由付きの例外になる (1次元の係数で代用しない)
+header = "Mach,AoA,Cp,Cd_i,Cd_f,Cna\n"
+grid = "".join(f"{m},{a},0.5,0.4,0.5,10\n" for m in (0.0, 1.0) for a in (0.0, 4.0))
+with tempfile.TemporaryDirectory() as directory:
+    for name, text, error in [("table.csv",     header + grid,                               None),
+                              ("missing.csv",   None,                                        FileNotFoundError),
+                              ("table.txt",     header + grid,                               ValueError),
+                              ("columns.csv",   "Mach,AoA,Cp\n0,0,0.5\n1,4,0.5\n",            ValueError),
+                              ("gap.csv",       header + grid.split("\n", 1)[1],             ValueError),
+                              ("duplicate.csv", header + grid.replace("1.0,4.0", "1.0,0.0"), ValueError)]:
+        path = os.path.join(directory, name)
+        if text is not None:
+            with open(path, "w") as file: file.write(text)
+        try:
+            table = AeroCoefficientTable2D.fromCSV(path)
+        except (OSError, ValueError) as e:
+            print(name, type(e).__name__, e)
+            assert error is not None and isinstance(e, error), name
+        else:
+            print(name, "loaded:", table.valueAt(0.5, np.radians(2.0)))
+            assert error is None, name
+            assert np.allclose(table.valueAt(0.5, np.radians(2.0)), (0.5, 0.4, 0.5, 10.0))
+
+print("------------------------------\n")
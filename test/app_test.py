@@ -26,7 +26,7 @@ if QUESTION:
 if APP_SETTIGN:
     print("------------------------------\n")
 
-    pprint(AppSetting.__dict__)
+    pprint(_AppSetting().__dict__)
 
 for idx in progress_bar(100):
     time.sleep(0.01)
\ No newline at end of file
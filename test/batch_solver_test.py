@@ -0,0 +1,75 @@
+'''
+BatchSolverデバッグ用コード
+Solverで1ケースずつ解いた結果と比較する
+'''
+#--------------------------------PyPrologueをインポートするための処理--------------------------------#
+import sys; import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) # モジュール検索パス追加
+os.chdir(os.path.join(os.path.dirname(__file__), 'benchmark', 'fixtures')) # カレントディレクトリ変更 (フィクスチャを使う)
+#------------------------------------------------終了-----------------------------------------------#
+
+from PyPrologue.solver.Solver import *
+from PyPrologue.solver.BatchSolver import *
+
+import json
+import time
+
+file = "input/spec/single.json"
+with open(file) as f:
+    spec_dict = json.load(f)
+
+spec = RocketSpecification(spec_dict)
+env = Environment(spec_dict)
+args = (GetMap(env.place.lower()), RocketType.Single, TrajectoryMode.Trajectory,
+        DetachType.DoNotDetach, 0.0, env, spec)
+
+windSpeeds = np.array([0.0, 2.0, 4.0, 6.0])
+windDirections = np.array([0.0, 90.0, 180.0, 270.0])
+
+print("------------------------------\n")
+
+start = time.time()
+batchResults = BatchSolver(*args).solve(windSpeeds, windDirections)
+print(f"BatchSolver: {time.time() - start:.2f} s")
+
+start = time.time()
+results = [Solver(*args).solve(windSpeed, windDirection).result
+           for windSpeed, windDirection in zip(windSpeeds, windDirections)]
+print(f"Solver: {time.time() - start:.2f} s")
+
+print("------------------------------\n")
+
+# 同じ運動方程式を配列演算で解いているので, 丸め誤差の範囲で一致する
+def assertAgreement(results, batchResults):
+    for result, batchResult in zip(results, batchResults):
+        position, batchPosition = result.bodyFinalPositions[0], batchResult.bodyFinalPositions[0]
+        landingDiff = np.hypot(position.latitude - batchPosition.latitude, position.longitude - batchPosition.longitude) * 111e3 # [m] (概算)
+        print(f"landing diff: {landingDiff:.2e} m, max altitude: {result.maxAltitude} {batchResult.maxAltitude}")
+        assert landingDiff < 1e-3, landingDiff
+        assert np.isclose(result.maxAltitude, batchResult.maxAltitude, rtol=1e-9, atol=0.0)
+        assert np.isclose(result.maxVelocity, batchResult.maxVelocity, rtol=1e-9, atol=0.0)
+
+assertAgreement(results, batchResults)
+
+print("------------------------------\n")
+
+# パラシュート降下 (fastDescent無し) を含めて32ケースを解き, Solverで1ケースずつ解いた場合と比べる
+args = (GetMap(env.place.lower()), RocketType.Single, TrajectoryMode.Parachute,
+        DetachType.DoNotDetach, 0.0, env, spec)
+N = 32
+windSpeeds = np.linspace(1.0, 7.0, N)
+windDirections = np.linspace(0.0, 360.0, N, endpoint=False)
+
+start = time.time()
+batchResults = BatchSolver(*args).solve(windSpeeds, windDirections)
+batchTime = time.time() - start
+
+start = time.time()
+results = [Solver(*args, summaryOnly=True).solve(windSpeed, windDirection).result
+           for windSpeed, windDirection in zip(windSpeeds, windDirections)]
+serialTime = time.time() - start
+print(f"{N} cases (parachute) BatchSolver: {batchTime:.2f} s, Solver: {serialTime:.2f} s ({serialTime / batchTime:.1f}x)")
+
+assertAgreement(results, batchResults)
+
+print("------------------------------\n")
@@ -0,0 +1,192 @@
+'''
+解析コアのベンチマーク
+
+同梱のフィクスチャ (test/benchmark/fixtures. 仕様・推力・空力係数CSV・実測風・設定ファイル) のみを使うので, オフラインで実行できる.
+    マイクロベンチマーク : WindModel.update, AeroCoefficientStrage.valueIn, Engine.thrustAt  -> ops/sec
+    マクロベンチマーク   : Solver.solve (弾道/パラシュート × 単段/2段)                     -> steps/sec
+                           ResultSaver.SaveDetail                                           -> ops/sec
+
+使い方:
+    python test/benchmark/benchmark.py                  # 実行し, baseline.jsonと比較する
+    python test/benchmark/benchmark.py --save-baseline  # 実行結果をbaseline.jsonとして保存する
+    python test/benchmark/benchmark.py -k Solver        # グループ名に"Solver"を含むものだけ実行する
+    python test/benchmark/benchmark.py --output result.json
+
+baselineよりtolerance (既定20%) 以上遅いものがあれば終了コード1を返す.
+baselineは実行したマシンに依存するので, 比較は同じマシンで保存したものに対して行うこと.
+'''
+#--------------------------------PyPrologueをインポートするための処理--------------------------------#
+import sys; import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))) # モジュール検索パス追加
+os.chdir(os.path.join(os.path.dirname(__file__), 'fixtures')) # カレントディレクトリ変更 (設定・入力ファイルはフィクスチャを使う)
+#------------------------------------------------終了-----------------------------------------------#
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import tempfile
+import timeit
+from pathlib import Path
+from typing import Callable
+
+with contextlib.redirect_stdout(io.StringIO()): # 設定・地図の読み込み時の出力を抑制
+    from PyPrologue.simulator.Simulator import *
+    from PyPrologue.utils.Profiler import Profiling
+
+_baselinePath = Path(__file__).resolve().parent / "baseline.json"
+
+# ======================== 計測 ======================== #
+
+def _bestTime(function : Callable[[], object], repeat : int, minTime : float) -> float:
+    '''1回当たりの実行時間 [s] (timeitと同様に, 1回の計測がminTime以上になる回数をrepeat回計測した最小値)'''
+    timer = timeit.Timer(function)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= minTime: break
+        number *= 10 if elapsed < minTime / 10 else 2
+    times = [elapsed] + timer.repeat(repeat=repeat - 1, number=number)
+    return min(times) / number
+
+def _micro(function : Callable[[], object], repeat : int, minTime : float, opsPerCall : int = 1) -> dict:
+    seconds = _bestTime(function, repeat, minTime) / opsPerCall
+    return {"unit": "ops/sec", "value": 1.0 / seconds, "seconds_per_op": seconds}
+
+def _quiet(function : Callable[[], object]) -> Callable[[], object]:
+    '''標準出力 (PrintInfo等) を捨てて実行する関数にする'''
+    def call():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return function()
+    return call
+
+# ======================== フィクスチャ ======================== #
+
+def _loadSpec(name : str) -> dict:
+    with open(f"input/spec/{name}.json") as f:
+        return json.load(f)
+
+def _solverArgs(specName : str, mode : TrajectoryMode, detachType : DetachType = DetachType.DoNotDetach) -> tuple:
+    specJson = _loadSpec(specName)
+    with contextlib.redirect_stdout(io.StringIO()):
+        spec = RocketSpecification(specJson)
+        env = Environment(specJson)
+    rocketType = RocketType.Multi if RocketSpecification.isMultipleRocket(specJson) else RocketType.Single
+    return (GetMap(env.place.lower()), rocketType, mode, detachType, 0.0, env, spec)
+
+_windSpeed, _windDirection = 4.0, 200.0
+
+# ======================== ベンチマーク ======================== #
+
+def BenchWindModel(repeat : int, minTime : float) -> dict:
+    heights = np.linspace(0.0, 1000.0, 1000).tolist()
+    results = {}
+    for wind in [WindModelType.Original, WindModelType.Real]:
+        previous, AppSetting.windModel.type = AppSetting.windModel.type, wind
+        try:
+            windModel = WindModel(magneticDeclination=8.9, groundwindSpeed=_windSpeed, groundWindDirection=_windDirection)
+            def run():
+                for height in heights: windModel.update(height)
+            results[f"WindModel.update[{wind.name}]"] = _micro(run, repeat, minTime, len(heights))
+        finally:
+            AppSetting.windModel.type = previous
+    return results
+
+def BenchAeroCoefficient(repeat : int, minTime : float) -> dict:
+    airspeeds = np.linspace(0.0, 150.0, 1000).tolist()
+    results = {}
+    for name in ["single", "single_aero_csv"]:
+        storage = _solverArgs(name, TrajectoryMode.Trajectory)[-1].bodySpec(0).aeroCoeffStorage
+        def run():
+            for airspeed in airspeeds: storage.valueIn(airspeed, 0.05, True)
+        table = "CSV" if storage.isTimeSeriesSpec else "JSON"
+        results[f"AeroCoefficientStrage.valueIn[{table}]"] = _micro(run, repeat, minTime, len(airspeeds))
+    return results
+
+def BenchEngine(repeat : int, minTime : float) -> dict:
+    engine = _solverArgs("single", TrajectoryMode.Trajectory)[-1].bodySpec(0).engine
+    times = np.linspace(0.0, engine.combustionTime * 1.2, 1000).tolist()
+    def run():
+        for time in times: engine.thrustAt(time, 101325.0)
+    return {"Engine.thrustAt": _micro(run, repeat, minTime, len(times))}
+
+def BenchSolver(repeat : int, minTime : float) -> dict:
+    results = {}
+    for specName, detachType in [("single", DetachType.DoNotDetach), ("multi", DetachType.BurningFinished)]:
+        for mode in [TrajectoryMode.Trajectory, TrajectoryMode.Parachute]:
+            args = _solverArgs(specName, mode, detachType)
+            solve = _quiet(lambda: Solver(*args).solve(_windSpeed, _windDirection))
+            with Profiling() as profiler: # ステップ数のみ (計測中は遅くなるので時間は別に測る)
+                solve()
+            seconds = min(timeit.repeat(solve, repeat=repeat, number=1))
+            results[f"Solver.solve[{specName}, {mode.name}]"] = {
+                "unit": "steps/sec", "value": profiler.steps / seconds, "steps": profiler.steps, "seconds": seconds}
+    return results
+
+def BenchResultSaver(repeat : int, minTime : float) -> dict:
+    logger = _quiet(lambda: Solver(*_solverArgs("single", TrajectoryMode.Parachute)).solve(_windSpeed, _windDirection))()
+    logger.organize()
+    result = logger.result
+    rows = sum(len(body.record) for body in result.bodyResults)
+    with tempfile.TemporaryDirectory() as dir:
+        seconds = _bestTime(lambda: ResultSaver.SaveDetail(dir, result), repeat, minTime)
+    return {"ResultSaver.SaveDetail": {"unit": "ops/sec", "value": 1.0 / seconds, "rows": rows, "rows_per_sec": rows / seconds}}
+
+# グループ名 -> ベンチマーク (各ベンチマークは {名前: 結果} を返す)
+_benchmarks : dict[str, Callable[[int, float], dict]] = {
+    "WindModel.update"              : BenchWindModel,
+    "AeroCoefficientStrage.valueIn" : BenchAeroCoefficient,
+    "Engine.thrustAt"               : BenchEngine,
+    "Solver.solve"                  : BenchSolver,
+    "ResultSaver.SaveDetail"        : BenchResultSaver
+}
+
+# ======================== 比較・出力 ======================== #
+
+def Compare(results : dict, baseline : dict, tolerance : float) -> list[str]:
+    '''baselineよりtolerance以上遅いベンチマーク名 (値はいずれも大きいほど速い)'''
+    regressions = []
+    print(f"{'benchmark':<48}{'value':>16}{'baseline':>16}{'ratio':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<48}{result['value']:>16.1f}{'-':>16}{'-':>8}")
+            continue
+        ratio = result["value"] / baseline[name]["value"]
+        mark = " <- regression" if ratio < 1.0 - tolerance else ""
+        print(f"{name:<48}{result['value']:>16.1f}{baseline[name]['value']:>16.1f}{ratio:>8.2f}{mark}")
+        if mark: regressions.append(name)
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="PyPrologue benchmark suite")
+    parser.add_argument("-k", "--filter", default="", help="グループ名にこの文字列を含むベンチマークのみ実行")
+    parser.add_argument("--repeat", type=int, default=5, help="計測の繰り返し回数 (最小値を採用)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="マイクロベンチマークの1回の計測時間の下限 [s]")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="regressionとみなす速度低下の割合")
+    parser.add_argument("--save-baseline", action="store_true", help="結果をbaseline.jsonとして保存")
+    parser.add_argument("--output", type=Path, default=None, help="結果を出力するJSONファイル")
+    args = parser.parse_args()
+
+    results = {}
+    for group, benchmark in _benchmarks.items():
+        if args.filter in group:
+            results.update(benchmark(args.repeat, args.min_time))
+
+    report = {"python": platform.python_version(), "machine": platform.machine(), "results": results}
+    if args.output is not None:
+        with open(args.output, mode="w") as f: json.dump(report, f, indent=4)
+    if args.save_baseline:
+        with open(_baselinePath, mode="w") as f: json.dump(report, f, indent=4)
+
+    baseline = {}
+    if _baselinePath.exists() and not args.save_baseline:
+        with open(_baselinePath) as f: baseline = json.load(f)["results"]
+    regressions = Compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) (> {args.tolerance:.0%} slower than baseline)")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+'''
+DescentSolverデバッグ用コード
+細かい刻みの陽的Euler法 (Solverのパラシュート降下と同じ式) と比較する
+'''
+#--------------------------------PyPrologueをインポートするための処理--------------------------------#
+import sys; import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) # モジュール検索パス追加
+os.chdir(os.path.join(os.path.dirname(__file__), 'benchmark', 'fixtures')) # カレントディレクトリ変更 (フィクスチャを使う)
+#------------------------------------------------終了-----------------------------------------------#
+
+from PyPrologue.solver.DescentSolver import *
+
+import numpy as np
+import time
+
+windSpeeds = np.array([0.0, 2.0, 4.0, 6.0, 8.0])
+windDirections = np.array([0.0, 90.0, 180.0, 270.0, 300.0])
+windModel = BatchWindModel(groundWindSpeeds=windSpeeds, groundWindDirections=windDirections)
+
+N = len(windSpeeds)
+index = np.arange(N)
+pos = np.array([[10.0, 20.0, 500.0]] * N)
+vz = np.array([5.0, 0.0, -10.0, -30.0, -50.0]) # 開傘時に上昇中のケース・急降下中のケースを含む
+mass, Cd = 1.2, 0.3
+
+start = time.time()
+descent = SolveDescent(windModel, index, pos, vz, 10.0, mass, Cd)
+print(f"DescentSolver: {time.time() - start:.3f} s, {descent.steps} steps")
+
+# 陽的Euler法 (dt = 1e-3)
+start = time.time()
+dt = 1e-3
+p, v, t = pos.copy(), vz.copy(), np.full(N, 10.0)
+active = np.ones(N, dtype=bool)
+while np.any(active):
+    i = np.flatnonzero(active)
+    windModel.update(p[i, 2], i)
+    dv = 0.5 * windModel.density * v[i]**2 * Cd / mass - windModel.gravity
+    p[i, 0:2] += windModel.wind[:, 0:2] * dt
+    p[i, 2]   += v[i] * dt
+    v[i]      += dv * dt
+    t[i]      += dt
+    active[i[p[i, 2] <= 0.0]] = False
+print(f"Euler        : {time.time() - start:.3f} s")
+
+print("------------------------------\n")
+
+landingDiff = np.linalg.norm(descent.pos[:, 0:2] - p[:, 0:2], axis=1)
+print("landing diff [m]:", landingDiff)
+print("time diff    [s]:", descent.elapsedTime - t)
+print("max altitude [m]:", descent.maxAltitude)
+assert np.all(landingDiff < 0.1)
+assert np.all(np.abs(descent.elapsedTime - t) < 0.01)
+assert np.all(descent.pos[:, 2] == 0.0)
+assert descent.maxAltitude[0] > 500.0 and np.all(descent.maxAltitude[1:] == 500.0) # 上昇中に開傘したケースのみ高度が上がる
+
+print("------------------------------\n")
@@ -0,0 +1,122 @@
+'''
+Dispersion (Monte Carlo) デバッグ用コード
+ベンチマークのフィクスチャ (test/benchmark/fixtures) で分散解析を行う
+'''
+#--------------------------------PyPrologueをインポートするための処理--------------------------------#
+import sys; import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) # モジュール検索パス追加
+os.chdir(os.path.join(os.path.dirname(__file__), 'benchmark', 'fixtures')) # カレントディレクトリ変更 (フィクスチャを使う)
+#------------------------------------------------終了-----------------------------------------------#
+
+from PyPrologue.simulator.SimulatorFactory import *
+from PyPrologue.utils.InputLoader import LoadJson
+
+import json
+import time
+
+parameters = LoadUncertainParameters({
+    "mass"         : {"distribution": "normal", "sigma": 0.02},
+    "Cd"           : {"distribution": "uniform", "min": -0.1, "max": 0.1},
+    "thrust"       : {"distribution": "normal", "sigma": 0.03},
+    "rail_azimuth" : {"distribution": "normal", "mean": 0.0, "sigma": 2.0}
+})
+for parameter in parameters: print(parameter, parameter.mean, parameter.variance)
+
+deviations = SampleDeviations(parameters, 10000, np.random.SeedSequence(0))
+print("sample mean    :", deviations.mean(axis=0))
+print("sample variance:", deviations.var(axis=0))
+means, variances = np.array([parameter.mean for parameter in parameters]), np.array([parameter.variance for parameter in parameters])
+assert np.all(np.abs(deviations.mean(axis=0) - means) < 4 * np.sqrt(variances / len(deviations)))
+assert np.allclose(deviations.var(axis=0), variances, rtol=0.05)
+print("------------------------------\n")
+
+# 同じシードなら同じサンプル
+assert np.array_equal(SampleDeviations(parameters, 5, np.random.SeedSequence(1)),
+                      SampleDeviations(parameters, 5, np.random.SeedSequence(1)))
+print("------------------------------\n")
+
+# 2次元正規分布の誤差楕円 (東西 sigma 30 m, 南北 sigma 10 m)
+points = np.random.default_rng(0).normal(size=(100000, 2)) * [30.0, 10.0]
+ellipses = ErrorEllipses(points)
+print(ellipses)
+ellipse95 = next(entry for entry in ellipses["ellipses"] if entry["probability"] == 0.95)
+radius95 = np.sqrt(-2 * np.log(1 - 0.95))
+assert np.isclose(ellipse95["semi_major[m]"], 30.0 * radius95, rtol=0.02)
+assert np.isclose(ellipse95["semi_minor[m]"], 10.0 * radius95, rtol=0.02)
+assert abs(ellipse95["azimuth[deg]"] - 90.0) < 1.0 # 長軸は東西
+print("------------------------------\n")
+
+# 凸包の面積 (1辺10 mの正方形の内部に点を加えても100 m2) と, サンプル数に対する収束
+square = np.vstack([[[0, 0], [10, 0], [10, 10], [0, 10]], np.random.default_rng(0).random((50, 2)) * 10])
+print(ConvexHullArea(square))
+assert np.isclose(ConvexHullArea(square), 100.0)
+for sampler in [SamplerType.Random, SamplerType.Sobol]:
+    points = SampleDeviations(parameters[:2], 1024, np.random.SeedSequence(0), sampler) * [30.0 / 0.02, 10.0 / np.sqrt(0.1**2 / 3)]
+    convergence = FootprintConvergence(points)
+    print(sampler.name, [(entry["count"], round(entry["semi_major_95[m]"], 1)) for entry in convergence])
+    assert [entry["count"] for entry in convergence] == [16, 32, 64, 128, 256, 512, 1024]
+    assert np.isclose(convergence[-1]["semi_major_95[m]"], 30.0 * radius95, rtol=0.05)
+print("------------------------------\n")
+
+AppSetting.dispersion.parameters = {
+    "mass"           : {"distribution": "normal", "sigma": 0.02},
+    "Cd"             : {"distribution": "normal", "sigma": 0.05},
+    "parachute_Cd"   : {"distribution": "normal", "sigma": 0.05},
+    "rail_elevation" : {"distribution": "uniform", "min": -1.0, "max": 1.0}
+}
+SetQuiet(True)
+for spec, samples in [("single", 200), ("multi", 10)]: # 多段ロケットはSolverで1ケースずつ解くので遅い
+    AppSetting.dispersion.samples = samples
+    setting = SimulatorBase.SimulationSetting(simulationMode=SimulationMode.MonteCarlo,
+                                              trajectoryMode=TrajectoryMode.Parachute,
+                                              windSpeed=3.0, windDirection=90.0)
+    simulator = SimulatorFactory.CreateFromSetting(spec, LoadJson(f"input/spec/{spec}.json"), setting)
+    start = time.time()
+    simulator.run(output=False)
+    print(f"{spec}: {time.time() - start:.2f} [s]")
+    print(json.dumps(simulator.statistics, indent=2))
+    assert simulator.statistics["samples"] == samples
+    assert all(body["count"] == samples for body in simulator.statistics["bodies"])
+print("------------------------------\n")
+
+# Unscented変換: 重みの和は1, シグマ点の重み付き平均・分散は入力の平均・分散に一致する
+deviations, weightsMean, weightsCovariance = SigmaPoints(parameters)
+print(len(deviations), "sigma points", weightsMean.sum())
+print("mean    :", weightsMean @ deviations)
+print("variance:", weightsCovariance @ (deviations - weightsMean @ deviations)**2, [parameter.variance for parameter in parameters])
+assert len(deviations) == 2 * len(parameters) + 1 and np.isclose(weightsMean.sum(), 1.0)
+assert np.allclose(weightsMean @ deviations, means)
+assert np.allclose(weightsCovariance @ (deviations - weightsMean @ deviations)**2, variances)
+print("------------------------------\n")
+
+# Monte Carloと同じパラメータ (single) で比較する
+setting = SimulatorBase.SimulationSetting(simulationMode=SimulationMode.Unscented,
+                                          trajectoryMode=TrajectoryMode.Parachute,
+                                          windSpeed=3.0, windDirection=90.0)
+simulator = SimulatorFactory.CreateFromSetting("single", LoadJson("input/spec/single.json"), setting)
+start = time.time()
+simulator.run(output=False)
+print(f"single (unscented): {time.time() - start:.2f} [s]")
+print(json.dumps(simulator.statistics, indent=2))
+assert simulator.statistics["sigma_points"] == 2 * len(AppSetting.dispersion.parameters) + 1
+print("------------------------------\n")
+
+# 計測を有効にして複数プロセスで解析すると, ワーカー側の計測結果が加算される (ステップ数が0にならない)
+AppSetting.processing.profile = True
+AppSetting.processing.multiThread, AppSetting.processing.threadCount = True, 2
+simulator = SimulatorFactory.CreateFromSetting("single", LoadJson("input/spec/single.json"), setting)
+simulator.run(output=False)
+print(f"single (unscented, 2 processes): {simulator.profiler.steps} steps")
+assert simulator.profiler.steps > 0
+AppSetting.processing.profile = False
+AppSetting.processing.multiThread, AppSetting.processing.threadCount = False, 1
+print("------------------------------\n")
+
+# 風条件が無い (風速の下限 > 上限) scatterは解析せずにエラーを出力してFalseを返す
+windSpeedRange = AppSetting.simulation.windSpeedMin, AppSetting.simulation.windSpeedMax
+AppSetting.simulation.windSpeedMin, AppSetting.simulation.windSpeedMax = 8.0, 1.0
+setting = SimulatorBase.SimulationSetting(simulationMode=SimulationMode.Scatter, trajectoryMode=TrajectoryMode.Parachute)
+simulator = SimulatorFactory.CreateFromSetting("single", LoadJson("input/spec/single.json"), setting)
+assert simulator.run(output=False) == False
+AppSetting.simulation.windSpeedMin, AppSetting.simulation.windSpeedMax = windSpeedRange
+print("------------------------------\n")
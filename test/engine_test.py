@@ -4,19 +4,51 @@ engine.pyデバッグ用コード
 #--------------------------------PyPrologueをインポートするための処理--------------------------------#
 import sys; import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) # モジュール検索パス追加
-os.chdir(os.path.join(os.path.dirname(__file__), '..')) # カレントディレクトリ変更
+os.chdir(os.path.join(os.path.dirname(__file__), 'benchmark', 'fixtures')) # カレントディレクトリ変更 (フィクスチャを使う)
 #------------------------------------------------終了-----------------------------------------------#
 
 from PyPrologue.rocket.Engine import *
 import matplotlib.pyplot as plt
 
 engine = Engine()
-engine.loadThrustData( "I260_440cc_test0003_prologue.txt")
+engine.loadThrustData("input/thrust/motor.txt")
 import pprint
 pprint.pprint(engine.__dict__)
 print(engine.thrustAt(2.0, 101325))
 t = np.linspace(0, 3, 500)
 
+print("------------------------------\n")
+
+print("total impulse :", engine.totalImpulse, "impulse at end :", engine.impulseAt(engine.combustionTime))
+print("average thrust:", engine.averageThrust, "max thrust :", engine.maxThrust)
+assert np.isclose(engine.impulseAt(engine.combustionTime), engine.totalImpulse)
+
 thrust = [engine.thrustAt(time, 101325) for time in t]
+assert np.array_equal(engine.thrustsAt(t, 101325), thrust)
+
+print("------------------------------\n")
+
+# 同じ時刻のデータ点 (推力の不連続) はnp.interpと同じ値になる (その時刻では最後の点の値)
+import tempfile
+with tempfile.TemporaryDirectory() as directory:
+    path = os.path.join(directory, "step.txt")
+    with open(path, "w") as f: f.write("0.0 0\n0.1 100\n0.2 60.1\n0.2 182.6\n0.3 120\n0.5 90\n0.5 30\n1.0 50\n1.0 0\n")
+    duplicated = Engine()
+    duplicated.loadThrustData(path)
+    data = np.loadtxt(path)
+    times = np.concatenate((data[:, 0], np.linspace(0.0, 1.0, 1001)))
+    expected = np.interp(times, data[:, 0], data[:, 1])
+    print("thrustAt(0.2) :", duplicated.thrustAt(0.2, 101325), "np.interp :", np.interp(0.2, data[:, 0], data[:, 1]))
+    assert np.array_equal([duplicated.thrustAt(time, 101325) for time in times], expected)
+    assert np.array_equal(duplicated.thrustsAt(times, 101325), expected)
+    # 累積力積は台形則 (区間内で推力は線形なので厳密)
+    impulse = np.sum(np.diff(data[:, 0]) * (data[1:, 1] + data[:-1, 1]) / 2)
+    assert np.isclose(duplicated.impulseAt(duplicated.combustionTime), duplicated.totalImpulse)
+    assert np.isclose(duplicated.totalImpulse, impulse)
+
+print("------------------------------\n")
+
 plt.plot(t, thrust)
+if engine.totalImpulse > 0:
+    plt.plot(t, [engine.impulseAt(time) / engine.totalImpulse * engine.maxThrust for time in t]) # 燃焼の進行率 (最大推力で規格化)
 plt.show()
@@ -0,0 +1,63 @@
+'''
+InputLoaderデバッグ用コード
+pandasで読み込んだ結果と比較し, キャッシュの効果を確認する
+'''
+#--------------------------------PyPrologueをインポートするための処理--------------------------------#
+import sys; import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) # モジュール検索パス追加
+os.chdir(os.path.join(os.path.dirname(__file__), 'benchmark', 'fixtures')) # カレントディレクトリ変更 (フィクスチャを使う)
+#------------------------------------------------終了-----------------------------------------------#
+
+from PyPrologue.utils.InputLoader import *
+
+import pandas as pd
+import tempfile
+import time
+
+fixtures = "input/"
+
+for file, options in [(fixtures + "thrust/motor.txt", dict(header=None, sep=None, engine="python")),
+                      (fixtures + "spec/aero.csv",    dict(float_precision="round_trip")),
+                      (fixtures + "wind/wind.csv",    dict(float_precision="round_trip"))]:
+    start = time.perf_counter()
+    expected = pd.read_csv(file, **options).to_numpy(dtype=float)
+    pandasTime = time.perf_counter() - start
+
+    ClearInputCache()
+    start = time.perf_counter()
+    table = LoadTable(file)
+    loadTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cached = LoadTable(file)
+    cachedTime = time.perf_counter() - start
+
+    print(file, table.shape, "equal:", np.array_equal(expected, table))
+    print(f"  pandas: {pandasTime * 1e3:.2f} ms, LoadTable: {loadTime * 1e3:.2f} ms, cached: {cachedTime * 1e6:.1f} us")
+    assert np.array_equal(expected, table)
+    assert cached is table # 2回目はキャッシュした配列をそのまま返す
+    assert not table.flags.writeable
+
+print("------------------------------\n")
+
+spec = LoadJson(fixtures + "spec/single.json")
+mass = spec["rocket1"]["mass_i"]
+spec["rocket1"]["mass_i"] = 0.0 # 返り値を変更してもキャッシュには影響しない
+print(LoadJson(fixtures + "spec/single.json")["rocket1"]["mass_i"])
+assert LoadJson(fixtures + "spec/single.json")["rocket1"]["mass_i"] == mass
+
+print("------------------------------\n")
+
+# 備考列・行末の区切り文字があっても読める (usecolsの列のみ読む)
+with tempfile.TemporaryDirectory() as directory:
+    for name, text, usecols, expected in [("note.csv",     "1,2,3,a\n4,5,6,b\n",           (0, 1, 2), [[1, 2, 3], [4, 5, 6]]),
+                                          ("header.csv",   "t,F,note\n0,1,start\n1,2,\n",  (0, 1),    [[0, 1], [1, 2]]),
+                                          ("trailing.csv", "10,2,3,\n20,4,5,\n",           None,      [[10, 2, 3], [20, 4, 5]]),
+                                          ("trailing.txt", "10,2,3,\n20,4,5,\n",           (0, 1, 2), [[10, 2, 3], [20, 4, 5]]),
+                                          ("space.txt",    "0 1 burnout\n1 2 x\n",         (0, 1),    [[0, 1], [1, 2]])]:
+        path = os.path.join(directory, name)
+        with open(path, "w") as file: file.write(text)
+        print(name, LoadTable(path, usecols).tolist())
+        assert LoadTable(path, usecols).tolist() == expected, name
+
+print("------------------------------\n")
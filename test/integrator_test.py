@@ -0,0 +1,41 @@
+'''
+Integratorデバッグ用コード
+調和振動子 x'' = -x を解き, 解析解 x = cos(t) と比較する
+'''
+#--------------------------------PyPrologueをインポートするための処理--------------------------------#
+import sys; import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) # モジュール検索パス追加
+os.chdir(os.path.join(os.path.dirname(__file__), '..')) # カレントディレクトリ変更
+#------------------------------------------------終了-----------------------------------------------#
+
+from PyPrologue.solver.Integrator import *
+
+def derivative(t : float, y : np.ndarray) -> np.ndarray:
+    return np.array([y[1], -y[0]])
+
+# x = 0 (t = pi/2) で止める
+events = [Event(lambda t, y: y[0], -1)]
+
+print("------------------------------\n")
+
+# (積分器, 許容誤差): RK4は h^4 ~ 1e-8, RK45は許容誤差1e-8の積み重ね
+for integrator, tolerance in [(RK4Integrator(derivative, 0.0, np.array([1.0, 0.0]), 0.01), 1e-8),
+                              (DormandPrinceIntegrator(derivative, 0.0, np.array([1.0, 0.0]), 0.01, 1e-8, 1e-8, 1.0), 1e-6)]:
+    steps = 0
+    while True:
+        step = integrator.step(10.0)
+        steps += 1
+        hit = FindEvent(step, events)
+        if hit is not None:
+            print(type(integrator).__name__, "event error:", hit[1] - np.pi / 2)
+            assert abs(hit[1] - np.pi / 2) < tolerance
+            break
+
+    while integrator.t < 10.0:
+        integrator.step(10.0)
+        steps += 1
+    print(type(integrator).__name__, "final error:", integrator.y[0] - np.cos(10.0), "steps:", steps)
+    assert integrator.t == 10.0
+    assert abs(integrator.y[0] - np.cos(10.0)) < tolerance and abs(integrator.y[1] + np.sin(10.0)) < tolerance
+
+print("------------------------------\n")
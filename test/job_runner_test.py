@@ -0,0 +1,60 @@
+'''
+JobRunnerデバッグ用コード
+ベンチマークのフィクスチャ (test/benchmark/fixtures) でマニフェストのジョブを実行する
+'''
+#--------------------------------PyPrologueをインポートするための処理--------------------------------#
+import sys; import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) # モジュール検索パス追加
+os.chdir(os.path.join(os.path.dirname(__file__), 'benchmark', 'fixtures')) # カレントディレクトリ変更 (フィクスチャを使う)
+#------------------------------------------------終了-----------------------------------------------#
+
+from PyPrologue.simulator.JobRunner import *
+
+import json
+import tempfile
+
+manifest = {
+    "jobs": [
+        {"spec": "single", "simulation_mode": "detail", "trajectory_mode": "trajectory", "wind": [[2.0, 0.0], [4.0, 200.0]]},
+        {"spec": "multi.json", "simulation_mode": "detail", "trajectory_mode": "parachute", "wind": [[3.0, 90.0]],
+         "detach_type": "time", "detach_time": 3.0}
+    ]
+}
+
+with tempfile.TemporaryDirectory() as dir:
+    path = os.path.join(dir, "jobs.json")
+    with open(path, mode="w") as f: json.dump(manifest, f)
+    jobs = LoadJobs(path)
+
+print(f"{len(jobs)} jobs")
+for job in jobs: print(job)
+assert len(jobs) == 3 # windの条件毎に1ジョブ
+assert [(job.setting.windSpeed, job.setting.windDirection) for job in jobs] == [(2.0, 0.0), (4.0, 200.0), (3.0, 90.0)]
+assert jobs[2].setting.detachType == DetachType.Time and jobs[2].setting.detachTime == 3.0
+print("------------------------------\n")
+
+SetQuiet(True)
+results = RunJobs(jobs, output=False)
+SetQuiet(False)
+PrintJobSummary(results)
+assert all(result.success for result in results)
+print("------------------------------\n")
+
+# 不正なマニフェスト
+for entry in [{"spec": "single", "simulation_mode": "detail"},
+              {"spec": "single", "simulation_mode": "ballistic"},
+              {"spec": "single", "trajectory_mode": "ballistic"},
+              {"spec": "multi", "detach_type": "time"},
+              {"spec": "multi", "detach_type": "time", "detach_time": -1.0},
+              {"spec": "multi", "detach_type": "sideways"},
+              {"spec": "missing"}]:
+    with tempfile.TemporaryDirectory() as dir:
+        path = os.path.join(dir, "jobs.json")
+        with open(path, mode="w") as f: json.dump([entry], f)
+        try:
+            LoadJobs(path)
+        except ValueError as e:
+            print(e)
+        else:
+            raise AssertionError(f"{entry} was accepted")
+print("------------------------------\n")
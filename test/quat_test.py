@@ -1,5 +1,33 @@
+#--------------------------------PyPrologueをインポートするための処理--------------------------------#
+import sys; import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) # モジュール検索パス追加
+os.chdir(os.path.join(os.path.dirname(__file__), '..')) # カレントディレクトリ変更
+#------------------------------------------------終了-----------------------------------------------#
+
 import numpy as np
 import quaternion
 
+from PyPrologue.utils.Rotation import *
+
 print(np.quaternion(1, 2, 3, 4).imag)
-print(type(np.quaternion(1, 2, 3, 4).imag))
\ No newline at end of file
+print(type(np.quaternion(1, 2, 3, 4).imag))
+
+print("------------------------------\n")
+
+# 方向余弦行列による座標変換と, クォータニオンの積による座標変換の比較
+rng = np.random.default_rng(0)
+q = rng.normal(size=(100, 4))
+q /= np.linalg.norm(q, axis=1, keepdims=True)
+v = rng.normal(size=(100, 3))
+
+R = RotationMatrix(q)
+toBody   = np.array([(np.quaternion(*qi).conj() * quaternion.from_vector_part(vi) * np.quaternion(*qi)).imag for qi, vi in zip(q, v)])
+toGround = np.array([(np.quaternion(*qi) * quaternion.from_vector_part(vi) * np.quaternion(*qi).inverse()).imag for qi, vi in zip(q, v)])
+print("ToBody   (N):", np.max(np.abs(ToBody(R, v) - toBody)))
+print("ToGround (N):", np.max(np.abs(ToGround(R, v) - toGround)))
+
+R = RotationMatrix(np.quaternion(*q[0]))
+print("ToBody   (1):", np.max(np.abs(ToBody(R, v[0]) - toBody[0])))
+print("ToGround (1):", np.max(np.abs(ToGround(R, v[0]) - toGround[0])))
+
+print("------------------------------\n")
@@ -0,0 +1,38 @@
+'''
+ResultStoreデバッグ用コード
+列を保存し, memmapで読み込んだ値・メタデータと比較する
+'''
+#--------------------------------PyPrologueをインポートするための処理--------------------------------#
+import sys; import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) # モジュール検索パス追加
+os.chdir(os.path.join(os.path.dirname(__file__), 'benchmark', 'fixtures')) # カレントディレクトリ変更 (フィクスチャを使う)
+#------------------------------------------------終了-----------------------------------------------#
+
+from PyPrologue.result.ResultStore import *
+
+import tempfile
+
+columns = {"time": np.linspace(0.0, 10.0, 100001), "altitude": np.random.rand(100001), "empty": np.array([])}
+metadata = {"spec_name": "test", "dt": 0.0001}
+
+print("------------------------------\n")
+
+# Parquetはpyarrowが無ければ飛ばす. AutoはpyarrowがあればParquet, 無ければ (または列の長さが揃っていなければ) NPZになる
+if not ParquetAvailable(): print("pyarrow is not installed: parquet round-trip is skipped")
+uniform = {name: column for name, column in columns.items() if name != "empty"}
+cases = [(columns, BinaryFormat.NPZ, ".npz"), (columns, BinaryFormat.Auto, ".npz"),
+         (uniform, BinaryFormat.Auto, ".parquet" if ParquetAvailable() else ".npz")]
+if ParquetAvailable(): cases.append((uniform, BinaryFormat.Parquet, ".parquet"))
+with tempfile.TemporaryDirectory() as dir:
+    for i, (data, format, suffix) in enumerate(cases):
+        path = SaveColumns(Path(dir)/f"result{i}", data, metadata, format)
+        print(format.name, "->", path.suffix, path.suffix == suffix)
+        loaded = LoadColumns(path, ["altitude"])
+        print(path.name, type(loaded["altitude"]).__name__,
+              np.array_equal(loaded["altitude"], data["altitude"]),
+              LoadMetadata(path) == metadata)
+        loaded = LoadColumns(path, mmap=False)
+        print(path.name, sorted(loaded.keys()), all(np.array_equal(loaded[name], data[name]) for name in data))
+        del loaded
+
+print("------------------------------\n")
@@ -0,0 +1,133 @@
+'''
+RocketDynamicsデバッグ用コード
+StateDerivativeの結果を, 方向余弦行列とnp.quaternionで計算した値と比較する
+StateDerivatives (ベクトル版) の結果を, 各行をStateDerivativeで計算した値と比較する
+'''
+#--------------------------------PyPrologueをインポートするための処理--------------------------------#
+import sys; import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) # モジュール検索パス追加
+os.chdir(os.path.join(os.path.dirname(__file__), 'benchmark', 'fixtures')) # カレントディレクトリ変更 (フィクスチャを使う)
+#------------------------------------------------終了-----------------------------------------------#
+
+from PyPrologue.solver.Solver import *
+from PyPrologue.utils.Rotation import *
+
+import json
+import time
+
+file = "input/spec/single.json"
+with open(file) as f:
+    spec_dict = json.load(f)
+
+spec = RocketSpecification(spec_dict)
+env = Environment(spec_dict)
+solver = Solver(GetMap(env.place.lower()), RocketType.Single, TrajectoryMode.Parachute,
+                DetachType.DoNotDetach, 0.0, env, spec)
+solver.solve(3.0, 220.0) # WindModel等の初期化
+body = solver._rocket.bodies[0]
+bodySpec = spec.bodySpec(0)
+params = DynamicsParameter(bodySpec, solver._windModel.valueInto)
+
+def reference(t : float, state : np.ndarray, phase : FlightPhase) -> np.ndarray:
+    '''ベクトル演算で求めた微分 (StateDerivativeと同じ並び)'''
+    y = Body(state)
+    windx, windy, windz, rho, g, pressure, speedOfSound = solver._windModel.valueAt(y.pos[2])
+    wind = np.array([windx, windy, windz])
+    delta = np.zeros(StateSize)
+    delta[[MASS, REF_LENGTH, IYZ, IX]] = np.array([params.massChange, params.refLengthChange, params.iyzChange, params.ixChange]) * \
+                                         bodySpec.engine.burnRate(t)
+    if phase == FlightPhase.Parachute:
+        delta[POS] = (windx, windy, y.velocity[2])
+        delta[5] = 0.5 * rho * y.velocity[2]**2 * bodySpec.parachutes[0].Cd / y.mass - g
+        return delta
+
+    R = RotationMatrix(y.quat.normalized())
+    airspeed_b = ToBody(R, y.velocity - wind)
+    airspeed = norm(airspeed_b)
+    attackAngle = np.arctan(norm(airspeed_b[1:]) / (airspeed_b[0] + 1e-16))
+    aero = bodySpec.aeroCoeffStorage.valueIn(airspeed, attackAngle, bodySpec.engine.didCombustion(t), airspeed / speedOfSound)
+    Cn = aero.Cna * np.arctan(airspeed_b[1:] / (airspeed_b[0] + 1e-16)) # (Cny, Cnp)
+
+    preForceCalc = 0.5 * rho * airspeed**2 * bodySpec.bottomArea
+    force_b = np.array([bodySpec.engine.thrustAt(t, pressure) - aero.Cd * preForceCalc * np.cos(attackAngle), *(-Cn * preForceCalc)])
+    preMomentCalc = 0.25 * rho * airspeed * bodySpec.length**2 * bodySpec.bottomArea
+    moment_b = np.array([0.0, *(preMomentCalc * bodySpec.Cmq * y.omega_b[1:])]) + \
+               np.array([0.0, force_b[2], -force_b[1]]) * (aero.Cp - y.refLength)
+    force_b += R[2] * (-g * y.mass)
+
+    if phase == FlightPhase.Rail:
+        if force_b[0] < 0.0: return delta
+        force_b[1:] = 0.0
+    delta[POS] = y.velocity
+    delta[VELOCITY] = ToGround(R, force_b) / y.mass
+    if phase == FlightPhase.Flight:
+        delta[QUAT] = quaternion.as_float_array(y.quat.normalized() * quaternion.from_vector_part(y.omega_b) * 0.5)
+        delta[OMEGA] = moment_b / np.array([y.ix, y.iyz, y.iyz])
+        delta[10] = 0.0 # ロールモーメントは考慮しない
+    return delta
+
+rng = np.random.default_rng(0)
+
+print("------------------------------\n")
+
+for phase in FlightPhase:
+    errors = []
+    for _ in range(20):
+        t = rng.uniform(0.0, 5.0)
+        state = np.concatenate((rng.uniform(-50, 300, 3), rng.uniform(-50, 50, 3),
+                                quaternion.as_float_array(quaternion.quaternion(*rng.normal(size=4)).normalized()),
+                                rng.uniform(-1, 1, 3), [bodySpec.massInitial, 0.5, 0.1, 0.02]))
+        params.phase = phase
+        result = StateDerivative(t, state, params, np.empty(StateSize))
+        expected = reference(t, state, phase)
+        errors.append(np.max(np.abs(result - expected) / (np.abs(expected) + 1.0)))
+
+        # 陽的Euler法のステップは state + dt * StateDerivative
+        body.state, body.elapsedTime, body.parachuteIndex = state, t, 0
+        solver._stepState(phase)
+        stepped = state + result * solver._dt
+        if phase == FlightPhase.Flight: stepped[QUAT] /= norm(stepped[QUAT])
+        if phase == FlightPhase.Parachute: stepped[3:5] = result[0:2] # 水平方向の速度は風速
+        assert np.array_equal(body.state, stepped), (phase, body.state - stepped)
+    print(phase, "max relative error:", max(errors))
+    assert max(errors) < 1e-12, phase
+
+print("------------------------------\n")
+
+# ベクトル版 (BatchSolver用) は各行をStateDerivativeで計算した値と一致する
+n = 60
+t = rng.uniform(0.0, 5.0)
+states = np.array([np.concatenate((rng.uniform(-50, 300, 3), rng.uniform(-50, 50, 3),
+                                   quaternion.as_float_array(quaternion.quaternion(*rng.normal(size=4)).normalized()),
+                                   rng.uniform(-1, 1, 3), [bodySpec.massInitial, 0.5, 0.1, 0.02])) for _ in range(n)])
+phases = [list(FlightPhase)[i % 3] for i in range(n)]
+onRail = np.array([phase == FlightPhase.Rail for phase in phases])
+parachute = np.array([phase == FlightPhase.Parachute for phase in phases])
+batchParams = BatchDynamicsParameter(bodySpec, BatchWindModel(magneticDeclination=solver._mapData.magneticDeclination,
+                                                              groundWindSpeeds=np.full(n, 3.0), groundWindDirections=np.full(n, 220.0)),
+                                     Perturbation().broadcast(n))
+results = StateDerivatives(t, states, batchParams, np.empty((n, StateSize)), np.arange(n), onRail, parachute)
+errors = []
+for state, phase, result, airspeed, force_b in zip(states, phases, results, batchParams.airspeed, batchParams.force_b):
+    params.phase = phase
+    expected = StateDerivative(t, state, params, np.empty(StateSize), body)
+    errors.append(np.max(np.abs(result - expected) / (np.abs(expected) + 1.0)))
+    assert np.isclose(airspeed, norm(body.airspeed_b), rtol=1e-12) and np.allclose(force_b, body.force_b, rtol=1e-12, atol=1e-12)
+print("StateDerivatives max relative error:", max(errors))
+assert max(errors) < 1e-12
+
+print("------------------------------\n")
+
+out = np.empty(StateSize)
+params.phase = FlightPhase.Flight
+start = time.time()
+for _ in range(10000):
+    StateDerivative(1.0, state, params, out)
+print(f"StateDerivative: {(time.time() - start) / 10000 * 1e6:.1f} us/call")
+
+start = time.time()
+for _ in range(10000):
+    StateDerivative(1.0, state, params, out, body)
+print(f"StateDerivative (Bodyに記録): {(time.time() - start) / 10000 * 1e6:.1f} us/call")
+
+print("------------------------------\n")
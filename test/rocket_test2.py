@@ -53,3 +53,16 @@ print(id(body))
 pprint(rocket.bodies)
 
 print("------------------------------\n")
+
+# Bodyの状態は1本の配列 (state) に格納され, pos等はそのビュー. copyは配列ごと複製する
+body = Body()
+body.pos = [1.0, 2.0, 3.0] # 代入はビューへのコピー
+body.quat = quaternion.quaternion(1, 0, 0, 0)
+body.mass = 5.0
+print(body.state)
+
+snapshot = body.copy()
+body.pos += 10.0
+print(body.pos, snapshot.pos, np.shares_memory(body.pos, body.state), np.shares_memory(body.state, snapshot.state))
+
+print("------------------------------\n")
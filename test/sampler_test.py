@@ -0,0 +1,50 @@
+'''
+Samplerデバッグ用コード
+'''
+#--------------------------------PyPrologueをインポートするための処理--------------------------------#
+import sys; import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) # モジュール検索パス追加
+os.chdir(os.path.join(os.path.dirname(__file__), 'benchmark', 'fixtures')) # カレントディレクトリ変更 (フィクスチャを使う)
+#------------------------------------------------終了-----------------------------------------------#
+
+from PyPrologue.utils.Sampler import *
+from PyPrologue.utils import Sampler
+
+import numpy as np
+
+def discrepancy(points : np.ndarray) -> float:
+    '''中心化L2食い違い量 (小さいほど一様)'''
+    if ScipyAvailable():
+        from scipy.stats import qmc
+        return qmc.discrepancy(points)
+    return float("nan")
+
+print("scipy:", ScipyAvailable())
+for sampler in [SamplerType.Random, SamplerType.LatinHypercube, SamplerType.Sobol]:
+    points = SampleUnitCube(sampler, 256, 6, np.random.SeedSequence(0))
+    same = np.array_equal(points, SampleUnitCube(sampler, 256, 6, np.random.SeedSequence(0)))
+    print(f"{sampler.name:<16} shape={points.shape} range=[{points.min():.4f}, {points.max():.4f}) reproducible={same} discrepancy={discrepancy(points):.5f}")
+    assert points.shape == (256, 6) and same
+    assert np.all((0.0 <= points) & (points < 1.0))
+    if sampler == SamplerType.LatinHypercube: # 各次元の256区間に1点ずつ
+        assert all(len(set((points[:, j] * 256).astype(int))) == 256 for j in range(6))
+print("------------------------------\n")
+
+# NumPyのみの実装 (scipyが無い場合)
+rng = np.random.default_rng(0)
+points = Sampler._latinHypercube(100, 3, rng)
+stratified = all(len(set((points[:, j] * 100).astype(int))) == 100 for j in range(3))
+print("LHS: 各次元の100区間に1点ずつ:", stratified)
+assert stratified
+points = Sampler._sobol(256, 10, rng)
+balanced = all(len(set((points[:2**k, j] * 2**k).astype(int))) == 2**k for k in range(1, 9) for j in range(10))
+print("Sobol: 先頭2^k点は各次元の2^k区間に1点ずつ:", balanced)
+print("Sobol discrepancy:", discrepancy(points))
+assert balanced
+try:
+    Sampler._sobol(4, 20, rng)
+except ValueError as e:
+    print(e)
+else:
+    raise AssertionError("_sobol accepted 20 dimensions")
+print("------------------------------\n")